@@ -0,0 +1,284 @@
+"""
+Admission control and load shedding at the API edge.
+
+The LLM and OCR schedulers bound the work that runs, but not the requests that
+wait for it: during a burst every request still gets its body read and its image
+decoded before it queues. ``AdmissionMiddleware`` decides at the edge, before
+the body is read, whether a request gets in. Work endpoints fall into three classes:
+
+    text    text translation, live-typing sessions, conversation messages
+    ocr     image OCR/translation, documents and voice uploads
+    batch   background job submissions (/api/jobs/...)
+    voice   /api/voice/stream WebSockets, admitted by the handler for the life of
+            the stream; max_body_bytes caps a single audio frame
+
+Each class has a concurrency limit and a bounded FIFO queue behind it. A request
+is rejected, with ``Retry-After``, when:
+
+    413   its body exceeds the class cap. Content-Length is checked up front and
+          chunked bodies are counted while they are read, so oversized uploads are
+          refused before any base64 decode
+    429   its client (X-Client-Id, API key or address, see scheduler.py) already
+          has its share of the class in flight or queued
+    503   the queue is full, or its queue wait ran out (the shorter of the class
+          timeout and the request's X-Deadline-Ms budget)
+
+Reads (GET) and the other endpoints are not limited. Limits apply per worker
+process.
+
+Configuration, per class (TEXT, OCR, BATCH, VOICE):
+    ADMISSION_<CLASS>_CONCURRENCY          requests handled at once (text 64, ocr 8, batch 16, voice 16)
+    ADMISSION_<CLASS>_QUEUE                requests waiting for admission (text 256, ocr 16, batch 64, voice 16)
+    ADMISSION_<CLASS>_QUEUE_TIMEOUT_MS     longest wait for admission (text 5000, ocr 10000, batch 5000,
+                                           voice 5000)
+    ADMISSION_<CLASS>_PER_CLIENT           requests per client, running plus queued (text 32, ocr 4, batch 8,
+                                           voice 2)
+    ADMISSION_<CLASS>_MAX_BODY_BYTES       request body cap (text 256 KB, ocr 20 MB, batch 40 MB, voice 1 MB)
+"""
+
+import asyncio
+import math
+import os
+import time
+from collections import deque
+from typing import Dict, Optional
+
+from fastapi import HTTPException
+from starlette.responses import JSONResponse
+
+from metrics import ADMISSION_ACTIVE, ADMISSION_REJECTED_TOTAL
+from scheduler import get_priority
+
+WORK_METHODS = ("POST", "PUT", "PATCH")
+OCR_PATHS = ("/api/ocr/extract", "/api/translate/image", "/api/translate/document", "/api/translate/voice")
+
+DEFAULTS = {
+    "text": {"concurrency": 64, "queue": 256, "queue_timeout_ms": 5000, "per_client": 32,
+             "max_body_bytes": 256 * 1024},
+    "ocr": {"concurrency": 8, "queue": 16, "queue_timeout_ms": 10000, "per_client": 4,
+            "max_body_bytes": 20 * 2**20},
+    "batch": {"concurrency": 16, "queue": 64, "queue_timeout_ms": 5000, "per_client": 8,
+              "max_body_bytes": 40 * 2**20},
+    "voice": {"concurrency": 16, "queue": 16, "queue_timeout_ms": 5000, "per_client": 2,
+              "max_body_bytes": 2**20},
+}
+MAX_RETRY_AFTER = 60
+
+
+def endpoint_class(method: str, path: str) -> Optional[str]:
+    """Admission class of a request, or None for requests that are not limited"""
+    if method not in WORK_METHODS:
+        return None
+    if path.startswith("/api/jobs/"):
+        return "batch"
+    if path in OCR_PATHS:
+        return "ocr"
+    if path.startswith(("/api/translate/", "/api/conversation/")) or path == "/api/glossary/match":
+        return "text"
+    return None
+
+
+class Rejected(Exception):
+    def __init__(self, status_code: int, reason: str, detail: str, retry_after: int):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.reason = reason
+        self.detail = detail
+        self.retry_after = retry_after
+
+
+class BodyTooLarge(HTTPException):
+    def __init__(self, limit: int):
+        super().__init__(status_code=413, detail=f"Request body exceeds {limit} bytes")
+
+
+class AdmissionClass:
+    """Concurrency limit, FIFO queue and per-client quota of one endpoint class"""
+
+    def __init__(self, name: str, concurrency: int, queue: int, queue_timeout_ms: int, per_client: int,
+                 max_body_bytes: int):
+        self.name = name
+        self.concurrency = concurrency
+        self.queue_limit = queue
+        self.queue_timeout = queue_timeout_ms / 1000
+        self.per_client = per_client
+        self.max_body_bytes = max_body_bytes
+        self.running = 0
+        self.waiters: deque = deque()
+        self.clients: Dict[str, int] = {}  # running plus queued, per client
+        self.service_seconds = 1.0  # moving average, for Retry-After
+        self.admitted = 0
+        self.rejected: Dict[str, int] = {}
+
+    @classmethod
+    def from_env(cls, name: str) -> "AdmissionClass":
+        settings = {
+            key: int(os.environ.get(f"ADMISSION_{name.upper()}_{key.upper()}", default))
+            for key, default in DEFAULTS[name].items()
+        }
+        return cls(name, **settings)
+
+    def retry_after(self) -> int:
+        """Seconds until the current backlog should have drained"""
+        backlog = self.running + len(self.waiters) + 1
+        seconds = self.service_seconds * backlog / max(1, self.concurrency)
+        return max(1, min(MAX_RETRY_AFTER, math.ceil(seconds)))
+
+    def count_rejection(self, reason: str):
+        self.rejected[reason] = self.rejected.get(reason, 0) + 1
+        ADMISSION_REJECTED_TOTAL.labels(self.name, reason).inc()
+
+    def reject(self, status_code: int, reason: str, detail: str) -> Rejected:
+        self.count_rejection(reason)
+        return Rejected(status_code, reason, detail, self.retry_after())
+
+    async def acquire(self, client_id: str, timeout: float):
+        """Wait for a slot; raises Rejected when the client or the queue is over its limit"""
+        if self.clients.get(client_id, 0) >= self.per_client:
+            raise self.reject(429, "client_limit", f"Too many concurrent {self.name} requests from this client")
+        if self.running < self.concurrency and not self.waiters:
+            self.running += 1
+            self._admit(client_id)
+            return
+        if len(self.waiters) >= self.queue_limit:
+            raise self.reject(503, "queue_full", f"Server is busy with {self.name} requests")
+
+        future = asyncio.get_running_loop().create_future()
+        self.waiters.append(future)
+        self._enter(client_id)
+        ADMISSION_ACTIVE.labels(self.name, "queued").inc()
+        try:
+            await asyncio.wait_for(asyncio.shield(future), max(0.0, timeout))
+        except asyncio.TimeoutError:
+            pass
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # The slot was handed over just as the client went away: pass it on
+                self._admit(client_id, entered=True)
+                self.release(client_id)
+            else:
+                self._abandon(future, client_id)
+            raise
+        finally:
+            ADMISSION_ACTIVE.labels(self.name, "queued").dec()
+        if future.done() and not future.cancelled():
+            # release() handed its slot over without decrementing running
+            self._admit(client_id, entered=True)
+            return
+        self._abandon(future, client_id)
+        raise self.reject(503, "queue_timeout", f"Timed out waiting for {self.name} capacity")
+
+    def release(self, client_id: str, seconds: Optional[float] = None):
+        self._leave(client_id)
+        ADMISSION_ACTIVE.labels(self.name, "running").dec()
+        if seconds is not None:
+            self.service_seconds += 0.1 * (seconds - self.service_seconds)
+        while self.waiters:
+            future = self.waiters.popleft()
+            if not future.done():
+                future.set_result(None)
+                return
+        self.running -= 1
+
+    def _enter(self, client_id: str):
+        self.clients[client_id] = self.clients.get(client_id, 0) + 1
+
+    def _admit(self, client_id: str, entered: bool = False):
+        if not entered:
+            self._enter(client_id)
+        self.admitted += 1
+        ADMISSION_ACTIVE.labels(self.name, "running").inc()
+
+    def _abandon(self, future: asyncio.Future, client_id: str):
+        future.cancel()
+        self.waiters.remove(future)
+        self._leave(client_id)
+
+    def _leave(self, client_id: str):
+        remaining = self.clients.get(client_id, 0) - 1
+        if remaining > 0:
+            self.clients[client_id] = remaining
+        else:
+            self.clients.pop(client_id, None)
+
+    def stats(self) -> dict:
+        return {
+            "concurrency": self.concurrency,
+            "running": self.running,
+            "queued": len(self.waiters),
+            "queue_limit": self.queue_limit,
+            "per_client": self.per_client,
+            "max_body_bytes": self.max_body_bytes,
+            "admitted": self.admitted,
+            "rejected": dict(self.rejected),
+            "avg_service_seconds": round(self.service_seconds, 3)
+        }
+
+
+class AdmissionController:
+    def __init__(self):
+        self.classes = {name: AdmissionClass.from_env(name) for name in DEFAULTS}
+
+    def stats(self) -> dict:
+        return {name: admission_class.stats() for name, admission_class in self.classes.items()}
+
+
+admission_controller = AdmissionController()
+
+
+def rejection_response(rejected: Rejected) -> JSONResponse:
+    return JSONResponse(
+        {"detail": rejected.detail}, status_code=rejected.status_code,
+        headers={"Retry-After": str(rejected.retry_after)}
+    )
+
+
+class AdmissionMiddleware:
+    """ASGI middleware admitting work requests per endpoint class; needs PriorityMiddleware outside it"""
+
+    def __init__(self, app, controller: AdmissionController = None):
+        self.app = app
+        self.controller = controller or admission_controller
+
+    async def __call__(self, scope, receive, send):
+        name = endpoint_class(scope.get("method", ""), scope["path"]) if scope["type"] == "http" else None
+        if name is None:
+            await self.app(scope, receive, send)
+            return
+        admission_class = self.controller.classes[name]
+
+        limit = admission_class.max_body_bytes
+        content_length = dict(scope.get("headers") or []).get(b"content-length")
+        if content_length is not None and content_length.isdigit() and int(content_length) > limit:
+            rejected = admission_class.reject(413, "body_too_large", f"Request body exceeds {limit} bytes")
+            await rejection_response(rejected)(scope, receive, send)
+            return
+
+        priority = get_priority()
+        timeout = admission_class.queue_timeout
+        if priority.remaining() is not None:
+            timeout = min(timeout, priority.remaining())
+        try:
+            await admission_class.acquire(priority.client_id, timeout)
+        except Rejected as rejected:
+            await rejection_response(rejected)(scope, receive, send)
+            return
+
+        received = 0
+
+        async def receive_capped():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    # Raised into the body read, before the handler decodes anything
+                    admission_class.count_rejection("body_too_large")
+                    raise BodyTooLarge(limit)
+            return message
+
+        start = time.monotonic()
+        try:
+            await self.app(scope, receive_capped, send)
+        finally:
+            admission_class.release(priority.client_id, time.monotonic() - start)
@@ -0,0 +1,130 @@
+"""
+Bounded translation context for conversations.
+
+Each conversation keeps a rolling summary plus its last K messages. When the
+recent window overflows, the oldest messages are folded into the summary with
+one incremental LLM call, so the context passed to translate_text_with_llm
+stays the same size however long the conversation gets. If that call fails, the
+messages stay in the window and the fold is retried with the next message. State
+is cached in memory and persisted through the repository.
+
+Several workers (serve.py) can update the same conversation. Each saved state
+carries a version, and a save only succeeds if the stored version is still the
+one the update started from. A worker that loses that race reloads the state and
+applies its message again. Before building a context, the cached state's version
+is checked against the stored one, and the state is reloaded if another worker
+has moved it on.
+
+Configuration:
+    CONVERSATION_CONTEXT_MESSAGES     recent messages kept verbatim (default 6)
+    CONVERSATION_SUMMARY_MAX_CHARS    cap on the rolling summary (default 1500)
+"""
+
+import asyncio
+import bisect
+import logging
+import os
+import weakref
+from typing import Awaitable, Callable, List, Optional
+
+from cachetools import LRUCache
+
+from storage import Repository
+
+logger = logging.getLogger(__name__)
+
+MESSAGE_SNIPPET_CHARS = 300
+MAX_SAVE_ATTEMPTS = 3
+MAX_RECENT_FACTOR = 4  # recent window cap, in windows, while summarisation keeps failing
+
+# summarize(previous_summary, messages_to_fold) -> new summary
+Summarizer = Callable[[str, List[dict]], Awaitable[str]]
+
+
+class ConversationContextManager:
+    """Maintains the rolling summary and recent-message window per conversation"""
+
+    def __init__(self, repo: Repository, summarize: Summarizer, recent_size: int = None,
+                 max_summary_chars: int = None, cache_size: int = 10000):
+        self.repo = repo
+        self.summarize = summarize
+        self.recent_size = recent_size or int(os.environ.get('CONVERSATION_CONTEXT_MESSAGES', 6))
+        self.max_summary_chars = max_summary_chars or int(os.environ.get('CONVERSATION_SUMMARY_MAX_CHARS', 1500))
+        self.states = LRUCache(maxsize=cache_size)
+        # Per-conversation locks, dropped automatically once nobody holds them
+        self.locks: "weakref.WeakValueDictionary[str, asyncio.Lock]" = weakref.WeakValueDictionary()
+        self.pending = set()
+
+    async def get_state(self, conversation_id: str, refresh: bool = False) -> dict:
+        """The cached state; with refresh, reloaded first if another worker saved a newer one"""
+        state = self.states.get(conversation_id)
+        if state is not None and refresh:
+            stored = await self.repo.get_conversation_context(conversation_id, fields=["version"])
+            if stored is not None and stored.get("version", 0) > state.get("version", 0):
+                state = None
+        if state is None:
+            state = await self.repo.get_conversation_context(conversation_id) or {
+                "conversation_id": conversation_id, "summary": "", "recent": []
+            }
+            self.states[conversation_id] = state
+        return state
+
+    def render(self, state: dict) -> Optional[str]:
+        """Format the state as the context string handed to the translator"""
+        parts = []
+        if state["summary"]:
+            parts.append(f"Conversation summary: {state['summary']}")
+        if state["recent"]:
+            lines = [f"{m['sender_id']}: {m['text'][:MESSAGE_SNIPPET_CHARS]}" for m in state["recent"]]
+            parts.append("Recent messages:\n" + "\n".join(lines))
+        return "\n\n".join(parts) or None
+
+    async def build_context(self, conversation_id: str) -> Optional[str]:
+        return self.render(await self.get_state(conversation_id, refresh=True))
+
+    def record(self, conversation_id: str, message: dict):
+        """Add a stored message to the context in the background"""
+        task = asyncio.create_task(self._record(conversation_id, message))
+        self.pending.add(task)
+        task.add_done_callback(self.pending.discard)
+
+    async def _record(self, conversation_id: str, message: dict):
+        lock = self.locks.get(conversation_id)
+        if lock is None:
+            lock = self.locks[conversation_id] = asyncio.Lock()
+        try:
+            async with lock:
+                for _ in range(MAX_SAVE_ATTEMPTS):
+                    state = await self.get_state(conversation_id)
+                    updated = await self._add_message(state, message)
+                    if await self.repo.save_conversation_context(updated, state.get("version", 0)):
+                        self.states[conversation_id] = updated
+                        return
+                    # Another worker saved first: start over from its state
+                    self.states.pop(conversation_id, None)
+                logger.warning(f"Conversation context update for {conversation_id} lost {MAX_SAVE_ATTEMPTS} races; "
+                               f"message {message['sequence']} left out")
+        except Exception as e:
+            logger.error(f"Conversation context update failed for {conversation_id}: {e}")
+
+    async def _add_message(self, state: dict, message: dict) -> dict:
+        """The next version of the state, with the message added; the state itself is not modified"""
+        recent = list(state["recent"])
+        summary = state["summary"]
+        sequences = [m["sequence"] for m in recent]
+        if message["sequence"] not in sequences:
+            entry = {"sequence": message["sequence"], "sender_id": message["sender_id"], "text": message["original_text"]}
+            recent.insert(bisect.bisect(sequences, entry["sequence"]), entry)
+
+        # Fold in batches of recent_size so summarisation runs once per K messages
+        if len(recent) >= 2 * self.recent_size:
+            overflow = len(recent) - self.recent_size
+            try:
+                summary = (await self.summarize(summary, recent[:overflow])).strip()[:self.max_summary_chars]
+                recent = recent[overflow:]
+            except Exception as e:
+                # Keep the messages verbatim and retry the fold with the next message; if
+                # it keeps failing, the window is capped and the oldest messages go
+                logger.warning(f"Summarising conversation {state['conversation_id']} failed: {e}")
+                recent = recent[-MAX_RECENT_FACTOR * self.recent_size:]
+        return {**state, "summary": summary, "recent": recent, "version": state.get("version", 0) + 1}
@@ -0,0 +1,247 @@
+"""
+Multi-page document translation.
+
+A document arrives as a list of page images, a multi-page TIFF, or a PDF (PDF
+needs the optional ``pypdfium2`` renderer). Pages are decoded or rasterized only
+when a worker picks them up. At most ``window`` pages are in flight, counting pages
+that are finished but not yet sent, so memory is bounded by the window rather than
+the page count. Pages are OCR'd in parallel (bounded by the OCR scheduler) and
+yielded strictly in page order as soon as the next page is ready.
+
+Paragraphs that repeat across pages (headers, footers, boilerplate) are translated
+once per document. Across documents they go through the shared translation cache.
+
+Configuration:
+    DOCUMENT_MAX_PAGES      pages accepted per document (default 200)
+    DOCUMENT_PAGE_WINDOW    pages in flight per document (default 4)
+    DOCUMENT_PDF_DPI        PDF rasterization resolution (default 200)
+"""
+
+import asyncio
+import base64
+import io
+import logging
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import deque
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional
+
+import numpy as np
+from PIL import Image
+
+try:
+    import pypdfium2 as pdfium
+except ImportError:  # pragma: no cover - optional
+    pdfium = None
+
+logger = logging.getLogger(__name__)
+
+PDF_MAGIC = b"%PDF"
+
+
+class DocumentError(ValueError):
+    """The document cannot be read; ``status_code`` is the HTTP status to answer with"""
+
+    def __init__(self, message: str, status_code: int = 400):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class DocumentSource(ABC):
+    """Random access to the pages of a document; ``load`` is blocking and runs in the executor"""
+
+    page_count: int
+
+    @abstractmethod
+    def load(self, index: int) -> np.ndarray:
+        ...
+
+    def close(self):
+        pass
+
+
+class ImageListSource(DocumentSource):
+    """One base64-encoded image per page"""
+
+    def __init__(self, pages_base64: List[str]):
+        self.pages_base64 = pages_base64
+        self.page_count = len(pages_base64)
+
+    def load(self, index: int) -> np.ndarray:
+        image = Image.open(io.BytesIO(base64.b64decode(self.pages_base64[index])))
+        return np.array(image.convert("RGB"))
+
+
+class MultiFrameImageSource(DocumentSource):
+    """Multi-page TIFF (or any single image); frames are decoded on demand"""
+
+    def __init__(self, data: bytes):
+        self.image = Image.open(io.BytesIO(data))
+        self.page_count = getattr(self.image, "n_frames", 1)
+        self.lock = threading.Lock()  # seeking changes the shared image state
+
+    def load(self, index: int) -> np.ndarray:
+        with self.lock:
+            self.image.seek(index)
+            return np.array(self.image.convert("RGB"))
+
+    def close(self):
+        self.image.close()
+
+
+class PdfSource(DocumentSource):
+    """PDF pages rasterized on demand with pdfium"""
+
+    def __init__(self, data: bytes, dpi: int):
+        self.pdf = pdfium.PdfDocument(data)
+        self.page_count = len(self.pdf)
+        self.scale = dpi / 72
+        self.lock = threading.Lock()  # pdfium is not thread-safe
+
+    def load(self, index: int) -> np.ndarray:
+        with self.lock:
+            page = self.pdf[index]
+            try:
+                return np.array(page.render(scale=self.scale).to_pil().convert("RGB"))
+            finally:
+                page.close()
+
+    def close(self):
+        self.pdf.close()
+
+
+def open_document(document_base64: Optional[str] = None, pages_base64: Optional[List[str]] = None,
+                  max_pages: int = None) -> DocumentSource:
+    """Pick a page source for the request, validating the page count"""
+    max_pages = max_pages or int(os.environ.get('DOCUMENT_MAX_PAGES', 200))
+    if bool(document_base64) == bool(pages_base64):
+        raise DocumentError("Provide either document_base64 or pages_base64")
+    if pages_base64:
+        source = ImageListSource(pages_base64)
+    else:
+        try:
+            data = base64.b64decode(document_base64)
+        except ValueError:
+            raise DocumentError("document_base64 is not valid base64")
+        if data.startswith(PDF_MAGIC):
+            if pdfium is None:
+                raise DocumentError("PDF rendering is not available on this server (install pypdfium2)", 415)
+            try:
+                source = PdfSource(data, int(os.environ.get('DOCUMENT_PDF_DPI', 200)))
+            except pdfium.PdfiumError as e:
+                raise DocumentError(f"Unreadable PDF: {e}")
+        else:
+            try:
+                source = MultiFrameImageSource(data)
+            except Exception:
+                raise DocumentError("Unsupported document format (expected PDF, TIFF or an image)", 415)
+    if source.page_count > max_pages:
+        source.close()
+        raise DocumentError(f"Document has {source.page_count} pages; the limit is {max_pages}", 413)
+    return source
+
+
+class DocumentTranslator:
+    """Windowed, order-preserving page pipeline: load -> OCR -> detect -> translate"""
+
+    def __init__(self, source: DocumentSource,
+                 recognize: Callable[[np.ndarray], Awaitable[List[str]]],
+                 detect: Callable[[str], Awaitable[str]],
+                 translate: Callable[[str, str, str], Awaitable[str]],
+                 target_language: str, source_language: str = "auto", window: int = None):
+        self.source = source
+        self.recognize = recognize
+        self.detect = detect
+        self.translate = translate
+        self.target_language = target_language
+        self.source_language = source_language
+        self.window = max(1, window or int(os.environ.get('DOCUMENT_PAGE_WINDOW', 4)))
+        self.detection: Optional[asyncio.Future] = None
+        self.segments: Dict[str, asyncio.Future] = {}
+        self.segment_count = 0
+        self.failed_pages = 0
+        self.started = time.perf_counter()
+
+    async def pages(self) -> AsyncIterator[dict]:
+        """Page results in page order"""
+        pending = deque()
+        next_index = 0
+        try:
+            while next_index < self.source.page_count or pending:
+                while next_index < self.source.page_count and len(pending) < self.window:
+                    pending.append(asyncio.create_task(self._page(next_index)))
+                    next_index += 1
+                yield await pending.popleft()
+        finally:
+            # Client went away or the stream ended: stop work nobody will read
+            for task in pending:
+                task.cancel()
+            for future in self.segments.values():
+                future.cancel()
+            self.source.close()
+
+    def summary(self) -> dict:
+        return {
+            "pages": self.source.page_count,
+            "failed_pages": self.failed_pages,
+            "source_language": self.source_language,
+            "segments": self.segment_count,
+            "unique_segments": len(self.segments),
+            "processing_time": time.perf_counter() - self.started
+        }
+
+    async def _page(self, index: int) -> dict:
+        start = time.perf_counter()
+        try:
+            image = await asyncio.get_running_loop().run_in_executor(None, self.source.load, index)
+            paragraphs = [text.strip() for text in await self.recognize(image) if text.strip()]
+            del image
+            original_text = "\n".join(paragraphs)
+            result = {
+                "type": "page",
+                "page": index + 1,
+                "original_text": original_text,
+                "ocr_confidence": 0.9 if paragraphs else 0.1,
+                "source_language": None,
+                "translated_text": ""
+            }
+            if paragraphs:
+                source_language = await self._source_language(original_text)
+                if source_language == self.target_language:
+                    translated = paragraphs
+                else:
+                    translated = await asyncio.gather(*(self._segment(text, source_language) for text in paragraphs))
+                result.update(source_language=source_language, translated_text="\n".join(translated))
+        except Exception as e:
+            logger.error(f"Document page {index + 1} failed: {e}")
+            self.failed_pages += 1
+            result = {"type": "page", "page": index + 1, "error": getattr(e, "detail", None) or str(e)}
+        result["processing_time"] = time.perf_counter() - start
+        return result
+
+    async def _source_language(self, text: str) -> str:
+        """Detect once per document, on the first page with text"""
+        if self.source_language != "auto":
+            return self.source_language
+        if self.detection is None:
+            self.detection = asyncio.ensure_future(self.detect(text))
+            self.detection.add_done_callback(self._detected)
+        return await asyncio.shield(self.detection)
+
+    def _detected(self, future: asyncio.Future):
+        if not future.cancelled() and future.exception() is None:
+            self.source_language = future.result()
+        else:
+            self.detection = None  # let the next page try again
+
+    async def _segment(self, text: str, source_language: str) -> str:
+        """Translate a paragraph once per document, however many pages repeat it"""
+        self.segment_count += 1
+        future = self.segments.get(text)
+        if future is None or (future.done() and (future.cancelled() or future.exception())):
+            future = self.segments[text] = asyncio.ensure_future(
+                self.translate(text, source_language, self.target_language)
+            )
+        return await asyncio.shield(future)
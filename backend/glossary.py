@@ -0,0 +1,307 @@
+"""
+Per-tenant glossaries and terminology enforcement.
+
+A tenant's glossary (selected with the X-Tenant-Id header) maps source terms such
+as brand names and domain vocabulary to fixed renderings per target language. An
+entry without translations is a do-not-translate term. Each glossary is compiled
+once into an Aho-Corasick automaton, so finding the terms in a text costs one pass
+over the text regardless of the glossary size. Only the terms found in the input are
+added to the LLM prompt. After translation, each required rendering is checked
+in the output. A source term left untranslated is replaced with its rendering.
+Compiled glossaries are cached per worker and recompiled only when the stored
+version changes.
+
+Tenants are not authenticated, so reading or replacing a glossary
+(GET/PUT /api/glossary) and matching text against one (POST /api/glossary/match,
+which returns the protected renderings) require the admin token. Translations
+only apply a tenant's glossary.
+
+Configuration:
+    GLOSSARY_CACHE_SIZE              compiled glossaries kept per worker (default 64)
+    GLOSSARY_CACHE_TTL_SECONDS       how long a compiled glossary is used before its
+                                     stored version is checked again (default 60)
+    GLOSSARY_MAX_ENTRIES             entries accepted per glossary (default 200000)
+    GLOSSARY_MAX_PROMPT_TERMS        terms added to one prompt (default 50)
+"""
+
+import asyncio
+import logging
+import os
+import time
+from array import array
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from cachetools import TTLCache
+
+from metrics import GLOSSARY_TERMS_TOTAL
+from storage import Repository
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TENANT = "default"
+CHAR_BITS = 21  # enough for any code point (max 0x10FFFF)
+
+current_tenant: ContextVar[str] = ContextVar("current_tenant", default=DEFAULT_TENANT)
+
+# (source term, required rendering) pairs for one text and target language
+Terminology = Tuple[Tuple[str, str], ...]
+
+
+def fold(text: str) -> str:
+    """Lowercase without changing the length, so match offsets map back to the original"""
+    lowered = text.lower()
+    if len(lowered) == len(text):
+        return lowered
+    return "".join(ch if len(ch.lower()) != 1 else ch.lower() for ch in text)
+
+
+def is_word_char(ch: str) -> bool:
+    # Only scripts written with spaces need word boundaries; CJK terms match anywhere
+    return ch.isalnum() and ord(ch) < 0x2E80
+
+
+def on_word_boundaries(text: str, start: int, end: int) -> bool:
+    """Whether text[start:end] is not part of a longer word"""
+    if start > 0 and is_word_char(text[start - 1]) and is_word_char(text[start]):
+        return False
+    return not (end < len(text) and is_word_char(text[end]) and is_word_char(text[end - 1]))
+
+
+class AhoCorasick:
+    """Multi-pattern matcher over case-folded text.
+
+    Transitions live in one dict keyed by ``node << CHAR_BITS | code point`` and the
+    per-node links in int arrays, which keeps a 100k-term automaton compact.
+    """
+
+    def __init__(self, patterns: List[str]):
+        self.goto: Dict[int, int] = {}
+        self.lengths = array("i", (len(pattern) for pattern in patterns))
+        output = array("i", [-1])
+        parent = array("i", [0])
+        char = array("i", [0])
+        depth = array("i", [0])
+        for index, pattern in enumerate(patterns):
+            node = 0
+            for ch in pattern:
+                key = node << CHAR_BITS | ord(ch)
+                child = self.goto.get(key)
+                if child is None:
+                    child = self.goto[key] = len(output)
+                    output.append(-1)
+                    parent.append(node)
+                    char.append(ord(ch))
+                    depth.append(depth[node] + 1)
+                node = child
+            output[node] = index
+
+        # Failure links in breadth-first order; ``link`` skips straight to the
+        # nearest suffix state that ends a pattern
+        fail = array("i", bytes(4 * len(output)))
+        link = array("i", bytes(4 * len(output)))
+        for node in sorted(range(1, len(output)), key=depth.__getitem__):
+            if parent[node]:
+                state = fail[parent[node]]
+                while state and (state << CHAR_BITS | char[node]) not in self.goto:
+                    state = fail[state]
+                fail[node] = self.goto.get(state << CHAR_BITS | char[node], 0)
+            suffix = fail[node]
+            link[node] = suffix if output[suffix] >= 0 else link[suffix]
+        self.output = output
+        self.fail = fail
+        self.link = link
+
+    def __len__(self) -> int:
+        return len(self.output)
+
+    def find_all(self, text: str) -> List[Tuple[int, int, int]]:
+        """Every (start, end, pattern index) occurrence, overlapping ones included"""
+        goto, fail, output, link, lengths = self.goto, self.fail, self.output, self.link, self.lengths
+        matches = []
+        node = 0
+        for position, ch in enumerate(text, 1):
+            code = ord(ch)
+            while node and (node << CHAR_BITS | code) not in goto:
+                node = fail[node]
+            node = goto.get(node << CHAR_BITS | code, 0)
+            state = node if output[node] >= 0 else link[node]
+            while state:
+                index = output[state]
+                matches.append((position - lengths[index], position, index))
+                state = link[state]
+        return matches
+
+
+class Glossary:
+    """A compiled glossary: entries plus the matcher over their folded terms"""
+
+    def __init__(self, entries: List[dict], version: Optional[str] = None):
+        unique: Dict[str, dict] = {}
+        for entry in entries:
+            term = entry["term"].strip()
+            if term:
+                unique[fold(term)] = {**entry, "term": term}  # later entries win
+        self.entries = list(unique.values())
+        self.version = version
+        self.matcher = AhoCorasick(list(unique))
+
+    def find(self, text: str) -> List[dict]:
+        """Entries occurring in the text: leftmost-longest, non-overlapping, on word boundaries"""
+        candidates = []
+        for start, end, index in self.matcher.find_all(fold(text)):
+            entry = self.entries[index]
+            if entry.get("case_sensitive") and text[start:end] != entry["term"]:
+                continue
+            if not on_word_boundaries(text, start, end):
+                continue
+            candidates.append((start, -end, index))
+        found, seen, covered = [], set(), 0
+        for start, negative_end, index in sorted(candidates):
+            if start < covered:
+                continue
+            covered = -negative_end
+            if index not in seen:
+                seen.add(index)
+                found.append(self.entries[index])
+        return found
+
+    def terminology(self, text: str, target_language: str, limit: int = None) -> Terminology:
+        """Required renderings of the terms in the text for one target language"""
+        limit = limit or int(os.environ.get('GLOSSARY_MAX_PROMPT_TERMS', 50))
+        pairs = []
+        for entry in self.find(text):
+            translations = entry.get("translations") or {}
+            rendering = translations.get(target_language) if translations else entry["term"]
+            if rendering:
+                pairs.append((entry["term"], rendering))
+            if len(pairs) >= limit:
+                break
+        return tuple(pairs)
+
+
+def terminology_instruction(terminology: Terminology) -> str:
+    """Prompt lines listing the required renderings"""
+    if not terminology:
+        return ""
+    lines = "\n".join(f'- "{term}" -> "{rendering}"' for term, rendering in terminology)
+    return f"\n\nUse exactly these translations for the following terms:\n{lines}"
+
+
+def replace_term(text: str, term: str, rendering: str) -> Tuple[str, int]:
+    """Replace the occurrences of a term that Glossary.find would match (any case)"""
+    folded_text, folded_term = fold(text), fold(term)
+    pieces, position, replaced = [], 0, 0
+    start = folded_text.find(folded_term) if folded_term else -1
+    while start >= 0:
+        end = start + len(folded_term)
+        if on_word_boundaries(text, start, end):
+            pieces += [text[position:start], rendering]
+            position = end
+            replaced += 1
+            start = folded_text.find(folded_term, end)
+        else:
+            start = folded_text.find(folded_term, start + 1)
+    return "".join(pieces) + text[position:], replaced
+
+
+def enforce_terminology(translated_text: str, terminology: Terminology) -> Tuple[str, List[str]]:
+    """Correct untranslated terms in the output; returns the text and the terms still missing"""
+    missing = []
+    for term, rendering in terminology:
+        if fold(rendering) in fold(translated_text):
+            GLOSSARY_TERMS_TOTAL.labels("followed").inc()
+            continue
+        corrected, replaced = replace_term(translated_text, term, rendering)
+        if replaced:
+            translated_text = corrected
+            GLOSSARY_TERMS_TOTAL.labels("corrected").inc()
+        else:
+            missing.append(term)
+            GLOSSARY_TERMS_TOTAL.labels("missing").inc()
+    return translated_text, missing
+
+
+class GlossaryStore:
+    """Loads, compiles and caches tenant glossaries"""
+
+    def __init__(self, repo: Repository, cache_size: int = None, ttl: int = None):
+        self.repo = repo
+        self.cache = TTLCache(
+            maxsize=cache_size or int(os.environ.get('GLOSSARY_CACHE_SIZE', 64)),
+            ttl=ttl or int(os.environ.get('GLOSSARY_CACHE_TTL_SECONDS', 60))
+        )
+        # Compiled glossaries by tenant, kept past the TTL to recompile only on a version change
+        self.compiled: Dict[str, Glossary] = {}
+        self.max_entries = int(os.environ.get('GLOSSARY_MAX_ENTRIES', 200000))
+        self.loading: Dict[str, asyncio.Future] = {}
+
+    async def get(self, tenant_id: str) -> Optional[Glossary]:
+        if tenant_id in self.cache:
+            return self.cache[tenant_id]
+        pending = self.loading.get(tenant_id)
+        if pending is None:
+            pending = self.loading[tenant_id] = asyncio.ensure_future(self._load(tenant_id))
+            pending.add_done_callback(lambda _: self.loading.pop(tenant_id, None))
+        return await asyncio.shield(pending)
+
+    async def _load(self, tenant_id: str) -> Optional[Glossary]:
+        previous = self.compiled.get(tenant_id)
+        stored = await self.repo.get_glossary(tenant_id, include_entries=False)
+        if stored is None:
+            glossary = None
+        elif previous is not None and previous.version == stored["version"]:
+            glossary = previous
+        else:
+            stored = await self.repo.get_glossary(tenant_id)
+            glossary = await self._compile(stored["entries"], stored["version"])
+        self._remember(tenant_id, glossary)
+        return glossary
+
+    async def _compile(self, entries: List[dict], version: str) -> Glossary:
+        start = time.perf_counter()
+        glossary = await asyncio.get_running_loop().run_in_executor(None, Glossary, entries, version)
+        logger.info(f"Compiled glossary of {len(glossary.entries)} terms ({len(glossary.matcher)} states) "
+                    f"in {time.perf_counter() - start:.2f}s")
+        return glossary
+
+    def _remember(self, tenant_id: str, glossary: Optional[Glossary]):
+        self.cache[tenant_id] = glossary
+        if glossary is None:
+            self.compiled.pop(tenant_id, None)
+        else:
+            self.compiled[tenant_id] = glossary
+            # Keep compiled glossaries only for tenants still in the cache
+            for stale in [tenant for tenant in self.compiled if tenant not in self.cache]:
+                del self.compiled[stale]
+
+    async def save(self, tenant_id: str, entries: List[dict]) -> dict:
+        """Replace a tenant's glossary; raises ValueError if it is too large"""
+        if len(entries) > self.max_entries:
+            raise ValueError(f"Glossary has {len(entries)} entries; the limit is {self.max_entries}")
+        now = datetime.utcnow()
+        version = f"{now.timestamp():.6f}"
+        glossary = await self._compile(entries, version)
+        info = {"tenant_id": tenant_id, "entry_count": len(glossary.entries), "version": version, "updated_at": now}
+        await self.repo.save_glossary({**info, "entries": glossary.entries})
+        self._remember(tenant_id, glossary)
+        return info
+
+
+class TenantMiddleware:
+    """ASGI middleware that selects the tenant (and so the glossary) from X-Tenant-Id"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] not in ("http", "websocket"):
+            await self.app(scope, receive, send)
+            return
+        tenant = dict(scope.get("headers") or []).get(b"x-tenant-id")
+        token = current_tenant.set(tenant.decode(errors="replace")[:64] if tenant else DEFAULT_TENANT)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            current_tenant.reset(token)
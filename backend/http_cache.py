@@ -0,0 +1,198 @@
+"""
+HTTP response compression and conditional requests.
+
+``CompressionMiddleware`` compresses complete responses above a size threshold with
+brotli (when the optional ``brotli`` package is installed and the client accepts
+it) or gzip. Streamed responses (NDJSON document translation, server-sent events)
+are passed through untouched, so their lines still reach the client as soon as
+they are produced. Large bodies are compressed in a worker thread.
+
+Validators are weak ETags (``W/"..."``), so they stay valid for every content
+encoding of the same body. ``StaticResponse`` serializes, tags and pre-compresses
+constant payloads once at import. ``conditional_response`` answers
+``If-None-Match`` (and ``If-Modified-Since``, for callers that pass a
+Last-Modified) with 304 Not Modified. The history and message lists validate
+with the ETag only.
+
+Configuration:
+    COMPRESSION_MIN_BYTES        smallest body worth compressing (default 1024)
+    COMPRESSION_GZIP_LEVEL       gzip level (default 6)
+    COMPRESSION_BROTLI_QUALITY   brotli quality (default 5)
+"""
+
+import asyncio
+import gzip
+import hashlib
+import os
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Dict, Optional
+
+import orjson
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.responses import Response
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional
+    brotli = None
+
+COMPRESSIBLE_TYPES = ("application/json", "text/", "application/javascript", "image/svg+xml")
+STREAMING_TYPES = ("application/x-ndjson", "text/event-stream")
+THREAD_COMPRESSION_BYTES = 256 * 1024
+
+MIN_BYTES = int(os.environ.get('COMPRESSION_MIN_BYTES', 1024))
+GZIP_LEVEL = int(os.environ.get('COMPRESSION_GZIP_LEVEL', 6))
+BROTLI_QUALITY = int(os.environ.get('COMPRESSION_BROTLI_QUALITY', 5))
+
+
+def choose_encoding(accept_encoding: str) -> Optional[str]:
+    """Best supported content coding the client accepts (q=0 excludes one)"""
+    accepted = {}
+    for item in accept_encoding.lower().split(","):
+        name, _, params = item.strip().partition(";")
+        quality = 1.0
+        if params.strip().startswith("q="):
+            try:
+                quality = float(params.strip()[2:])
+            except ValueError:
+                pass
+        accepted[name.strip()] = quality
+    for encoding in (("br", "gzip") if brotli else ("gzip",)):
+        if accepted.get(encoding, accepted.get("*", 0)) > 0:
+            return encoding
+    return None
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+def is_compressible(content_type: str) -> bool:
+    return content_type.startswith(COMPRESSIBLE_TYPES) and not content_type.startswith(STREAMING_TYPES)
+
+
+def weak_etag(body: bytes) -> str:
+    return f'W/"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(tag.strip().removeprefix("W/") == opaque for tag in if_none_match.split(","))
+
+
+def http_date(value: datetime) -> str:
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)  # stored timestamps are naive UTC
+    return format_datetime(value.astimezone(timezone.utc).replace(microsecond=0), usegmt=True)
+
+
+def not_modified(etag: str, last_modified: Optional[datetime], if_none_match: Optional[str],
+                 if_modified_since: Optional[str]) -> bool:
+    """RFC 9110 evaluation: If-None-Match wins; If-Modified-Since only without it"""
+    if if_none_match:
+        return etag_matches(if_none_match, etag)
+    if if_modified_since and last_modified is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        if since.tzinfo is None:
+            since = since.replace(tzinfo=timezone.utc)
+        modified = last_modified if last_modified.tzinfo else last_modified.replace(tzinfo=timezone.utc)
+        return modified.replace(microsecond=0) <= since
+    return False
+
+
+def conditional_response(body: bytes, if_none_match: Optional[str] = None, if_modified_since: Optional[str] = None,
+                         last_modified: Optional[datetime] = None, media_type: str = "application/json",
+                         cache_control: str = "no-cache") -> Response:
+    """The body with its validators, or an empty 304 if the client's copy is current"""
+    etag = weak_etag(body)
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+    if last_modified is not None:
+        headers["Last-Modified"] = http_date(last_modified)
+    if not_modified(etag, last_modified, if_none_match, if_modified_since):
+        return Response(status_code=304, headers=headers)
+    return Response(body, media_type=media_type, headers=headers)
+
+
+class StaticResponse:
+    """A constant JSON payload serialized, tagged and compressed once"""
+
+    def __init__(self, content, cache_control: str = "public, max-age=3600"):
+        self.body = orjson.dumps(content)
+        self.etag = weak_etag(self.body)
+        self.cache_control = cache_control
+        self.encoded: Dict[str, bytes] = {}
+        if len(self.body) >= MIN_BYTES:
+            for encoding in (("br", "gzip") if brotli else ("gzip",)):
+                self.encoded[encoding] = compress(self.body, encoding)
+
+    def response(self, if_none_match: Optional[str] = None, accept_encoding: Optional[str] = None) -> Response:
+        headers = {"ETag": self.etag, "Cache-Control": self.cache_control, "Vary": "Accept-Encoding"}
+        if etag_matches(if_none_match, self.etag):
+            return Response(status_code=304, headers=headers)
+        encoding = choose_encoding(accept_encoding or "") if self.encoded else None
+        if encoding in self.encoded:
+            headers["Content-Encoding"] = encoding
+            return Response(self.encoded[encoding], media_type="application/json", headers=headers)
+        return Response(self.body, media_type="application/json", headers=headers)
+
+
+class CompressionMiddleware:
+    """ASGI middleware compressing complete (non-streamed) responses above a size threshold"""
+
+    def __init__(self, app, minimum_size: int = None):
+        self.app = app
+        self.minimum_size = MIN_BYTES if minimum_size is None else minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = choose_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        held_start = None
+
+        async def send_compressed(message):
+            nonlocal held_start
+            if message["type"] == "http.response.start":
+                headers = Headers(raw=message.get("headers", []))
+                if "content-encoding" in headers or not is_compressible(headers.get("content-type", "")):
+                    await send(message)
+                else:
+                    held_start = message  # decide once the first body chunk shows the size
+                return
+            if message["type"] != "http.response.body" or held_start is None:
+                await send(message)
+                return
+
+            start, held_start = held_start, None
+            body = message.get("body", b"")
+            headers = MutableHeaders(raw=list(start.get("headers", [])))
+            headers.add_vary_header("Accept-Encoding")
+            if message.get("more_body", False) or len(body) < self.minimum_size:
+                # Streamed or too small: send as is
+                await send({**start, "headers": headers.raw})
+                await send(message)
+                return
+            if len(body) >= THREAD_COMPRESSION_BYTES:
+                body = await asyncio.get_running_loop().run_in_executor(None, compress, body, encoding)
+            else:
+                body = compress(body, encoding)
+            headers["Content-Encoding"] = encoding
+            headers["Content-Length"] = str(len(body))
+            await send({**start, "headers": headers.raw})
+            await send({"type": "http.response.body", "body": body})
+
+        await self.app(scope, receive, send_compressed)
@@ -0,0 +1,315 @@
+"""
+Asynchronous jobs for heavy image and document work.
+
+Submitting a job stores a job record and returns its ID right away. A fixed pool of
+workers takes jobs from a bounded priority queue and writes the result back to the
+record, so a client whose connection drops can come back for finished work.
+Clients poll ``GET /api/jobs/{id}`` or long-poll it with ``?wait=``. Completion
+is announced on the pub/sub hub, so long-polls work across processes with the Mongo
+pub/sub backend.
+
+Resubmitting is cheap:
+* an ``Idempotency-Key`` returns the job already created under that key;
+* identical work (same payload hash) that is queued, running or recently finished
+  is reused instead of running OCR again.
+
+The queue lives in the process that accepted the job; only the job record is
+persisted. Each process renews a lease on its queued and running jobs. Any
+process fails jobs whose lease has expired with "interrupted", e.g. after a
+restart or a crashed worker, so clients polling them get an answer. Payloads are
+not persisted, so interrupted jobs are not retried. Keys and reuse do not survive
+a restart either: the payload-hash reuse is per process, and an Idempotency-Key
+whose job was interrupted keeps returning that failed job. Clients resubmit under
+a new key.
+
+Configuration:
+    JOB_WORKERS              jobs processed concurrently per process (default 2)
+    JOB_QUEUE_SIZE           queued jobs before submissions are rejected (default 100)
+    JOB_RESULT_CACHE_SIZE    payload hashes remembered for reuse (default 1000)
+    JOB_RESULT_TTL_SECONDS   how long a finished result is reused (default 3600)
+    JOB_QUEUE_BACKEND        "memory" (default)
+    JOB_LEASE_SECONDS        lease on queued/running jobs, renewed every third of it (default 60)
+"""
+
+import asyncio
+import hashlib
+import itertools
+import logging
+import os
+import uuid
+from abc import ABC, abstractmethod
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+import orjson
+from cachetools import TTLCache
+
+from scheduler import RequestPriority, current_priority
+
+logger = logging.getLogger(__name__)
+
+TERMINAL_STATUSES = ("succeeded", "failed", "cancelled")
+JobHandler = Callable[[dict], Awaitable[dict]]
+
+
+class JobQueueFull(Exception):
+    pass
+
+
+class JobConflict(Exception):
+    """An idempotency key was reused for a different request"""
+
+
+def job_topic(job_id: str) -> str:
+    return f"job:{job_id}"
+
+
+def payload_hash(kind: str, payload: dict) -> str:
+    """Stable hash of a job's kind and parameters, used for result reuse and key checks"""
+    return hashlib.sha256(kind.encode() + orjson.dumps(payload, option=orjson.OPT_SORT_KEYS)).hexdigest()
+
+
+class JobQueue(ABC):
+    """Where submitted jobs wait for a worker"""
+
+    @abstractmethod
+    def put(self, priority: int, job_id: str, payload: dict):
+        """Enqueue without waiting; raises JobQueueFull"""
+
+    @abstractmethod
+    async def get(self) -> Tuple[str, dict]:
+        ...
+
+    @abstractmethod
+    def discard(self, job_id: str):
+        """Drop a queued job (cancellation)"""
+
+    @abstractmethod
+    def qsize(self) -> int:
+        ...
+
+    @abstractmethod
+    def full(self) -> bool:
+        ...
+
+
+class InProcessJobQueue(JobQueue):
+    """asyncio priority queue; lower priority values run first, FIFO within a priority"""
+
+    def __init__(self, maxsize: int):
+        self.queue: asyncio.PriorityQueue = asyncio.PriorityQueue(maxsize=maxsize)
+        self.order = itertools.count()
+        self.discarded = set()
+
+    def put(self, priority: int, job_id: str, payload: dict):
+        try:
+            self.queue.put_nowait((priority, next(self.order), job_id, payload))
+        except asyncio.QueueFull:
+            raise JobQueueFull()
+
+    async def get(self) -> Tuple[str, dict]:
+        while True:
+            _, _, job_id, payload = await self.queue.get()
+            if job_id in self.discarded:
+                self.discarded.discard(job_id)
+                continue
+            return job_id, payload
+
+    def discard(self, job_id: str):
+        self.discarded.add(job_id)
+
+    def qsize(self) -> int:
+        return self.queue.qsize() - len(self.discarded)
+
+    def full(self) -> bool:
+        return self.queue.full()
+
+
+def create_job_queue(maxsize: int) -> JobQueue:
+    backend = os.environ.get('JOB_QUEUE_BACKEND', 'memory').lower()
+    if backend == 'memory':
+        return InProcessJobQueue(maxsize)
+    raise ValueError(f"Unknown JOB_QUEUE_BACKEND: {backend}")
+
+
+class JobManager:
+    """Job records in the repository, a bounded queue and a worker pool"""
+
+    def __init__(self, repo, hub, workers: int = None, queue_size: int = None, queue: JobQueue = None):
+        self.repo = repo
+        self.hub = hub
+        self.workers = workers or int(os.environ.get('JOB_WORKERS', 2))
+        self.queue = queue or create_job_queue(queue_size or int(os.environ.get('JOB_QUEUE_SIZE', 100)))
+        self.handlers: Dict[str, JobHandler] = {}
+        # Payload hash -> job ID for work that is queued, running or recently succeeded
+        self.recent: TTLCache = TTLCache(
+            maxsize=int(os.environ.get('JOB_RESULT_CACHE_SIZE', 1000)),
+            ttl=int(os.environ.get('JOB_RESULT_TTL_SECONDS', 3600))
+        )
+        self.running = 0
+        self.tasks: List[asyncio.Task] = []
+        self.owner = uuid.uuid4().hex  # lease holder ID of this process
+        self.lease_seconds = int(os.environ.get('JOB_LEASE_SECONDS', 60))
+
+    def register(self, kind: str, handler: JobHandler):
+        self.handlers[kind] = handler
+
+    def start(self) -> List[asyncio.Task]:
+        self.tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        self.tasks.append(asyncio.create_task(self._lease_loop()))
+        return self.tasks
+
+    async def close(self):
+        for task in self.tasks:
+            task.cancel()
+
+    async def submit(self, kind: str, payload: dict, priority: int = 5, idempotency_key: Optional[str] = None,
+                     scheduling: RequestPriority = None) -> Tuple[dict, bool]:
+        """Create (or reuse) a job; returns the job and whether it was newly created.
+
+        ``scheduling`` is the submitter's priority class and client key; the job's
+        LLM and OCR work is scheduled under them, without the request's deadline.
+        """
+        scheduling = scheduling or RequestPriority("bulk")
+        request_hash = payload_hash(kind, payload)
+        if idempotency_key:
+            existing = await self._existing_for_key(idempotency_key, request_hash)
+            if existing:
+                return existing, False
+
+        reusable = await self._reusable(request_hash)
+        if reusable and reusable["status"] != "succeeded":
+            # Identical work already queued or running: share it
+            return reusable, False
+
+        now = datetime.utcnow()
+        job = {
+            "id": str(uuid.uuid4()),
+            "kind": kind,
+            "status": "queued",
+            "priority": priority,
+            "priority_class": scheduling.priority_class,
+            "client_id": scheduling.client_id,
+            "request_hash": request_hash,
+            "owner": self.owner,
+            "heartbeat_at": now,
+            "created_at": now,
+            "timestamp": now,
+            "started_at": None,
+            "finished_at": None,
+            "result": None,
+            "error": None
+        }
+        if idempotency_key:
+            job["idempotency_key"] = idempotency_key
+        if reusable:
+            job.update(status="succeeded", finished_at=now, result=reusable["result"], cached=True)
+        elif self.queue.full():
+            raise JobQueueFull()
+
+        if not await self.repo.insert_job(job):
+            # Lost a race with a concurrent retry using the same key
+            return await self._existing_for_key(idempotency_key, request_hash), False
+        if job["status"] == "queued":
+            try:
+                self.queue.put(priority, job["id"], payload)
+            except JobQueueFull:
+                await self.repo.update_job(
+                    job["id"], {"status": "failed", "error": "Job queue is full", "finished_at": datetime.utcnow()}
+                )
+                raise
+            self.recent[request_hash] = job["id"]
+        return job, True
+
+    async def _existing_for_key(self, idempotency_key: str, request_hash: str) -> Optional[dict]:
+        existing = await self.repo.find_job_by_idempotency_key(idempotency_key)
+        if existing and existing["request_hash"] != request_hash:
+            raise JobConflict()
+        return existing
+
+    async def _reusable(self, request_hash: str) -> Optional[dict]:
+        job_id = self.recent.get(request_hash)
+        if job_id is None:
+            return None
+        job = await self.repo.get_job(job_id)
+        if job is None or job["status"] in ("failed", "cancelled"):
+            self.recent.pop(request_hash, None)
+            return None
+        return job
+
+    async def get(self, job_id: str, wait: float = 0) -> Optional[dict]:
+        """Current job state, waiting up to ``wait`` seconds for it to finish"""
+        if wait <= 0:
+            return await self.repo.get_job(job_id)
+        # Subscribe before reading so a completion between the two is not missed
+        with self.hub.subscribe(job_topic(job_id)) as subscription:
+            job = await self.repo.get_job(job_id)
+            if job is None or job["status"] in TERMINAL_STATUSES:
+                return job
+            try:
+                await asyncio.wait_for(subscription.get(), timeout=wait)
+            except asyncio.TimeoutError:
+                pass
+        return await self.repo.get_job(job_id)
+
+    async def cancel(self, job_id: str) -> bool:
+        """Cancel a job that has not started yet"""
+        cancelled = await self.repo.update_job(
+            job_id, {"status": "cancelled", "finished_at": datetime.utcnow()}, expected_status="queued"
+        )
+        if cancelled:
+            self.queue.discard(job_id)
+            await self.hub.publish(job_topic(job_id), {"id": job_id, "status": "cancelled"})
+        return cancelled
+
+    def stats(self) -> dict:
+        return {"workers": self.workers, "running": self.running, "queued": self.queue.qsize()}
+
+    async def renew_leases(self) -> List[str]:
+        """Renew this process's leases and fail jobs whose owner has gone away; their IDs"""
+        now = datetime.utcnow()
+        await self.repo.renew_job_leases(self.owner, now)
+        expired = await self.repo.fail_expired_jobs(now - timedelta(seconds=self.lease_seconds), "interrupted")
+        for job_id in expired:
+            await self.hub.publish(job_topic(job_id), {"id": job_id, "status": "failed"})
+        if expired:
+            logger.warning(f"Failed {len(expired)} interrupted jobs")
+        return expired
+
+    async def _lease_loop(self):
+        while True:
+            try:
+                await self.renew_leases()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Job lease renewal failed: {e}")
+            await asyncio.sleep(self.lease_seconds / 3)
+
+    async def _worker(self):
+        while True:
+            job_id, payload = await self.queue.get()
+            claimed = await self.repo.update_job(
+                job_id, {"status": "running", "started_at": datetime.utcnow()}, expected_status="queued"
+            )
+            if not claimed:
+                continue
+            self.running += 1
+            try:
+                job = await self.repo.get_job(job_id)
+                current_priority.set(RequestPriority(job.get("priority_class", "bulk"), job.get("client_id", "anonymous")))
+                result = await self.handlers[job["kind"]](payload)
+                update = {"status": "succeeded", "result": result}
+            except asyncio.CancelledError:
+                await self.repo.update_job(
+                    job_id, {"status": "failed", "error": "Server shutting down", "finished_at": datetime.utcnow()}
+                )
+                raise
+            except Exception as e:
+                logger.error(f"Job {job_id} failed: {e}")
+                update = {"status": "failed", "error": getattr(e, "detail", None) or str(e)}
+            finally:
+                self.running -= 1
+            update["finished_at"] = datetime.utcnow()
+            await self.repo.update_job(job_id, update)
+            await self.hub.publish(job_topic(job_id), {"id": job_id, "status": update["status"]})
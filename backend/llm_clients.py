@@ -0,0 +1,68 @@
+"""
+Alternative LLM transport for self-hosted or stub endpoints.
+
+When LLM_BASE_URL is set, translation prompts go to an OpenAI-compatible
+``/chat/completions`` endpoint instead of the Emergent integration. This covers
+local model servers and the benchmark suite's stub LLM server. The chat object
+mirrors the ``send_message(UserMessage)`` interface the handlers already use.
+
+Configuration:
+    LLM_BASE_URL        e.g. http://127.0.0.1:8099/v1
+    LLM_API_KEY         bearer token for that endpoint (optional)
+    LLM_TIMEOUT_SECONDS request timeout (default 60)
+"""
+
+import os
+from typing import Optional
+
+import httpx
+
+_http_client: Optional[httpx.AsyncClient] = None
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """Shared connection pool for all LLM requests"""
+    global _http_client
+    if _http_client is None:
+        timeout = float(os.environ.get('LLM_TIMEOUT_SECONDS', 60))
+        _http_client = httpx.AsyncClient(
+            timeout=timeout, limits=httpx.Limits(max_connections=200, max_keepalive_connections=50)
+        )
+    return _http_client
+
+
+async def close_http_client():
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+
+
+class OpenAICompatibleChat:
+    """Single-turn chat against an OpenAI-compatible endpoint"""
+
+    def __init__(self, base_url: str, system_message: str, model: str = "gpt-4o", api_key: Optional[str] = None):
+        self.url = base_url.rstrip("/") + "/chat/completions"
+        self.system_message = system_message
+        self.model = model
+        self.api_key = api_key
+        self.last_usage: Optional[dict] = None
+
+    def with_model(self, provider: str, model: str) -> "OpenAICompatibleChat":
+        self.model = model
+        return self
+
+    async def send_message(self, message) -> str:
+        headers = {"Authorization": f"Bearer {self.api_key}"} if self.api_key else {}
+        payload = {
+            "model": self.model,
+            "messages": [
+                {"role": "system", "content": self.system_message},
+                {"role": "user", "content": message.text}
+            ]
+        }
+        response = await get_http_client().post(self.url, json=payload, headers=headers)
+        response.raise_for_status()
+        data = response.json()
+        self.last_usage = data.get("usage")
+        return data["choices"][0]["message"]["content"]
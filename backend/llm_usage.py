@@ -0,0 +1,156 @@
+"""
+LLM token and cost accounting.
+
+Every LLM call is recorded with its prompt and completion token counts, labelled
+by endpoint, model, prompt template (detect_language, translate, summarize) and
+language pair. Counts come from the provider's ``usage`` block when the transport
+reports one (``OpenAICompatibleChat.last_usage``). Otherwise they are estimated with
+tiktoken, or with a characters/4 heuristic if tiktoken is not installed. Translation
+cache hits are counted under the same labels, so the saving from caching shows up
+next to the spend.
+
+Counters accumulate in memory and are flushed in batches as ``$inc`` upserts into
+per-day rows, so the request path never waits on a database write. The report
+(GET /api/llm/usage) shows spend, so it requires the admin token.
+
+Configuration:
+    LLM_USAGE_FLUSH_SECONDS          flush interval (default 60, 0 disables the loop)
+    LLM_PROMPT_PRICE_PER_MTOK        USD per million prompt tokens (default 2.50)
+    LLM_COMPLETION_PRICE_PER_MTOK    USD per million completion tokens (default 10.00)
+"""
+
+import asyncio
+import logging
+import os
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+try:
+    import tiktoken
+except ImportError:  # pragma: no cover - optional
+    tiktoken = None
+
+logger = logging.getLogger(__name__)
+
+COUNTER_FIELDS = ("calls", "errors", "estimated_calls", "prompt_tokens", "completion_tokens", "cache_hits")
+
+_encodings: Dict[str, object] = {}
+
+
+def count_tokens(text: str, model: str) -> int:
+    """Token count for ``text`` under ``model``'s tokenizer (approximate without tiktoken)"""
+    if tiktoken is None:
+        return max(1, len(text) // 4) if text else 0
+    encoding = _encodings.get(model)
+    if encoding is None:
+        try:
+            encoding = tiktoken.encoding_for_model(model)
+        except KeyError:
+            encoding = tiktoken.get_encoding("o200k_base")
+        _encodings[model] = encoding
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+class LLMUsageTracker:
+    """In-memory usage counters with periodic batched flushes to the repository"""
+
+    def __init__(self, repo, flush_seconds: int = None):
+        self.repo = repo
+        self.flush_seconds = (
+            flush_seconds if flush_seconds is not None else int(os.environ.get('LLM_USAGE_FLUSH_SECONDS', 60))
+        )
+        self.prompt_price = float(os.environ.get('LLM_PROMPT_PRICE_PER_MTOK', 2.50))
+        self.completion_price = float(os.environ.get('LLM_COMPLETION_PRICE_PER_MTOK', 10.00))
+        self.pending: Dict[tuple, Dict[str, int]] = {}
+        self.task: Optional[asyncio.Task] = None
+
+    def _counters(self, endpoint: str, model: str, template: str, language_pair: str) -> Dict[str, int]:
+        day = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+        key = (day, endpoint, model, template, language_pair)
+        counters = self.pending.get(key)
+        if counters is None:
+            counters = self.pending[key] = dict.fromkeys(COUNTER_FIELDS, 0)
+        return counters
+
+    def record_call(self, endpoint: str, model: str, template: str, language_pair: str,
+                    prompt: str, completion: Optional[str], usage: Optional[dict] = None):
+        """Record one LLM call; ``completion`` is None when the call failed"""
+        counters = self._counters(endpoint, model, template, language_pair)
+        counters["calls"] += 1
+        if completion is None:
+            counters["errors"] += 1
+        if usage and "prompt_tokens" in usage:
+            counters["prompt_tokens"] += usage["prompt_tokens"]
+            counters["completion_tokens"] += usage.get("completion_tokens") or 0
+            return
+        counters["estimated_calls"] += 1
+        counters["prompt_tokens"] += count_tokens(prompt, model)
+        if completion:
+            counters["completion_tokens"] += count_tokens(completion, model)
+
+    def record_cache_hit(self, endpoint: str, model: str, template: str, language_pair: str):
+        self._counters(endpoint, model, template, language_pair)["cache_hits"] += 1
+
+    def cost(self, prompt_tokens: int, completion_tokens: int) -> float:
+        return (prompt_tokens * self.prompt_price + completion_tokens * self.completion_price) / 1_000_000
+
+    async def flush(self):
+        """Write pending counters as one batch of increments"""
+        if not self.pending:
+            return
+        pending, self.pending = self.pending, {}
+        rows = [
+            {"day": key[0], "endpoint": key[1], "model": key[2], "template": key[3], "language_pair": key[4], **counters}
+            for key, counters in pending.items()
+        ]
+        try:
+            await self.repo.increment_llm_usage(rows)
+        except Exception as e:
+            logger.error(f"LLM usage flush failed: {e}")
+            # Put the counters back so the next flush retries them
+            for key, counters in pending.items():
+                merged = self.pending.setdefault(key, dict.fromkeys(COUNTER_FIELDS, 0))
+                for field in COUNTER_FIELDS:
+                    merged[field] += counters[field]
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.flush_seconds)
+            await self.flush()
+
+    def start(self) -> Optional[asyncio.Task]:
+        if self.flush_seconds <= 0:
+            return None
+        self.task = asyncio.create_task(self._flush_loop())
+        return self.task
+
+    async def close(self):
+        if self.task:
+            self.task.cancel()
+        await self.flush()
+
+    async def report(self, days: int, group_by: List[str]) -> List[dict]:
+        """Persisted plus not-yet-flushed usage since ``days`` ago, grouped and sorted by cost"""
+        since = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0) - timedelta(days=days - 1)
+        rows = await self.repo.llm_usage(since)
+        rows += [
+            {"day": key[0], "endpoint": key[1], "model": key[2], "template": key[3], "language_pair": key[4], **counters}
+            for key, counters in self.pending.items() if key[0] >= since
+        ]
+        groups: Dict[tuple, dict] = {}
+        for row in rows:
+            key = tuple(row[field] for field in group_by)
+            group = groups.get(key)
+            if group is None:
+                group = groups[key] = {**dict(zip(group_by, key)), **dict.fromkeys(COUNTER_FIELDS, 0)}
+            for field in COUNTER_FIELDS:
+                group[field] += row.get(field) or 0
+        report = []
+        for group in groups.values():
+            group["total_tokens"] = group["prompt_tokens"] + group["completion_tokens"]
+            group["cost_usd"] = round(self.cost(group["prompt_tokens"], group["completion_tokens"]), 6)
+            lookups = group["calls"] + group["cache_hits"]
+            group["cache_hit_rate"] = group["cache_hits"] / lookups if lookups else 0.0
+            group["avg_prompt_tokens"] = group["prompt_tokens"] / group["calls"] if group["calls"] else None
+            report.append(group)
+        return sorted(report, key=lambda group: group["cost_usd"], reverse=True)
@@ -0,0 +1,191 @@
+"""
+Per-stage latency instrumentation.
+
+Handlers wrap each stage (base64 decode, image decode, preprocessing, OCR, language
+detection, LLM call, DB write) in ``stage(...)``. Timings are collected per request
+and, once the request finishes, observed into Prometheus histograms labelled by
+endpoint and language pair. That way stages that run before language detection
+still get the final pair label. The same timings go back to the client in a
+``Server-Timing`` header.
+"""
+
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Tuple
+
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram, generate_latest, multiprocess
+
+LABEL_LANGUAGES = {"auto", "none"}
+
+STAGE_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+STAGE_SECONDS = Histogram(
+    "translation_stage_seconds", "Time spent per processing stage",
+    ["stage", "endpoint", "language_pair"], buckets=STAGE_BUCKETS
+)
+REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds", "End-to-end request latency",
+    ["endpoint", "method", "status"], buckets=STAGE_BUCKETS
+)
+REQUESTS_TOTAL = Counter("http_requests_total", "Requests served", ["endpoint", "method", "status"])
+LOOP_LAG_SECONDS = Histogram(
+    "event_loop_lag_seconds", "Delay between scheduled and actual wake-up of the lag probe",
+    buckets=STAGE_BUCKETS
+)
+SCHEDULER_QUEUE_DEPTH = Gauge(
+    "scheduler_queue_depth", "Work waiting for LLM/OCR capacity", ["scheduler", "priority_class"],
+    multiprocess_mode="livesum"
+)
+SCHEDULER_WAIT_SECONDS = Histogram(
+    "scheduler_wait_seconds", "Time waiting for LLM/OCR capacity",
+    ["scheduler", "priority_class"], buckets=STAGE_BUCKETS
+)
+SCHEDULER_DROPPED_TOTAL = Counter(
+    "scheduler_dropped_total", "Work dropped because its deadline passed before it started",
+    ["scheduler", "priority_class"]
+)
+
+ADMISSION_ACTIVE = Gauge(
+    "admission_requests", "Work requests admitted (running) or waiting for admission (queued)",
+    ["endpoint_class", "state"], multiprocess_mode="livesum"
+)
+ADMISSION_REJECTED_TOTAL = Counter(
+    "admission_rejected_total", "Work requests shed at the API edge", ["endpoint_class", "reason"]
+)
+
+GLOSSARY_TERMS_TOTAL = Counter(
+    "glossary_terms_total", "Glossary terms required in translations, by whether the output followed them",
+    ["outcome"]
+)
+
+OCR_TIER_TOTAL = Counter(
+    "ocr_tier_total", "Images OCR'd per tier, by whether the tier was requested or chosen automatically",
+    ["tier", "selection"]
+)
+
+CACHE_WARMUP_TRANSLATIONS_TOTAL = Counter(
+    "cache_warmup_translations_total", "Translations pre-computed by the cache warm-up job", ["outcome"]
+)
+CACHE_WARMUP_COVERAGE = Gauge(
+    "cache_warmup_coverage_ratio", "Share of the planned (text, language) pairs in the translation cache",
+    multiprocess_mode="min"
+)
+
+
+class RequestTimings:
+    """Stage timings and labels collected while one request is handled"""
+
+    def __init__(self, scope: Optional[dict] = None):
+        self.scope = scope
+        self.stages: List[Tuple[str, float]] = []
+        self.language_pair = "none"
+
+    def server_timing(self, total: float) -> str:
+        durations: Dict[str, float] = {}
+        for name, seconds in self.stages:
+            durations[name] = durations.get(name, 0.0) + seconds
+        entries = [f"{name};dur={seconds * 1000:.1f}" for name, seconds in durations.items()]
+        entries.append(f"total;dur={total * 1000:.1f}")
+        return ", ".join(entries)
+
+
+current_timings: ContextVar[Optional[RequestTimings]] = ContextVar("current_timings", default=None)
+
+
+def record_stage(name: str, seconds: float):
+    timings = current_timings.get()
+    if timings is not None:
+        timings.stages.append((name, seconds))
+    else:
+        # Outside a request (background jobs): observe immediately
+        STAGE_SECONDS.labels(name, "background", "none").observe(seconds)
+
+
+@contextmanager
+def stage(name: str):
+    """Time a block as the named stage of the current request"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(name, time.perf_counter() - start)
+
+
+def register_label_languages(codes):
+    """Language codes allowed in language_pair labels; any other code is reported as other"""
+    LABEL_LANGUAGES.update(codes)
+
+
+def language_pair_label(source_language: str, target_language: str) -> str:
+    """Language pair label with client-supplied codes bounded to the registered ones"""
+    source = source_language if source_language in LABEL_LANGUAGES else "other"
+    target = target_language if target_language in LABEL_LANGUAGES else "other"
+    return f"{source}-{target}"
+
+
+def set_language_pair(source_language: str, target_language: str):
+    timings = current_timings.get()
+    if timings is not None:
+        timings.language_pair = language_pair_label(source_language, target_language)
+
+
+def route_label(scope) -> str:
+    """Route template (not the raw path) to keep label cardinality bounded"""
+    route = scope.get("route")
+    return getattr(route, "path", None) or "unmatched"
+
+
+def current_endpoint() -> str:
+    """Route template of the request being handled, "background" outside one"""
+    timings = current_timings.get()
+    if timings is None or timings.scope is None:
+        return "background"
+    return route_label(timings.scope)
+
+
+class MetricsMiddleware:
+    """ASGI middleware that owns the per-request timings, Server-Timing header and histograms"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timings = RequestTimings(scope)
+        token = current_timings.set(timings)
+        start = time.perf_counter()
+        status = 500
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", timings.server_timing(time.perf_counter() - start).encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            current_timings.reset(token)
+            endpoint = route_label(scope)
+            for name, seconds in timings.stages:
+                STAGE_SECONDS.labels(name, endpoint, timings.language_pair).observe(seconds)
+            labels = (endpoint, scope["method"], str(status))
+            REQUEST_SECONDS.labels(*labels).observe(time.perf_counter() - start)
+            REQUESTS_TOTAL.labels(*labels).inc()
+
+
+def render_metrics() -> Tuple[bytes, str]:
+    """Prometheus exposition body and content type (aggregated over workers under serve.py)"""
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(), CONTENT_TYPE_LATEST
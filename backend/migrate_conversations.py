@@ -0,0 +1,114 @@
+"""
+One-off migration from the legacy conversation layout to sequence-numbered messages.
+
+Legacy conversations kept an ever-growing ``messages`` array of message IDs on the
+conversation document. This script numbers each conversation's messages by
+timestamp, stores the counters and last-message summary on the conversation and
+drops the array. It is safe to re-run: already migrated conversations are skipped.
+
+Deploy order: run this before the sequence-numbering server takes traffic. Until
+it has run, legacy messages have no ``sequence`` and are missing from
+``after_sequence`` queries. If the new server is already live, the script still
+works: it reserves a block of sequence numbers above the ones the server has
+handed out, through the same atomic counter, so nothing collides with the unique
+(conversation_id, sequence) index. In that case legacy messages sort after the
+messages posted since the deploy.
+
+Usage (from the backend directory):
+    python migrate_conversations.py
+"""
+
+import asyncio
+import logging
+import os
+from pathlib import Path
+
+from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ASCENDING, ReturnDocument, UpdateOne
+
+ROOT_DIR = Path(__file__).parent
+load_dotenv(ROOT_DIR / '.env')
+
+MESSAGE_PREVIEW_LENGTH = 200
+BATCH_SIZE = 500
+
+logger = logging.getLogger(__name__)
+
+
+async def migrate_conversation(db, conversation: dict) -> int:
+    """Assign sequence numbers to one conversation's unnumbered messages and compact the parent"""
+    conversation_id = conversation["id"]
+    query = {"conversation_id": conversation_id, "sequence": {"$exists": False}}
+    count = await db.conversation_messages.count_documents(query)
+
+    # Reserve a block above every number handed out so far, as the server does per message
+    reserved = await db.conversations.find_one_and_update(
+        {"id": conversation_id},
+        {"$inc": {"message_count": count, "last_sequence": count}},
+        projection={"_id": 0, "last_sequence": 1},
+        return_document=ReturnDocument.AFTER
+    )
+    sequence = reserved["last_sequence"] - count
+    last_message = None
+    batch = []
+
+    cursor = db.conversation_messages.find(query).sort([("timestamp", ASCENDING), ("_id", ASCENDING)])
+    async for message in cursor:
+        sequence += 1
+        batch.append(UpdateOne({"_id": message["_id"]}, {"$set": {"sequence": sequence}}))
+        last_message = {
+            "id": message["id"],
+            "sequence": sequence,
+            "sender_id": message.get("sender_id"),
+            "message_type": message.get("message_type"),
+            "source_language": message.get("source_language"),
+            "preview": (message.get("original_text") or "")[:MESSAGE_PREVIEW_LENGTH],
+            "timestamp": message.get("timestamp")
+        }
+        if len(batch) >= BATCH_SIZE:
+            await db.conversation_messages.bulk_write(batch, ordered=False)
+            batch = []
+    if batch:
+        await db.conversation_messages.bulk_write(batch, ordered=False)
+
+    update = {"$unset": {"messages": ""}}
+    updated_at = conversation.get("updated_at") or conversation.get("created_at")
+    if updated_at is not None:
+        update["$max"] = {"updated_at": updated_at}
+    await db.conversations.update_one({"id": conversation_id}, update)
+    if last_message is not None:
+        # Messages posted through the new server are more recent than any legacy one
+        await db.conversations.update_one(
+            {"id": conversation_id, "last_message": None},
+            {"$set": {"last_message": last_message}}
+        )
+    return count
+
+
+async def migrate(db) -> dict:
+    """Migrate every conversation that still carries a messages array"""
+    conversations = 0
+    messages = 0
+    cursor = db.conversations.find({"messages": {"$exists": True}}, {"messages": 0})
+    async for conversation in cursor:
+        messages += await migrate_conversation(db, conversation)
+        conversations += 1
+    logger.info(f"Migrated {conversations} conversations ({messages} messages)")
+    return {"conversations": conversations, "messages": messages}
+
+
+async def main():
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+    try:
+        await migrate(client[os.environ['DB_NAME']])
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    asyncio.run(main())
@@ -0,0 +1,159 @@
+"""
+Adaptive OCR tiers.
+
+Images differ a lot: a clean screenshot needs neither denoising nor a large
+detector input, while a blurry, low-contrast photo of a street sign needs more
+than the default pipeline. Each image is therefore OCR'd with one of three tiers:
+
+    fast       no denoising or sharpening, smaller detector canvas; an image that
+               is a single line of text skips text detection entirely
+    standard   median blur + sharpen, EasyOCR default detector input (the
+               original pipeline)
+    accurate   contrast equalization (CLAHE) + denoise + sharpen, upscaled
+               detector input and stronger contrast adjustment in recognition
+
+With ``auto`` (the default), a cheap quality estimate decides. The estimate
+is computed on a downscaled grayscale copy and takes about a millisecond. It
+uses sharpness (strongest Laplacian responses, i.e. how crisp the text edges
+are), contrast (spread between the darkest and lightest 0.1%), noise
+(median deviation from a 3x3 median filter) and text density (share of edge
+pixels). Requests can override the choice with ``ocr_tier``.
+
+Configuration:
+    OCR_DEFAULT_TIER      auto | fast | standard | accurate (default auto)
+"""
+
+import os
+from typing import List, Optional
+
+import cv2
+import numpy as np
+
+QUALITY_SAMPLE_SIDE = 512
+SINGLE_LINE_MAX_HEIGHT = 96
+SINGLE_LINE_MIN_ASPECT = 4.0
+
+# Quality thresholds, on the downscaled sample
+BLURRY_SHARPNESS = 60.0    # 99.5th percentile of |Laplacian| below this: out of focus or motion blur
+SHARP_SHARPNESS = 150.0    # above this: crisp rendering such as a screenshot
+LOW_CONTRAST = 80.0        # 0.1th to 99.9th intensity percentile
+HIGH_CONTRAST = 150.0
+MAX_CLEAN_NOISE = 1.0      # median absolute deviation from the median-filtered image
+MAX_CLEAN_DENSITY = 0.12   # edge-pixel share; cluttered scenes are never "clean"
+
+SHARPEN_KERNEL = np.array([[-1, -1, -1], [-1, 9, -1], [-1, -1, -1]])
+
+
+class OCRTier:
+    def __init__(self, name: str, denoise: bool, sharpen: bool, equalize: bool, canvas_size: int,
+                 mag_ratio: float, adjust_contrast: float, skip_detection_for_single_line: bool, cost: float):
+        self.name = name
+        self.denoise = denoise
+        self.sharpen = sharpen
+        self.equalize = equalize
+        self.canvas_size = canvas_size
+        self.mag_ratio = mag_ratio
+        self.adjust_contrast = adjust_contrast
+        self.skip_detection_for_single_line = skip_detection_for_single_line
+        self.cost = cost  # relative OCR time, used as the scheduling cost
+
+
+TIERS = {
+    "fast": OCRTier("fast", denoise=False, sharpen=False, equalize=False, canvas_size=1280, mag_ratio=1.0,
+                    adjust_contrast=0.5, skip_detection_for_single_line=True, cost=0.5),
+    "standard": OCRTier("standard", denoise=True, sharpen=True, equalize=False, canvas_size=2560, mag_ratio=1.0,
+                        adjust_contrast=0.5, skip_detection_for_single_line=False, cost=1.0),
+    "accurate": OCRTier("accurate", denoise=True, sharpen=True, equalize=True, canvas_size=3200, mag_ratio=1.5,
+                        adjust_contrast=0.7, skip_detection_for_single_line=False, cost=2.0),
+}
+TIER_NAMES = ("auto",) + tuple(TIERS)
+
+
+class ImageQuality:
+    def __init__(self, sharpness: float, contrast: float, noise: float, text_density: float, width: int, height: int):
+        self.sharpness = sharpness
+        self.contrast = contrast
+        self.noise = noise
+        self.text_density = text_density
+        self.width = width
+        self.height = height
+
+    def dict(self) -> dict:
+        return {
+            "sharpness": round(self.sharpness, 1),
+            "contrast": round(self.contrast, 1),
+            "noise": round(self.noise, 1),
+            "text_density": round(self.text_density, 3),
+            "width": self.width,
+            "height": self.height
+        }
+
+
+def to_gray(image_array: np.ndarray) -> np.ndarray:
+    """8-bit single-channel copy of an image array of any channel count and depth"""
+    if image_array.dtype == bool:
+        image_array = image_array.astype(np.uint8) * 255
+    elif image_array.dtype != np.uint8:
+        image_array = cv2.normalize(image_array, None, 0, 255, cv2.NORM_MINMAX, dtype=cv2.CV_8U)
+    if image_array.ndim == 3:
+        channels = image_array.shape[2]
+        if channels == 1 or channels == 2:
+            return np.ascontiguousarray(image_array[:, :, 0])  # gray (+ alpha)
+        code = cv2.COLOR_BGRA2GRAY if channels == 4 else cv2.COLOR_BGR2GRAY
+        return cv2.cvtColor(image_array, code)
+    return image_array
+
+
+def estimate_quality(gray: np.ndarray) -> ImageQuality:
+    height, width = gray.shape[:2]
+    scale = QUALITY_SAMPLE_SIDE / max(height, width)
+    sample = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA) if scale < 1 else gray
+    # Percentiles rather than variances, so that a sparse line of text on a plain
+    # background scores as crisp and contrasted as a full page
+    sharpness = float(np.percentile(np.abs(cv2.Laplacian(sample, cv2.CV_16S)), 99.5))
+    darkest, lightest = np.percentile(sample, (0.1, 99.9))
+    noise = float(np.median(cv2.absdiff(sample, cv2.medianBlur(sample, 3))))
+    text_density = float(np.count_nonzero(cv2.Canny(sample, 100, 200))) / sample.size
+    return ImageQuality(sharpness, float(lightest - darkest), noise, text_density, width, height)
+
+
+def is_single_line(gray: np.ndarray) -> bool:
+    """A short, wide crop: one line of text, where detection would only find the whole image"""
+    height, width = gray.shape[:2]
+    return height <= SINGLE_LINE_MAX_HEIGHT and width / max(height, 1) >= SINGLE_LINE_MIN_ASPECT
+
+
+def choose_tier(quality: ImageQuality) -> OCRTier:
+    if quality.sharpness < BLURRY_SHARPNESS or quality.contrast < LOW_CONTRAST:
+        return TIERS["accurate"]
+    if (quality.sharpness >= SHARP_SHARPNESS and quality.contrast >= HIGH_CONTRAST
+            and quality.noise <= MAX_CLEAN_NOISE and quality.text_density <= MAX_CLEAN_DENSITY):
+        return TIERS["fast"]
+    return TIERS["standard"]
+
+
+def resolve_tier(requested: Optional[str], gray: np.ndarray) -> OCRTier:
+    """The requested tier, or the estimator's choice for "auto" / no request"""
+    requested = requested or os.environ.get('OCR_DEFAULT_TIER', 'auto')
+    if requested in TIERS:
+        return TIERS[requested]
+    return choose_tier(estimate_quality(gray))
+
+
+def preprocess(gray: np.ndarray, tier: OCRTier) -> np.ndarray:
+    image = gray
+    if tier.equalize:
+        image = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8)).apply(image)
+    if tier.denoise:
+        image = cv2.medianBlur(image, 3)
+    if tier.sharpen:
+        image = cv2.filter2D(image, -1, SHARPEN_KERNEL)
+    return image
+
+
+def run_ocr(reader, image: np.ndarray, tier: OCRTier) -> List[str]:
+    """Blocking OCR of a preprocessed grayscale image with the tier's settings; text paragraphs"""
+    if tier.skip_detection_for_single_line and is_single_line(image):
+        return reader.recognize(image, detail=0, paragraph=True, adjust_contrast=tier.adjust_contrast)
+    return reader.readtext(image, detail=0, paragraph=True, canvas_size=tier.canvas_size,
+                           mag_ratio=tier.mag_ratio, adjust_contrast=tier.adjust_contrast)
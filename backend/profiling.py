@@ -0,0 +1,238 @@
+"""
+On-demand profiling for live traffic.
+
+* ``SamplingProfiler`` samples thread stacks with ``sys._current_frames()`` and
+  produces collapsed ("folded") stacks, the input format of flamegraph.pl and
+  speedscope. It runs for a fixed window or for the duration of one request.
+* ``LoopLagMonitor`` measures event-loop lag. A watchdog thread captures the loop
+  thread's stack whenever the loop has been blocked longer than a threshold, for
+  example by CPU work in OCR or serialization that slipped onto the loop.
+
+All of this is exposed only through admin-token protected endpoints.
+
+Configuration:
+    ADMIN_TOKEN              required for the profiling endpoints and X-Profile header
+    LOOP_LAG_INTERVAL_MS     lag probe interval (default 100)
+    LOOP_LAG_THRESHOLD_MS    blocked-loop threshold for stack capture (default 250)
+"""
+
+import asyncio
+import hmac
+import logging
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, OrderedDict, deque
+from typing import Dict, Optional
+
+from metrics import LOOP_LAG_SECONDS
+
+logger = logging.getLogger(__name__)
+
+MAX_STACK_DEPTH = 128
+MAX_STORED_PROFILES = 20
+
+
+def admin_token_valid(token: Optional[str]) -> bool:
+    expected = os.environ.get('ADMIN_TOKEN')
+    return bool(expected and token and hmac.compare_digest(token, expected))
+
+
+def folded_stack(frame, thread_name: str) -> str:
+    """Root-first "thread;module:function:line;..." representation of a frame"""
+    parts = []
+    while frame is not None and len(parts) < MAX_STACK_DEPTH:
+        code = frame.f_code
+        module = frame.f_globals.get("__name__", "?")
+        parts.append(f"{module}:{code.co_name}:{frame.f_lineno}")
+        frame = frame.f_back
+    parts.append(thread_name)
+    return ";".join(reversed(parts))
+
+
+def format_folded(counts: Counter) -> str:
+    return "\n".join(f"{stack} {count}" for stack, count in counts.most_common()) + "\n"
+
+
+class SamplingProfiler:
+    """Samples the stacks of all (or selected) threads at a fixed interval on a background thread"""
+
+    def __init__(self, interval: float = 0.005, thread_ids: Optional[set] = None):
+        self.interval = interval
+        self.thread_ids = thread_ids
+        self.counts: Counter = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> str:
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+        return format_folded(self.counts)
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own or (self.thread_ids and thread_id not in self.thread_ids):
+                    continue
+                self.counts[folded_stack(frame, names.get(thread_id, str(thread_id)))] += 1
+            self.samples += 1
+
+
+class ProfileStore:
+    """Keeps the most recent per-request profiles for retrieval by ID"""
+
+    def __init__(self, maxsize: int = MAX_STORED_PROFILES):
+        self.maxsize = maxsize
+        self.profiles: "OrderedDict[str, dict]" = OrderedDict()
+
+    def add(self, profile_id: str, profile: dict):
+        self.profiles[profile_id] = profile
+        while len(self.profiles) > self.maxsize:
+            self.profiles.popitem(last=False)
+
+    def get(self, profile_id: str) -> Optional[dict]:
+        return self.profiles.get(profile_id)
+
+
+profile_lock = threading.Lock()  # one sampler at a time keeps overhead predictable
+profile_store = ProfileStore()
+
+
+async def profile_for(seconds: float, interval: float) -> Optional[str]:
+    """Sample every thread for a window; None if another profile is already running"""
+    if not profile_lock.acquire(blocking=False):
+        return None
+    try:
+        profiler = SamplingProfiler(interval)
+        profiler.start()
+        await asyncio.sleep(seconds)
+        return profiler.stop()
+    finally:
+        profile_lock.release()
+
+
+class RequestProfilerMiddleware:
+    """Profiles a single request when it carries ``X-Profile: 1`` and a valid ``X-Admin-Token``.
+
+    Samples cover every thread (OCR runs in the executor) for the request's lifetime, so
+    concurrent requests on the same loop show up as well. The profile ID comes back in
+    ``X-Profile-Id``; fetch it from /api/admin/profiles/{id}.
+    """
+
+    def __init__(self, app, interval: float = 0.002):
+        self.app = app
+        self.interval = interval
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        headers = dict(scope.get("headers") or [])
+        if headers.get(b"x-profile") != b"1" or not admin_token_valid(headers.get(b"x-admin-token", b"").decode()):
+            await self.app(scope, receive, send)
+            return
+        if not profile_lock.acquire(blocking=False):
+            await self.app(scope, receive, send)
+            return
+
+        profiler = SamplingProfiler(self.interval)
+        profile_id = str(uuid.uuid4())
+        started = time.perf_counter()
+
+        async def send_with_profile_id(message):
+            if message["type"] == "http.response.start":
+                message = {**message, "headers": list(message.get("headers", [])) + [(b"x-profile-id", profile_id.encode())]}
+            await send(message)
+
+        profiler.start()
+        try:
+            await self.app(scope, receive, send_with_profile_id)
+        finally:
+            folded = profiler.stop()
+            profile_lock.release()
+            profile_store.add(profile_id, {
+                "path": scope.get("path"),
+                "duration_ms": round((time.perf_counter() - started) * 1000, 1),
+                "samples": profiler.samples,
+                "folded": folded
+            })
+
+
+class LoopLagMonitor:
+    """Measures event-loop lag and captures the loop's stack while it is blocked"""
+
+    def __init__(self, interval_ms: int = None, threshold_ms: int = None, max_stalls: int = 50):
+        self.interval = (interval_ms or int(os.environ.get('LOOP_LAG_INTERVAL_MS', 100))) / 1000
+        self.threshold = (threshold_ms or int(os.environ.get('LOOP_LAG_THRESHOLD_MS', 250))) / 1000
+        self.stalls = deque(maxlen=max_stalls)
+        self.recent_lags = deque(maxlen=600)
+        self.max_lag = 0.0
+        self.heartbeat = time.monotonic()
+        self.loop_thread_id: Optional[int] = None
+        self.task: Optional[asyncio.Task] = None
+        self._stop = threading.Event()
+        self._current_stall: Optional[dict] = None
+
+    def start(self):
+        self.loop_thread_id = threading.get_ident()
+        self.heartbeat = time.monotonic()
+        self.task = asyncio.create_task(self._probe())
+        threading.Thread(target=self._watchdog, name="loop-lag-watchdog", daemon=True).start()
+
+    def stop(self):
+        self._stop.set()
+        if self.task:
+            self.task.cancel()
+
+    async def _probe(self):
+        while True:
+            before = time.monotonic()
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            lag = max(0.0, now - before - self.interval)
+            self.heartbeat = now
+            self.recent_lags.append(lag)
+            self.max_lag = max(self.max_lag, lag)
+            LOOP_LAG_SECONDS.observe(lag)
+            stall = self._current_stall
+            if stall is not None:
+                stall["blocked_ms"] = round(lag * 1000, 1)
+                self._current_stall = None
+
+    def _watchdog(self):
+        while not self._stop.wait(self.threshold / 2):
+            blocked = time.monotonic() - self.heartbeat - self.interval
+            if blocked < self.threshold or self._current_stall is not None:
+                continue
+            frame = sys._current_frames().get(self.loop_thread_id)
+            if frame is None:
+                continue
+            stall = {
+                "detected_at": time.time(),
+                "blocked_ms": round(blocked * 1000, 1),  # updated with the full lag once the loop recovers
+                "stack": folded_stack(frame, "event-loop").split(";")
+            }
+            self._current_stall = stall
+            self.stalls.append(stall)
+            logger.warning(f"Event loop blocked for {blocked * 1000:.0f} ms in {stall['stack'][-1]}")
+
+    def summary(self) -> Dict:
+        lags = sorted(self.recent_lags)
+        return {
+            "interval_ms": self.interval * 1000,
+            "threshold_ms": self.threshold * 1000,
+            "current_lag_ms": round(self.recent_lags[-1] * 1000, 2) if lags else None,
+            "p99_lag_ms": round(lags[int(len(lags) * 0.99) - 1] * 1000, 2) if lags else None,
+            "max_lag_ms": round(self.max_lag * 1000, 2),
+            "stalls": list(self.stalls)
+        }
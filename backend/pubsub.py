@@ -0,0 +1,159 @@
+"""
+In-process publish/subscribe hub with a pluggable cross-process backend.
+
+Subscribers get a bounded queue per topic. Publishing goes through the backend:
+the in-process backend delivers directly, while the Mongo backend writes events to
+a capped collection that every process tails, so subscribers connected to any
+worker see events published by any other worker.
+
+Configuration:
+    PUBSUB_BACKEND    "memory" (default) or "mongo" (requires the Mongo storage backend)
+"""
+
+import asyncio
+import logging
+import os
+from abc import ABC, abstractmethod
+from datetime import datetime
+from typing import Callable, Dict, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+Deliver = Callable[[str, dict], None]
+
+
+class Subscription:
+    """Bounded queue of events for one topic; flags overflow instead of blocking publishers"""
+
+    def __init__(self, hub: "PubSubHub", topic: str, maxsize: int):
+        self.hub = hub
+        self.topic = topic
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+        self.overflowed = False
+
+    def put(self, payload: dict):
+        try:
+            self.queue.put_nowait(payload)
+        except asyncio.QueueFull:
+            # Slow consumer: drop and let it resynchronise from storage
+            self.overflowed = True
+
+    async def get(self) -> dict:
+        return await self.queue.get()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.hub.unsubscribe(self)
+
+
+class PubSubBackend(ABC):
+    """Transport that carries published events to every process's hub"""
+
+    async def start(self, deliver: Deliver):
+        self.deliver = deliver
+
+    async def close(self):
+        """Stop delivering (no-op by default)"""
+
+    @abstractmethod
+    async def publish(self, topic: str, payload: dict):
+        ...
+
+
+class InProcessBackend(PubSubBackend):
+    """Single-process transport: publishing delivers straight to local subscribers"""
+
+    async def publish(self, topic: str, payload: dict):
+        self.deliver(topic, payload)
+
+
+class MongoCappedBackend(PubSubBackend):
+    """Cross-process transport over a capped collection tailed by every process"""
+
+    def __init__(self, db, collection: str = "pubsub_events", size_bytes: int = 16 * 1024 * 1024):
+        self.db = db
+        self.collection_name = collection
+        self.size_bytes = size_bytes
+        self.task: Optional[asyncio.Task] = None
+
+    async def start(self, deliver: Deliver):
+        await super().start(deliver)
+        if self.collection_name not in await self.db.list_collection_names():
+            try:
+                await self.db.create_collection(self.collection_name, capped=True, size=self.size_bytes)
+            except Exception as e:
+                logger.info(f"Capped collection {self.collection_name} not created: {e}")
+        self.collection = self.db[self.collection_name]
+        # A marker event gives the tailable cursor a starting point and keeps it alive
+        marker = await self.collection.insert_one({"topic": None, "timestamp": datetime.utcnow()})
+        self.task = asyncio.create_task(self._tail(marker.inserted_id))
+
+    async def close(self):
+        if self.task:
+            self.task.cancel()
+
+    async def publish(self, topic: str, payload: dict):
+        await self.collection.insert_one({"topic": topic, "payload": payload, "timestamp": datetime.utcnow()})
+
+    async def _tail(self, last_id):
+        from pymongo import CursorType
+
+        while True:
+            try:
+                cursor = self.collection.find({"_id": {"$gt": last_id}}, cursor_type=CursorType.TAILABLE_AWAIT)
+                while cursor.alive:
+                    async for event in cursor:
+                        last_id = event["_id"]
+                        if event.get("topic"):
+                            self.deliver(event["topic"], event["payload"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Pub/sub tail error: {e}")
+            await asyncio.sleep(1)
+
+
+class PubSubHub:
+    """Fans out published events to the local subscribers of each topic"""
+
+    def __init__(self, backend: PubSubBackend = None, queue_size: int = 256):
+        self.backend = backend or InProcessBackend()
+        self.queue_size = queue_size
+        self.subscribers: Dict[str, Set[Subscription]] = {}
+
+    async def start(self):
+        await self.backend.start(self._deliver)
+
+    async def close(self):
+        await self.backend.close()
+
+    def subscribe(self, topic: str) -> Subscription:
+        subscription = Subscription(self, topic, self.queue_size)
+        self.subscribers.setdefault(topic, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        subscribers = self.subscribers.get(subscription.topic)
+        if subscribers is not None:
+            subscribers.discard(subscription)
+            if not subscribers:
+                del self.subscribers[subscription.topic]
+
+    async def publish(self, topic: str, payload: dict):
+        await self.backend.publish(topic, payload)
+
+    def _deliver(self, topic: str, payload: dict):
+        for subscription in self.subscribers.get(topic, ()):
+            subscription.put(payload)
+
+
+def create_pubsub_hub(repo) -> PubSubHub:
+    """Build the hub selected by PUBSUB_BACKEND ("memory" or "mongo")"""
+    backend = os.environ.get('PUBSUB_BACKEND', 'memory').lower()
+    if backend == 'memory':
+        return PubSubHub(InProcessBackend())
+    if backend == 'mongo':
+        return PubSubHub(MongoCappedBackend(repo.db))
+    raise ValueError(f"Unknown PUBSUB_BACKEND: {backend}")
@@ -0,0 +1,83 @@
+"""
+Bounded retention for history collections.
+
+OCR results and status checks expire through TTL indexes on their timestamp, jobs
+through one on finished_at, so a job is never removed while queued or running.
+Translations older than the hot window are rolled up into daily per-language-pair
+aggregates (counts and average latency) by a periodic compaction job and then
+deleted, so the working set stays roughly the size of the hot window. Every worker
+runs the job; the repository makes concurrent runs fold each translation exactly once.
+
+Configuration (environment, 0 disables):
+    TRANSLATION_HOT_DAYS          days of raw translations to keep (default 30)
+    OCR_RETENTION_DAYS            TTL for ocr_results (default 30)
+    STATUS_RETENTION_DAYS         TTL for status_checks (default 7)
+    JOB_RETENTION_DAYS            TTL for jobs, counted from when they finished (default 1)
+    RETENTION_INTERVAL_SECONDS    how often compaction runs (default 3600)
+"""
+
+import asyncio
+import logging
+import os
+from datetime import datetime, timedelta
+
+from storage import Repository
+
+logger = logging.getLogger(__name__)
+
+DAY_SECONDS = 24 * 60 * 60
+
+
+class RetentionSettings:
+    """Retention windows read from the environment"""
+
+    def __init__(self):
+        self.translation_hot_days = int(os.environ.get('TRANSLATION_HOT_DAYS', 30))
+        self.ocr_retention_days = int(os.environ.get('OCR_RETENTION_DAYS', 30))
+        self.status_retention_days = int(os.environ.get('STATUS_RETENTION_DAYS', 7))
+        self.job_retention_days = int(os.environ.get('JOB_RETENTION_DAYS', 1))
+        self.interval_seconds = int(os.environ.get('RETENTION_INTERVAL_SECONDS', 3600))
+
+    @property
+    def ttl_seconds(self) -> dict:
+        return {
+            "ocr_results": self.ocr_retention_days * DAY_SECONDS,
+            "status_checks": self.status_retention_days * DAY_SECONDS,
+            "jobs": self.job_retention_days * DAY_SECONDS
+        }
+
+    def translation_cutoff(self, now: datetime = None) -> datetime:
+        """Start of the oldest hot day; everything before it gets rolled up"""
+        now = now or datetime.utcnow()
+        today = now.replace(hour=0, minute=0, second=0, microsecond=0)
+        return today - timedelta(days=self.translation_hot_days)
+
+
+async def run_compaction(repo: Repository, settings: RetentionSettings) -> int:
+    """One compaction pass: purge expired history and roll up old translations"""
+    await repo.purge_expired()
+    if settings.translation_hot_days <= 0:
+        return 0
+    rolled_up = await repo.rollup_translations(settings.translation_cutoff())
+    if rolled_up:
+        logger.info(f"Rolled up {rolled_up} translations into daily aggregates")
+    return rolled_up
+
+
+async def compaction_loop(repo: Repository, settings: RetentionSettings):
+    """Run compaction periodically until cancelled"""
+    while True:
+        try:
+            await run_compaction(repo, settings)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Retention compaction failed: {e}")
+        await asyncio.sleep(settings.interval_seconds)
+
+
+def start_retention(repo: Repository, settings: RetentionSettings):
+    """Schedule the compaction loop; returns the task or None when disabled"""
+    if settings.interval_seconds <= 0:
+        return None
+    return asyncio.create_task(compaction_loop(repo, settings))
@@ -0,0 +1,280 @@
+"""
+Priority-aware scheduling of LLM and OCR capacity.
+
+LLM calls and OCR inference each go through a ``FairScheduler`` with a fixed
+concurrency. When all slots are busy, waiting work is dispatched by weighted fair
+queuing over (priority class, client) flows, using start-time fair queuing tags.
+Each flow's share of capacity is proportional to its class weight, so a bulk import
+from one client cannot starve interactive typing or another client's camera requests.
+
+Requests describe themselves with headers, read by ``PriorityMiddleware``:
+    X-Priority      interactive | camera | bulk (default chosen from the path)
+    X-Client-Id     fairness key; otherwise a hash of X-API-Key, otherwise the peer address
+    X-Deadline-Ms   remaining time budget; work still queued when it runs out is
+                    dropped with 504 instead of being started
+
+Configuration:
+    LLM_CONCURRENCY      concurrent LLM calls (default 16)
+    OCR_CONCURRENCY      concurrent OCR inferences (default 2)
+    SCHEDULER_WEIGHTS    class weights (default "interactive=8,camera=4,bulk=1")
+"""
+
+import asyncio
+import hashlib
+import heapq
+import itertools
+import os
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import Dict, Optional
+
+from fastapi import HTTPException
+
+from metrics import SCHEDULER_DROPPED_TOTAL, SCHEDULER_QUEUE_DEPTH, SCHEDULER_WAIT_SECONDS, stage
+
+PRIORITY_CLASSES = ("interactive", "camera", "bulk")
+MAX_IDLE_FLOWS = 10000
+
+
+def parse_weights(spec: str) -> Dict[str, float]:
+    weights = {}
+    for item in spec.split(","):
+        name, _, value = item.partition("=")
+        if name.strip():
+            weights[name.strip()] = float(value)
+    return weights
+
+
+class RequestPriority:
+    """Scheduling attributes of the work being done in the current context"""
+
+    def __init__(self, priority_class: str = "interactive", client_id: str = "anonymous",
+                 deadline: Optional[float] = None):
+        self.priority_class = priority_class
+        self.client_id = client_id
+        self.deadline = deadline  # time.monotonic() value
+
+    def remaining(self) -> Optional[float]:
+        return None if self.deadline is None else self.deadline - time.monotonic()
+
+    def expired(self) -> bool:
+        return self.deadline is not None and time.monotonic() >= self.deadline
+
+
+current_priority: ContextVar[Optional[RequestPriority]] = ContextVar("current_priority", default=None)
+DEFAULT_PRIORITY = RequestPriority()
+
+
+def get_priority() -> RequestPriority:
+    return current_priority.get() or DEFAULT_PRIORITY
+
+
+class DeadlineExceeded(HTTPException):
+    def __init__(self, resource: str):
+        super().__init__(status_code=504, detail=f"Deadline exceeded before {resource} work started")
+
+
+class _Waiter:
+    __slots__ = ("future", "priority", "start_tag", "enqueued_at", "timer")
+
+    def __init__(self, future: asyncio.Future, priority: RequestPriority, start_tag: float):
+        self.future = future
+        self.priority = priority
+        self.start_tag = start_tag
+        self.enqueued_at = time.monotonic()
+        self.timer: Optional[asyncio.TimerHandle] = None
+
+
+class ClassStats:
+    def __init__(self):
+        self.queued = 0
+        self.running = 0
+        self.dispatched = 0
+        self.dropped = 0
+        self.waits = deque(maxlen=1000)
+
+    def summary(self) -> dict:
+        waits = sorted(self.waits)
+        return {
+            "queued": self.queued,
+            "running": self.running,
+            "dispatched": self.dispatched,
+            "dropped": self.dropped,
+            "avg_wait_ms": round(sum(waits) / len(waits) * 1000, 2) if waits else None,
+            "p95_wait_ms": round(waits[int(len(waits) * 0.95) - 1] * 1000, 2) if waits else None
+        }
+
+
+class FairScheduler:
+    """Concurrency limit with weighted fair queuing and deadline-aware dispatch"""
+
+    def __init__(self, name: str, capacity: int, weights: Dict[str, float] = None):
+        self.name = name
+        self.capacity = capacity
+        self.weights = weights or parse_weights(
+            os.environ.get('SCHEDULER_WEIGHTS', 'interactive=8,camera=4,bulk=1')
+        )
+        self.running = 0
+        self.heap = []
+        self.order = itertools.count()
+        self.virtual_time = 0.0
+        self.flow_finish: Dict[tuple, float] = {}
+        self.classes: Dict[str, ClassStats] = {name: ClassStats() for name in PRIORITY_CLASSES}
+
+    @asynccontextmanager
+    async def slot(self, priority: RequestPriority = None, cost: float = 1.0):
+        """Hold one unit of capacity for the block; raises DeadlineExceeded if dropped"""
+        priority = priority or get_priority()
+        with stage(f"{self.name}_queue"):
+            await self._acquire(priority, cost)
+        try:
+            yield
+        finally:
+            self._release(priority.priority_class)
+
+    def _class(self, priority_class: str) -> ClassStats:
+        stats = self.classes.get(priority_class)
+        if stats is None:
+            stats = self.classes[priority_class] = ClassStats()
+        return stats
+
+    async def _acquire(self, priority: RequestPriority, cost: float):
+        stats = self._class(priority.priority_class)
+        if priority.expired():
+            self._drop(priority.priority_class)
+            raise DeadlineExceeded(self.name)
+        if self.running < self.capacity and not self.heap:
+            self._start(priority.priority_class, 0.0)
+            return
+
+        flow = (priority.priority_class, priority.client_id)
+        start_tag = max(self.virtual_time, self.flow_finish.get(flow, 0.0))
+        finish_tag = start_tag + cost / self.weights.get(priority.priority_class, 1.0)
+        self.flow_finish[flow] = finish_tag
+        if len(self.flow_finish) > MAX_IDLE_FLOWS:
+            self.flow_finish = {key: tag for key, tag in self.flow_finish.items() if tag > self.virtual_time}
+
+        loop = asyncio.get_running_loop()
+        waiter = _Waiter(loop.create_future(), priority, start_tag)
+        remaining = priority.remaining()
+        if remaining is not None:
+            waiter.timer = loop.call_later(remaining, self._expire, waiter)
+        heapq.heappush(self.heap, (finish_tag, next(self.order), waiter))
+        stats.queued += 1
+        SCHEDULER_QUEUE_DEPTH.labels(self.name, priority.priority_class).inc()
+
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            if waiter.future.done() and not waiter.future.cancelled() and waiter.future.exception() is None:
+                # The slot was granted just as the caller went away: hand it on
+                self._release(priority.priority_class)
+            elif not waiter.future.done() or waiter.future.cancelled():
+                self._leave_queue(waiter)
+            raise
+
+    def _leave_queue(self, waiter: _Waiter):
+        if waiter.timer:
+            waiter.timer.cancel()
+        self._class(waiter.priority.priority_class).queued -= 1
+        SCHEDULER_QUEUE_DEPTH.labels(self.name, waiter.priority.priority_class).dec()
+
+    def _expire(self, waiter: _Waiter):
+        if waiter.future.done():
+            return
+        self._leave_queue(waiter)
+        self._drop(waiter.priority.priority_class)
+        waiter.future.set_exception(DeadlineExceeded(self.name))
+
+    def _drop(self, priority_class: str):
+        self._class(priority_class).dropped += 1
+        SCHEDULER_DROPPED_TOTAL.labels(self.name, priority_class).inc()
+
+    def _start(self, priority_class: str, waited: float):
+        self.running += 1
+        stats = self._class(priority_class)
+        stats.running += 1
+        stats.dispatched += 1
+        stats.waits.append(waited)
+        SCHEDULER_WAIT_SECONDS.labels(self.name, priority_class).observe(waited)
+
+    def _release(self, priority_class: str):
+        self.running -= 1
+        self._class(priority_class).running -= 1
+        self._dispatch()
+
+    def _dispatch(self):
+        while self.running < self.capacity and self.heap:
+            _, _, waiter = heapq.heappop(self.heap)
+            if waiter.future.done():
+                continue  # expired or abandoned while queued
+            self._leave_queue(waiter)
+            priority_class = waiter.priority.priority_class
+            if waiter.priority.expired():
+                self._drop(priority_class)
+                waiter.future.set_exception(DeadlineExceeded(self.name))
+                continue
+            self.virtual_time = waiter.start_tag
+            self._start(priority_class, time.monotonic() - waiter.enqueued_at)
+            waiter.future.set_result(None)
+        if not self.heap and self.running == 0:
+            self.virtual_time = 0.0
+            self.flow_finish.clear()
+
+    def stats(self) -> dict:
+        return {
+            "capacity": self.capacity,
+            "running": self.running,
+            "weights": self.weights,
+            "classes": {name: stats.summary() for name, stats in self.classes.items()}
+        }
+
+
+def default_class_for_path(path: str) -> str:
+    if path.startswith("/api/jobs"):
+        return "bulk"
+    if "/ocr/" in path or path.endswith(("/image", "/document")):
+        return "camera"
+    return "interactive"
+
+
+def client_key(headers: dict, scope) -> str:
+    client_id = headers.get(b"x-client-id")
+    if client_id:
+        return client_id.decode(errors="replace")[:64]
+    api_key = headers.get(b"x-api-key")
+    if api_key:
+        # Never keep raw keys in scheduler state or stats
+        return "key:" + hashlib.sha256(api_key).hexdigest()[:16]
+    client = scope.get("client")
+    return client[0] if client else "anonymous"
+
+
+class PriorityMiddleware:
+    """ASGI middleware that sets the request's priority class, client key and deadline"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] not in ("http", "websocket"):
+            await self.app(scope, receive, send)
+            return
+        headers = dict(scope.get("headers") or [])
+        priority_class = headers.get(b"x-priority", b"").decode(errors="replace").lower()
+        if priority_class not in PRIORITY_CLASSES:
+            priority_class = default_class_for_path(scope["path"])
+        deadline = None
+        budget = headers.get(b"x-deadline-ms")
+        if budget:
+            try:
+                deadline = time.monotonic() + max(0, int(budget)) / 1000
+            except ValueError:
+                pass
+        token = current_priority.set(RequestPriority(priority_class, client_key(headers, scope), deadline))
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            current_priority.reset(token)
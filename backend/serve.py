@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""
+Pre-fork multi-process server.
+
+``uvicorn --workers N`` starts N independent interpreters, and each loads its own
+EasyOCR/torch models. Here the master process imports the app, loads the OCR and
+ASR models once and runs a warm-up inference, then forks the workers. The workers
+share the model weights copy-on-write instead of holding N copies, and start
+without the model load time.
+
+Each worker:
+* sets torch and OpenCV to ``--threads-per-worker`` threads (default: cores // workers),
+  so N workers do not each start a thread pool sized for the whole machine. The
+  master loads and warms up single-threaded so no thread pools exist at fork time;
+* runs its own warm-up inference so its thread pools exist before the first request;
+* serves the shared listening socket with its own event loop and caches.
+
+Importing the app in the master does build the Motor client and the repository
+(server.py creates them at import time), but Motor opens no connection until its
+first operation, and the LLM HTTP client is created on first use. The master only
+loads and warms up models, so every connection is opened in a worker after the
+fork. Code added to the master must keep it that way: nothing there may touch the
+database or the LLM before forking.
+
+Prometheus metrics are aggregated across workers through PROMETHEUS_MULTIPROC_DIR
+(a temporary directory is used if it is not set).
+
+Per-process state stays per worker. Use PUBSUB_BACKEND=mongo so conversation
+WebSockets and job long-polls see events from every worker. The translation
+cache, scheduler and job queue are per worker (workers × LLM_CONCURRENCY LLM calls
+in total). STORAGE_BACKEND=memory gives every worker its own data.
+
+Usage (from the backend directory):
+    python serve.py --workers 4 --port 8001
+    python serve.py --workers 2 --threads-per-worker 2
+
+Measure memory and throughput against the worker count with
+``benchmarks/bench_workers.py``.
+"""
+
+import argparse
+import gc
+import logging
+import os
+import shutil
+import signal
+import socket
+import sys
+import tempfile
+import time
+from typing import Optional
+
+logger = logging.getLogger("serve")
+
+
+def set_thread_counts(threads: int):
+    """Limit torch and OpenCV intra-op parallelism in this process"""
+    for name in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS"):
+        os.environ[name] = str(threads)
+    try:
+        import torch
+        torch.set_num_threads(threads)
+    except ImportError:
+        pass
+    import cv2
+    cv2.setNumThreads(threads)
+
+
+def bind_socket(host: str, port: int) -> socket.socket:
+    sock = socket.socket(socket.AF_INET6 if ":" in host else socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+def prepare_metrics_dir() -> Optional[str]:
+    """Empty multiprocess metrics directory, set before prometheus_client is imported.
+
+    Returns the path if it is a temporary directory this process should remove.
+    """
+    path = os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+    if not path:
+        path = os.environ['PROMETHEUS_MULTIPROC_DIR'] = tempfile.mkdtemp(prefix="prometheus-")
+        return path
+    os.makedirs(path, exist_ok=True)
+    for name in os.listdir(path):
+        if name.endswith(".db"):
+            os.remove(os.path.join(path, name))
+    return None
+
+
+def run_worker(server, sock: socket.socket, args, threads: int):
+    """Child process body: never returns"""
+    import uvicorn
+
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    set_thread_counts(threads)
+    server.warm_up_ocr()
+    config = uvicorn.Config(server.app, log_level=args.log_level, timeout_keep_alive=args.keep_alive)
+    try:
+        uvicorn.Server(config).run(sockets=[sock])
+    finally:
+        os._exit(0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--threads-per-worker", type=int, default=None)
+    parser.add_argument("--log-level", default="info")
+    parser.add_argument("--keep-alive", type=int, default=5)
+    args = parser.parse_args()
+    threads = args.threads_per_worker or max(1, (os.cpu_count() or 1) // args.workers)
+
+    temporary_metrics_dir = prepare_metrics_dir()
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    set_thread_counts(1)
+
+    started = time.time()
+    import server
+    from prometheus_client import multiprocess
+
+    server.initialize_ocr()
+    server.initialize_asr()
+    server.warm_up_ocr()
+    logger.info(f"Models loaded in master in {time.time() - started:.1f}s")
+
+    sock = bind_socket(args.host, args.port)
+    # Move everything allocated so far out of the collector's reach, so garbage
+    # collection in the workers does not write to (and un-share) those pages
+    gc.collect()
+    gc.freeze()
+
+    workers = {}
+    stopping = False
+
+    def spawn():
+        pid = os.fork()
+        if pid == 0:
+            run_worker(server, sock, args, threads)
+        workers[pid] = time.time()
+        logger.info(f"Started worker {pid} ({threads} threads)")
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in list(workers):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    for _ in range(args.workers):
+        spawn()
+    logger.info(f"Serving on {args.host}:{args.port} with {args.workers} workers")
+
+    while workers:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        except InterruptedError:
+            continue
+        started_at = workers.pop(pid, None)
+        if started_at is None:
+            continue
+        multiprocess.mark_process_dead(pid)
+        if not stopping:
+            logger.warning(f"Worker {pid} exited with status {status}; restarting")
+            if time.time() - started_at < 1:
+                time.sleep(1)  # avoid a tight crash loop
+            spawn()
+
+    sock.close()
+    if temporary_metrics_dir:
+        shutil.rmtree(temporary_metrics_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    main()
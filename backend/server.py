@@ -1,12 +1,12 @@
-from fastapi import FastAPI, APIRouter, HTTPException, UploadFile, File, Form
+from fastapi import FastAPI, APIRouter, Depends, HTTPException, UploadFile, File, Form, Header, WebSocket, WebSocketDisconnect
+from fastapi.responses import ORJSONResponse, PlainTextResponse, Response, StreamingResponse
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
-from motor.motor_asyncio import AsyncIOMotorClient
 import os
 import logging
 from pathlib import Path
 from pydantic import BaseModel, Field
-from typing import List, Optional
+from typing import Dict, List, Literal, Optional
 import uuid
 from datetime import datetime
 import base64
@@ -17,15 +17,47 @@ import numpy as np
 from PIL import Image
 import io
 import asyncio
+import functools
 import threading
+import time
+from storage import create_repository
+from retention import RetentionSettings, start_retention
+from pubsub import create_pubsub_hub
+from translation_cache import TranslationCache
+from translation_sessions import RevisionConflict, SessionNotFound, TextTooLong, TranslationSessionManager
+from warmup import CacheWarmer, WarmupRunning
+from conversation_context import ConversationContextManager
+from voice import VoiceStreamSession, check_sample_rate, create_asr_backend
+from metrics import (OCR_TIER_TOTAL, MetricsMiddleware, current_endpoint, language_pair_label, register_label_languages,
+                     render_metrics, set_language_pair, stage)
+from llm_clients import OpenAICompatibleChat, close_http_client
+from documents import DocumentError, DocumentTranslator, open_document
+from http_cache import CompressionMiddleware, StaticResponse, conditional_response
+from ocr_tiers import TIERS as OCR_TIERS, OCRTier, preprocess as preprocess_for_tier, resolve_tier, run_ocr as run_tier_ocr, to_gray
+from glossary import DEFAULT_TENANT, GlossaryStore, TenantMiddleware, current_tenant, enforce_terminology, terminology_instruction
+from jobs import JobConflict, JobManager, JobQueueFull
+from llm_usage import LLMUsageTracker
+from admission import AdmissionMiddleware, Rejected, admission_controller
+from scheduler import FairScheduler, PriorityMiddleware, RequestPriority, current_priority, get_priority
+from profiling import LoopLagMonitor, RequestProfilerMiddleware, admin_token_valid, profile_for, profile_store
+import json
+import orjson
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
-# MongoDB connection
-mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
-db = client[os.environ['DB_NAME']]
+# Storage backend (MongoDB by default, STORAGE_BACKEND=memory for offline runs)
+repo = create_repository()
+retention_settings = RetentionSettings()
+hub = create_pubsub_hub(repo)
+translation_cache = TranslationCache()
+llm_usage = LLMUsageTracker(repo)
+glossaries = GlossaryStore(repo)
+job_manager = JobManager(repo, hub)
+llm_scheduler = FairScheduler("llm", int(os.environ.get('LLM_CONCURRENCY', 16)))
+ocr_scheduler = FairScheduler("ocr", int(os.environ.get('OCR_CONCURRENCY', 2)))
+loop_lag_monitor = LoopLagMonitor()
+background_tasks = []
 
 # Create the main app without a prefix
 app = FastAPI()
@@ -33,8 +65,15 @@ app = FastAPI()
 # Create a router with the /api prefix
 api_router = APIRouter(prefix="/api")
 
+def require_admin(x_admin_token: Optional[str] = Header(None)):
+    """Dependency for admin-only routes: the X-Admin-Token header must match ADMIN_TOKEN"""
+    if not admin_token_valid(x_admin_token):
+        raise HTTPException(status_code=403, detail="Admin token required")
+
 # Initialize LLM Chat for translations
 emergent_llm_key = os.environ.get('EMERGENT_LLM_KEY')
+llm_base_url = os.environ.get('LLM_BASE_URL')
+LLM_PROVIDER, LLM_MODEL = "openai", "gpt-4o"
 
 # Models for Translation App
 class TranslationRequest(BaseModel):
@@ -64,6 +103,8 @@ class ConversationMessage(BaseModel):
     sender_id: str
     timestamp: datetime = Field(default_factory=datetime.utcnow)
     is_translated: bool = False
+    sequence: Optional[int] = None  # per-conversation ordering, assigned on insert
+    translations: Optional[Dict[str, str]] = None  # language code -> translated text
 
 class ConversationMessageRequest(BaseModel):
     original_text: str
@@ -72,6 +113,18 @@ class ConversationMessageRequest(BaseModel):
     message_type: str  # "text", "voice", "image"
     sender_id: str
 
+class ConversationParticipant(BaseModel):
+    conversation_id: str
+    participant_id: str
+    preferred_language: str
+    joined_at: datetime = Field(default_factory=datetime.utcnow)
+
+class ConversationParticipantRequest(BaseModel):
+    participant_id: str
+    preferred_language: str
+
+OCRTierName = Literal["auto", "fast", "standard", "accurate"]
+
 class VoiceTranslationRequest(BaseModel):
     audio_base64: str
     source_language: Optional[str] = "auto"
@@ -82,12 +135,72 @@ class ImageTranslationRequest(BaseModel):
     source_language: Optional[str] = "auto"
     target_language: str
     extract_text_only: bool = False
+    ocr_tier: Optional[OCRTierName] = None  # default: chosen per image from its quality
+
+class TranslationSessionRequest(BaseModel):
+    text: str = ""
+    source_language: Optional[str] = "auto"
+    target_language: str
+
+class TranslationRevisionRequest(BaseModel):
+    text: str
+    base_revision: Optional[int] = None  # revision the client's segments are at; 409 if stale
+
+class DocumentTranslationRequest(BaseModel):
+    document_base64: Optional[str] = None  # multi-page TIFF, PDF or a single image
+    pages_base64: Optional[List[str]] = None  # one image per page
+    source_language: Optional[str] = "auto"
+    target_language: str
+    ocr_tier: Optional[OCRTierName] = None  # default: chosen per page from its quality
+
+class GlossaryEntry(BaseModel):
+    term: str = Field(..., min_length=1, max_length=200)
+    translations: Dict[str, str] = {}  # language code -> required rendering; empty = never translate
+    case_sensitive: bool = False
+
+class GlossaryRequest(BaseModel):
+    entries: List[GlossaryEntry]
+
+class GlossaryMatchRequest(BaseModel):
+    text: str
+    target_language: str
 
 class Language(BaseModel):
     code: str
     name: str
     native_name: str
 
+# Fast path for list endpoints: project only the response fields from storage and
+# encode the documents directly with orjson instead of building a model per item.
+def model_fields_and_defaults(model) -> tuple:
+    """Field names of a response model and the defaults for optional fields"""
+    fields = list(model.model_fields)
+    defaults = {
+        name: field.default for name, field in model.model_fields.items()
+        if not field.is_required() and field.default_factory is None
+    }
+    return fields, defaults
+
+def list_response(docs: List[dict], defaults: dict) -> ORJSONResponse:
+    """Serialize pre-shaped documents, filling defaults missing from older records"""
+    if defaults:
+        for doc in docs:
+            for name, value in defaults.items():
+                doc.setdefault(name, value)
+    return ORJSONResponse(docs)
+
+def conditional_list_response(docs: List[dict], defaults: dict, if_none_match: Optional[str]) -> Response:
+    """list_response with an ETag; 304 when the client's copy is current.
+
+    No Last-Modified: the newest timestamp in a page does not change with the query
+    parameters, deletions or out-of-order inserts, so only the body hash is a safe validator.
+    """
+    body = list_response(docs, defaults).body
+    return conditional_response(body, if_none_match)
+
+TRANSLATION_FIELDS, TRANSLATION_DEFAULTS = model_fields_and_defaults(TranslationResponse)
+MESSAGE_FIELDS, MESSAGE_DEFAULTS = model_fields_and_defaults(ConversationMessage)
+
 # Supported languages
 SUPPORTED_LANGUAGES = [
     {"code": "en", "name": "English", "native_name": "English"},
@@ -112,12 +225,21 @@ SUPPORTED_LANGUAGES = [
     {"code": "pa", "name": "Punjabi", "native_name": "ਪੰਜਾਬੀ"}
 ]
 
+SUPPORTED_LANGUAGE_CODES = {lang["code"] for lang in SUPPORTED_LANGUAGES}
+register_label_languages(SUPPORTED_LANGUAGE_CODES)
+
+# Conversation paging and summary limits
+MESSAGE_PREVIEW_LENGTH = 200
+MAX_MESSAGE_PAGE_SIZE = 1000
+
 # Initialize EasyOCR reader (do this once at startup)
 ocr_reader = None
 
 def initialize_ocr():
     """Initialize OCR reader with multiple language support"""
     global ocr_reader
+    if ocr_reader is not None:
+        return  # already loaded, e.g. by the pre-fork master in serve.py
     try:
         # Initialize with English and Hindi only (Bengali and Hindi cannot be combined due to different scripts)
         # For Bengali support, we would need a separate reader instance
@@ -127,50 +249,93 @@ def initialize_ocr():
         logger.error(f"Failed to initialize OCR reader: {e}")
         ocr_reader = None
 
-def preprocess_image_for_ocr(image_array):
+def warm_up_ocr():
+    """Run one small inference so lazy model and thread-pool setup happens before the first request"""
+    if not ocr_reader:
+        return
+    image = np.full((64, 320), 255, dtype=np.uint8)
+    cv2.putText(image, "warm up", (10, 45), cv2.FONT_HERSHEY_SIMPLEX, 1.2, 0, 2)
+    start_time = time.time()
+    try:
+        ocr_reader.readtext(preprocess_image_for_ocr(image), detail=0, paragraph=True)
+        logger.info(f"OCR warm-up inference took {time.time() - start_time:.2f}s")
+    except Exception as e:
+        logger.error(f"OCR warm-up failed: {e}")
+
+# Speech recogniser for voice translation (loaded once at startup)
+asr_backend = None
+VOICE_BASE64_CHUNK = 64 * 1024  # multiple of 4 so every slice decodes on its own
+
+def initialize_asr():
+    """Initialize the ASR backend selected by ASR_BACKEND"""
+    global asr_backend
+    if asr_backend is not None:
+        return
+    try:
+        asr_backend = create_asr_backend()
+        logger.info(f"ASR backend initialized: {type(asr_backend).__name__}")
+    except Exception as e:
+        logger.error(f"Failed to initialize ASR backend: {e}")
+        asr_backend = None
+
+def preprocess_image_for_ocr(image_array, tier: OCRTier = OCR_TIERS["standard"]):
     """Preprocess image to improve OCR accuracy"""
     try:
-        # Convert to grayscale
-        if len(image_array.shape) == 3:
-            gray = cv2.cvtColor(image_array, cv2.COLOR_BGR2GRAY)
-        else:
-            gray = image_array
-            
-        # Apply noise reduction
-        denoised = cv2.medianBlur(gray, 3)
-        
-        # Apply sharpening
-        kernel = np.array([[-1,-1,-1], [-1,9,-1], [-1,-1,-1]])
-        sharpened = cv2.filter2D(denoised, -1, kernel)
-        
-        return sharpened
+        # Convert to grayscale, then denoise/sharpen as the tier prescribes
+        return preprocess_for_tier(to_gray(image_array), tier)
     except Exception as e:
         logger.error(f"Image preprocessing failed: {e}")
         return image_array
 
-async def extract_text_from_image(image_base64: str, languages: List[str] = None) -> tuple:
-    """Extract text from base64 image using OCR"""
+def choose_ocr_tier(image_array, ocr_tier: Optional[str]) -> OCRTier:
+    """The requested tier, or the estimator's choice; the standard tier if the estimate fails"""
+    try:
+        return resolve_tier(ocr_tier, to_gray(image_array))
+    except Exception as e:
+        logger.warning(f"OCR quality estimate failed, using the standard tier: {e}")
+        return OCR_TIERS["standard"]
+
+async def recognize_text_with_tier(image_array, ocr_tier: Optional[str] = None) -> tuple:
+    """Pick an OCR tier, preprocess and OCR under the OCR scheduler; returns (paragraphs, tier name)"""
+    if not ocr_reader:
+        raise HTTPException(status_code=500, detail="OCR service not available")
+    
+    # Quality estimate, preprocessing and OCR all run in the thread pool to avoid blocking the loop
+    loop = asyncio.get_event_loop()
+    with stage("quality_estimate"):
+        tier = await loop.run_in_executor(None, choose_ocr_tier, image_array, ocr_tier)
+    OCR_TIER_TOTAL.labels(tier.name, "requested" if ocr_tier in OCR_TIERS else "auto").inc()
+    
+    # Preprocess image for better OCR
+    with stage("preprocess"):
+        processed_image = await loop.run_in_executor(None, preprocess_image_for_ocr, image_array, tier)
+    
+    async with ocr_scheduler.slot(cost=tier.cost):
+        with stage("ocr_inference"):
+            paragraphs = await loop.run_in_executor(None, run_tier_ocr, ocr_reader, processed_image, tier)
+    return paragraphs, tier.name
+
+async def recognize_text(image_array, ocr_tier: Optional[str] = None) -> List[str]:
+    """OCR an image array; returns the text paragraphs"""
+    paragraphs, _ = await recognize_text_with_tier(image_array, ocr_tier)
+    return paragraphs
+
+async def extract_text_from_image(image_base64: str, languages: List[str] = None, ocr_tier: Optional[str] = None) -> tuple:
+    """Extract text from base64 image using OCR; returns (text, confidence, OCR tier used)"""
     try:
-        if not ocr_reader:
-            raise HTTPException(status_code=500, detail="OCR service not available")
-            
         # Decode base64 image
-        image_data = base64.b64decode(image_base64)
-        image = Image.open(io.BytesIO(image_data))
-        
-        # Convert PIL image to numpy array for OpenCV
-        image_array = np.array(image)
-        
-        # Preprocess image for better OCR
-        processed_image = preprocess_image_for_ocr(image_array)
-        
-        # Run OCR in a thread to avoid blocking
-        def run_ocr():
-            return ocr_reader.readtext(processed_image, detail=0, paragraph=True)
+        with stage("base64_decode"):
+            image_data = base64.b64decode(image_base64)
+        with stage("image_decode"):
+            image = Image.open(io.BytesIO(image_data))
+            if image.mode not in ("L", "RGB", "RGBA"):
+                # Palette, 1-bit, 16-bit, LA, CMYK...: to 8-bit channels OpenCV can convert
+                image = image.convert("RGB")
+            
+            # Convert PIL image to numpy array for OpenCV
+            image_array = np.array(image)
         
-        # Run OCR in thread pool to avoid blocking async loop
-        loop = asyncio.get_event_loop()
-        extracted_texts = await loop.run_in_executor(None, run_ocr)
+        extracted_texts, tier_name = await recognize_text_with_tier(image_array, ocr_tier)
         
         # Join all extracted text pieces
         full_text = " ".join(extracted_texts) if extracted_texts else ""
@@ -178,19 +343,43 @@ async def extract_text_from_image(image_base64: str, languages: List[str] = None
         # Estimate confidence (EasyOCR doesn't provide confidence for detail=0)
         confidence = 0.9 if full_text.strip() else 0.1
         
-        return full_text, confidence
+        return full_text, confidence, tier_name
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"OCR extraction error: {e}")
         raise HTTPException(status_code=500, detail=f"Text extraction failed: {str(e)}")
 
+TRANSLATOR_SYSTEM_MESSAGE = "You are an expert translator and linguist. Provide accurate, contextual translations while preserving meaning, tone, and cultural nuances. Always respond with just the translated text unless specifically asked for explanations."
+
 async def create_llm_chat(session_id: str = "default"):
     """Create LLM chat instance for translation"""
+    if llm_base_url:
+        # Self-hosted or stub OpenAI-compatible endpoint (benchmarks, offline runs)
+        return OpenAICompatibleChat(
+            llm_base_url, TRANSLATOR_SYSTEM_MESSAGE, api_key=os.environ.get('LLM_API_KEY')
+        ).with_model(LLM_PROVIDER, LLM_MODEL)
     return LlmChat(
         api_key=emergent_llm_key,
         session_id=session_id,
-        system_message="You are an expert translator and linguist. Provide accurate, contextual translations while preserving meaning, tone, and cultural nuances. Always respond with just the translated text unless specifically asked for explanations."
-    ).with_model("openai", "gpt-4o")
+        system_message=TRANSLATOR_SYSTEM_MESSAGE
+    ).with_model(LLM_PROVIDER, LLM_MODEL)
+
+async def send_llm_prompt(chat, prompt: str, template: str, language_pair: str) -> str:
+    """Send a prompt, timing it as the llm_call stage and recording its token usage"""
+    response = None
+    async with llm_scheduler.slot():
+        # Only work that got a slot made a call; dropped or expired requests are not usage
+        try:
+            with stage("llm_call"):
+                response = await chat.send_message(UserMessage(text=prompt))
+            return response
+        finally:
+            llm_usage.record_call(
+                current_endpoint(), LLM_MODEL, template, language_pair,
+                TRANSLATOR_SYSTEM_MESSAGE + prompt, response, getattr(chat, "last_usage", None)
+            )
 
 async def detect_language(text: str) -> str:
     """Detect the language of input text using LLM"""
@@ -203,8 +392,7 @@ Text: "{text}"
 
 Respond with only the 2-letter code (like: en, es, fr, de, etc.). No explanations."""
         
-        message = UserMessage(text=prompt)
-        response = await chat.send_message(message)
+        response = await send_llm_prompt(chat, prompt, "detect_language", "auto")
         
         detected_lang = response.strip().lower()
         # Validate if it's a supported language
@@ -213,65 +401,171 @@ Respond with only the 2-letter code (like: en, es, fr, de, etc.). No explanation
             return detected_lang
         return "en"  # Default to English if detection fails
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Language detection error: {e}")
         return "en"
 
-async def translate_text_with_llm(text: str, source_lang: str, target_lang: str, context: str = None) -> tuple:
-    """Translate text using LLM with context awareness"""
+def language_name(code: str) -> str:
+    return next((lang["name"] for lang in SUPPORTED_LANGUAGES if lang["code"] == code), code)
+
+async def glossary_terminology(text: str, target_lang: str) -> tuple:
+    """Glossary terms of the current tenant that occur in the text, with their required renderings"""
+    glossary = await glossaries.get(current_tenant.get())
+    return glossary.terminology(text, target_lang) if glossary else ()
+
+async def translate_text_with_llm(text: str, source_lang: str, target_lang: str, context: str = None,
+                                  terminology: tuple = None) -> tuple:
+    """Translate text using LLM with context awareness and the tenant's glossary"""
     try:
+        if terminology is None:
+            terminology = await glossary_terminology(text, target_lang)
         chat = await create_llm_chat(f"translate_{uuid.uuid4()}")
         
         # Get language names for better context
-        source_name = next((lang["name"] for lang in SUPPORTED_LANGUAGES if lang["code"] == source_lang), source_lang)
-        target_name = next((lang["name"] for lang in SUPPORTED_LANGUAGES if lang["code"] == target_lang), target_lang)
+        source_name = language_name(source_lang)
+        target_name = language_name(target_lang)
         
         context_instruction = f"\n\nContext: {context}" if context else ""
+        glossary_instruction = terminology_instruction(terminology)
         
         prompt = f"""Translate the following text from {source_name} to {target_name}. 
         
-Maintain the original meaning, tone, and cultural context. Handle idioms, slang, and cultural references appropriately.{context_instruction}
+Maintain the original meaning, tone, and cultural context. Handle idioms, slang, and cultural references appropriately.{context_instruction}{glossary_instruction}
 
 Text to translate: "{text}"
 
 Respond with ONLY the translated text."""
         
-        message = UserMessage(text=prompt)
-        response = await chat.send_message(message)
+        response = await send_llm_prompt(chat, prompt, "translate", language_pair_label(source_lang, target_lang))
+        translated_text, confidence = response.strip(), 0.95
         
-        return response.strip(), 0.95  # Return translation and confidence score
+        if terminology:
+            translated_text, missing = enforce_terminology(translated_text, terminology)
+            if missing:
+                logger.warning(f"Glossary terms missing from translation: {missing}")
+                confidence = 0.8
         
+        return translated_text, confidence  # Return translation and confidence score
+        
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Translation error: {e}")
         raise HTTPException(status_code=500, detail=f"Translation failed: {str(e)}")
 
+def parse_json_array(response: str, length: int) -> List[str]:
+    """The JSON array of strings in an LLM response, which must have the given length"""
+    items = orjson.loads(response[response.index("["):response.rindex("]") + 1])
+    if not isinstance(items, list) or len(items) != length or not all(isinstance(item, str) for item in items):
+        raise ValueError(f"Expected a JSON array of {length} strings")
+    return items
+
+async def translate_batch_with_llm(texts: List[str], source_lang: str, target_lang: str) -> List[tuple]:
+    """Translate several short texts in one LLM call; returns (translation, confidence) per text"""
+    chat = await create_llm_chat(f"translate_batch_{uuid.uuid4()}")
+    terminologies = [await glossary_terminology(text, target_lang) for text in texts]
+    glossary_instruction = terminology_instruction(tuple(dict.fromkeys(pair for terms in terminologies for pair in terms)))
+    
+    prompt = f"""Translate each text in the JSON array below from {language_name(source_lang)} to {language_name(target_lang)}. Maintain the original meaning, tone, and cultural context of each text.{glossary_instruction}
+
+Texts: {orjson.dumps(texts).decode()}
+
+Respond with ONLY a JSON array of the {len(texts)} translated texts, in the same order."""
+    
+    response = await send_llm_prompt(chat, prompt, "translate_batch", language_pair_label(source_lang, target_lang))
+    results = []
+    for translated_text, terminology in zip(parse_json_array(response, len(texts)), terminologies):
+        translated_text, missing = enforce_terminology(translated_text.strip(), terminology)
+        results.append((translated_text, 0.8 if missing else 0.95))
+    return results
+
+async def summarize_conversation(summary: str, messages: List[dict]) -> str:
+    """Fold older conversation messages into the running summary using LLM"""
+    # Runs as a background task: schedule it as bulk work without the triggering request's deadline
+    current_priority.set(RequestPriority("bulk", "conversation-context"))
+    chat = await create_llm_chat(f"summarize_{uuid.uuid4()}")
+    transcript = "\n".join(f"{m['sender_id']}: {m['text']}" for m in messages)
+    
+    prompt = f"""Update the running summary of a conversation with the new messages below. Keep names, topics, terminology and tone that help translate later messages. Keep it under {context_manager.max_summary_chars} characters.
+
+Current summary: {summary or "(none)"}
+
+New messages:
+{transcript}
+
+Respond with ONLY the updated summary."""
+    
+    response = await send_llm_prompt(chat, prompt, "summarize", "none")
+    return response.strip()
+
+async def translate_cached(text: str, source_lang: str, target_lang: str, context: str = None) -> tuple:
+    """translate_text_with_llm behind the shared translation cache"""
+    terminology = await glossary_terminology(text, target_lang)
+    key = translation_cache.key(text, source_lang, target_lang, context, terminology)
+    computed = False
+
+    def compute():
+        nonlocal computed
+        computed = True
+        return translate_text_with_llm(text, source_lang, target_lang, context, terminology)
+
+    result = await translation_cache.get_or_compute(key, compute)
+    if not computed:
+        llm_usage.record_cache_hit(current_endpoint(), LLM_MODEL, "translate", language_pair_label(source_lang, target_lang))
+    return result
+
+async def warmup_cache_key(text: str, source_lang: str, target_lang: str) -> tuple:
+    """The cache key translate_cached uses for a request without context"""
+    terminology = await glossary_terminology(text, target_lang)
+    return translation_cache.key(text, source_lang, target_lang, None, terminology)
+
+async def translate_segment(text: str, source_lang: str, target_lang: str) -> str:
+    """Cached translation of one segment of a longer text (document paragraph, sentence)"""
+    translated_text, _ = await translate_cached(text, source_lang, target_lang)
+    return translated_text
+
+context_manager = ConversationContextManager(repo, summarize_conversation)
+translation_sessions = TranslationSessionManager(translate_segment, detect_language)
+cache_warmer = CacheWarmer(repo, translation_cache, translate_batch_with_llm, warmup_cache_key, SUPPORTED_LANGUAGE_CODES)
+
 # API Routes
+# Constant responses: serialized, tagged and compressed once
+ROOT_RESPONSE = StaticResponse({"message": "Ultimate AI Translation & Transliteration App API", "version": "1.0.0"})
+LANGUAGES_RESPONSE = StaticResponse([Language(**lang).dict() for lang in SUPPORTED_LANGUAGES])
+
 @api_router.get("/")
-async def root():
-    return {"message": "Ultimate AI Translation & Transliteration App API", "version": "1.0.0"}
+async def root(if_none_match: Optional[str] = Header(None), accept_encoding: Optional[str] = Header(None)):
+    return ROOT_RESPONSE.response(if_none_match, accept_encoding)
 
 @api_router.get("/languages", response_model=List[Language])
-async def get_supported_languages():
+async def get_supported_languages(if_none_match: Optional[str] = Header(None),
+                                  accept_encoding: Optional[str] = Header(None)):
     """Get list of supported languages"""
-    return [Language(**lang) for lang in SUPPORTED_LANGUAGES]
+    return LANGUAGES_RESPONSE.response(if_none_match, accept_encoding)
 
 @api_router.post("/translate/text", response_model=TranslationResponse)
 async def translate_text(request: TranslationRequest):
     """Translate text with context awareness"""
     try:
+        start_time = time.time()
+        
         # Auto-detect source language if needed
         if request.source_language == "auto":
-            detected_lang = await detect_language(request.text)
+            with stage("language_detection"):
+                detected_lang = await detect_language(request.text)
             source_lang = detected_lang
         else:
             source_lang = request.source_language
+        set_language_pair(source_lang, request.target_language)
             
         # Skip translation if source and target are the same
         if source_lang == request.target_language:
             translated_text = request.text
             confidence = 1.0
         else:
-            translated_text, confidence = await translate_text_with_llm(
+            translated_text, confidence = await translate_cached(
                 request.text, 
                 source_lang, 
                 request.target_language,
@@ -288,37 +582,201 @@ async def translate_text(request: TranslationRequest):
             confidence_score=confidence
         )
         
-        # Save to database
-        await db.translations.insert_one(translation.dict())
+        # Save to database; processing_time feeds the latency rollups
+        translation_dict = translation.dict()
+        translation_dict['processing_time'] = time.time() - start_time
+        with stage("db_write"):
+            await repo.insert_translation(translation_dict)
         
         return translation
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Text translation error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@api_router.post("/translate/session")
+async def create_translation_session(request: TranslationSessionRequest):
+    """Start an incremental translation session for text that is being edited"""
+    try:
+        return await translation_sessions.create(request.text, request.source_language, request.target_language)
+    except TextTooLong as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Translation session error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@api_router.post("/translate/session/{session_id}/revise")
+async def revise_translation_session(session_id: str, request: TranslationRevisionRequest):
+    """Translate only the sentences that changed since the last revision and return a patch"""
+    try:
+        return await translation_sessions.revise(session_id, request.text, request.base_revision)
+    except SessionNotFound:
+        raise HTTPException(status_code=404, detail="Translation session not found")
+    except RevisionConflict as e:
+        raise HTTPException(status_code=409, detail=str(e), headers={"X-Session-Revision": str(e.revision)})
+    except TextTooLong as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Translation session error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@api_router.get("/translate/session/{session_id}")
+async def get_translation_session(session_id: str):
+    """Full state of a session, for clients that lost track of the revisions"""
+    try:
+        return translation_sessions.get(session_id).state()
+    except SessionNotFound:
+        raise HTTPException(status_code=404, detail="Translation session not found")
+
 @api_router.get("/translate/history")
-async def get_translation_history(limit: int = 50):
+async def get_translation_history(limit: int = 50, if_none_match: Optional[str] = Header(None)):
     """Get recent translation history"""
     try:
-        translations = await db.translations.find().sort("timestamp", -1).limit(limit).to_list(limit)
-        return [TranslationResponse(**translation) for translation in translations]
+        translations = await repo.recent_translations(limit, fields=TRANSLATION_FIELDS)
+        return conditional_list_response(translations, TRANSLATION_DEFAULTS, if_none_match)
     except Exception as e:
         logger.error(f"History retrieval error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@api_router.get("/translate/stats")
+async def get_translation_stats():
+    """Translation counts and average latency per language pair, including rolled-up history"""
+    try:
+        return await repo.translation_stats()
+    except Exception as e:
+        logger.error(f"Stats retrieval error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+LLM_USAGE_GROUP_FIELDS = {"day", "endpoint", "model", "template", "language_pair"}
+
+@api_router.get("/scheduler/stats")
+async def get_scheduler_stats():
+    """Queue depth, running work and wait times per priority class for LLM and OCR capacity"""
+    return {
+        "llm": llm_scheduler.stats(), "ocr": ocr_scheduler.stats(), "jobs": job_manager.stats(),
+        "admission": admission_controller.stats()
+    }
+
+@api_router.get("/llm/usage", dependencies=[Depends(require_admin)])
+async def get_llm_usage(days: int = 7, group_by: str = "endpoint,template,language_pair"):
+    """LLM token usage, estimated cost and cache hits, most expensive first"""
+    fields = [field.strip() for field in group_by.split(",") if field.strip()]
+    if not fields or not set(fields) <= LLM_USAGE_GROUP_FIELDS or not 1 <= days <= 366:
+        raise HTTPException(status_code=400, detail=f"group_by must use {sorted(LLM_USAGE_GROUP_FIELDS)} and days 1-366")
+    try:
+        usage = await llm_usage.report(days, fields)
+        totals = await llm_usage.report(days, ["model"])
+        return {"usage": usage, "totals": totals, "translation_cache": translation_cache.stats()}
+    except Exception as e:
+        logger.error(f"LLM usage retrieval error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@api_router.put("/glossary", dependencies=[Depends(require_admin)])
+async def put_glossary(request: GlossaryRequest):
+    """Replace the glossary of the tenant given by X-Tenant-Id"""
+    try:
+        return await glossaries.save(current_tenant.get(), [entry.dict() for entry in request.entries])
+    except ValueError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except Exception as e:
+        logger.error(f"Glossary update error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@api_router.get("/glossary", dependencies=[Depends(require_admin)])
+async def get_glossary(include_entries: bool = True):
+    """The tenant's glossary; pass include_entries=false for just its size and version"""
+    stored = await repo.get_glossary(current_tenant.get(), include_entries)
+    if stored is None:
+        raise HTTPException(status_code=404, detail="No glossary for this tenant")
+    return ORJSONResponse(stored)
+
+@api_router.post("/glossary/match", dependencies=[Depends(require_admin)])
+async def match_glossary(request: GlossaryMatchRequest):
+    """Glossary terms found in a text and the renderings a translation must use"""
+    start = time.perf_counter()
+    terminology = await glossary_terminology(request.text, request.target_language)
+    return {
+        "terms": [{"term": term, "translation": rendering} for term, rendering in terminology],
+        "match_time_ms": (time.perf_counter() - start) * 1000
+    }
+
 @api_router.post("/conversation/create")
 async def create_conversation():
     """Create a new conversation session"""
     conversation_id = str(uuid.uuid4())
+    now = datetime.utcnow()
+    # Messages live in conversation_messages; the conversation document only
+    # keeps counters and a summary of the latest message so it stays fixed-size.
     conversation = {
         "id": conversation_id,
-        "created_at": datetime.utcnow(),
-        "messages": []
+        "created_at": now,
+        "updated_at": now,
+        "message_count": 0,
+        "last_sequence": 0,
+        "last_message": None
     }
-    await db.conversations.insert_one(conversation)
+    await repo.create_conversation(conversation)
     return {"conversation_id": conversation_id}
 
+def summarize_message(message: ConversationMessage) -> dict:
+    """Build the bounded last-message summary stored on the conversation"""
+    return {
+        "id": message.id,
+        "sequence": message.sequence,
+        "sender_id": message.sender_id,
+        "message_type": message.message_type,
+        "source_language": message.source_language,
+        "preview": message.original_text[:MESSAGE_PREVIEW_LENGTH],
+        "timestamp": message.timestamp
+    }
+
+async def translate_for_languages(text: str, source_lang: str, target_langs: List[str], required: str = None,
+                                  context: str = None) -> Dict[str, str]:
+    """Translate into several languages concurrently; only the required language may fail the call"""
+    results = await asyncio.gather(
+        *(translate_cached(text, source_lang, target_lang, context) for target_lang in target_langs),
+        return_exceptions=True
+    )
+    translations = {}
+    for target_lang, result in zip(target_langs, results):
+        if isinstance(result, BaseException):
+            if target_lang == required:
+                raise result
+            logger.error(f"Fan-out translation to {target_lang} failed: {result}")
+            continue
+        translations[target_lang] = result[0]
+    return translations
+
+@api_router.post("/conversation/{conversation_id}/participants", response_model=ConversationParticipant)
+async def add_conversation_participant(conversation_id: str, participant_request: ConversationParticipantRequest):
+    """Join a conversation or change a participant's preferred language"""
+    if participant_request.preferred_language not in SUPPORTED_LANGUAGE_CODES:
+        raise HTTPException(status_code=400, detail="Unsupported language")
+    participant = ConversationParticipant(conversation_id=conversation_id, **participant_request.dict())
+    try:
+        added = await repo.add_participant(participant.dict())
+    except Exception as e:
+        logger.error(f"Add participant error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+    if not added:
+        raise HTTPException(status_code=404, detail="Conversation not found")
+    return participant
+
+@api_router.get("/conversation/{conversation_id}/participants", response_model=List[ConversationParticipant])
+async def get_conversation_participants(conversation_id: str):
+    """List conversation participants and their preferred languages"""
+    try:
+        return await repo.list_participants(conversation_id)
+    except Exception as e:
+        logger.error(f"Get participants error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 @api_router.post("/conversation/{conversation_id}/message")
 async def add_conversation_message(conversation_id: str, message_request: ConversationMessageRequest):
     """Add message to conversation"""
@@ -333,45 +791,145 @@ async def add_conversation_message(conversation_id: str, message_request: Conver
             sender_id=message_request.sender_id
         )
         
-        # Auto-translate if target language is specified
-        if message.target_language and message.target_language != message.source_language:
-            translated_text, _ = await translate_text_with_llm(
-                message.original_text,
-                message.source_language,
-                message.target_language
+        room_languages = await repo.conversation_languages(conversation_id)
+        if room_languages is None:
+            raise HTTPException(status_code=404, detail="Conversation not found")
+        
+        # Translate once per distinct language in the room plus the sender's target
+        target_languages = set(room_languages)
+        if message.target_language:
+            target_languages.add(message.target_language)
+        target_languages.discard(message.source_language)
+        set_language_pair(message.source_language, message.target_language or "none")
+        if target_languages:
+            context = await context_manager.build_context(conversation_id)
+            message.translations = await translate_for_languages(
+                message.original_text, message.source_language, sorted(target_languages),
+                required=message.target_language, context=context
             )
-            message.translated_text = translated_text
-            message.is_translated = True
+            if message.target_language in message.translations:
+                message.translated_text = message.translations[message.target_language]
+                message.is_translated = True
+        
+        # Allocate the next sequence number; constant-size update regardless of history length
+        sequence = await repo.allocate_message_sequence(conversation_id)
+        if sequence is None:
+            raise HTTPException(status_code=404, detail="Conversation not found")
+        message.sequence = sequence
         
         # Save message
-        await db.conversation_messages.insert_one(message.dict())
+        with stage("db_write"):
+            await repo.insert_conversation_message(message.dict())
         
-        # Update conversation
-        await db.conversations.update_one(
-            {"id": conversation_id},
-            {"$push": {"messages": message.id}, "$set": {"updated_at": datetime.utcnow()}}
-        )
+        # Update the last-message summary unless a newer message already landed
+        await repo.set_last_message(conversation_id, summarize_message(message))
+        
+        # Push to live subscribers and extend the translation context
+        await hub.publish(conversation_topic(conversation_id), message.dict())
+        context_manager.record(conversation_id, message.dict())
         
         return message
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Conversation message error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 @api_router.get("/conversation/{conversation_id}/messages")
-async def get_conversation_messages(conversation_id: str):
-    """Get messages for a conversation"""
+async def get_conversation_messages(conversation_id: str, after_sequence: int = 0, limit: int = 100,
+                                    if_none_match: Optional[str] = Header(None)):
+    """Get a page of messages for a conversation, ordered by sequence"""
     try:
-        messages = await db.conversation_messages.find(
-            {"conversation_id": conversation_id}
-        ).sort("timestamp", 1).to_list(1000)
+        limit = max(1, min(limit, MAX_MESSAGE_PAGE_SIZE))
+        messages = await repo.list_conversation_messages(
+            conversation_id, after_sequence, limit, fields=MESSAGE_FIELDS
+        )
         
-        return [ConversationMessage(**message) for message in messages]
+        return conditional_list_response(messages, MESSAGE_DEFAULTS, if_none_match)
         
     except Exception as e:
         logger.error(f"Get conversation messages error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+def conversation_topic(conversation_id: str) -> str:
+    return f"conversation:{conversation_id}"
+
+class SequenceTracker:
+    """Tracks which message sequences a subscriber has been sent"""
+
+    def __init__(self, after_sequence: int):
+        self.contiguous = after_sequence  # everything up to here has been sent
+        self.ahead = set()  # sent out of order, above the contiguous mark
+
+    def should_send(self, sequence: int) -> bool:
+        return sequence > self.contiguous and sequence not in self.ahead
+
+    def mark_sent(self, sequence: int):
+        self.ahead.add(sequence)
+        while self.contiguous + 1 in self.ahead:
+            self.contiguous += 1
+            self.ahead.discard(self.contiguous)
+        if len(self.ahead) > MAX_MESSAGE_PAGE_SIZE:
+            # A sequence that never got stored (failed insert) must not pin the mark forever
+            self.contiguous = min(self.ahead)
+            self.ahead = {s for s in self.ahead if s > self.contiguous}
+
+async def send_message_backlog(websocket: WebSocket, conversation_id: str, tracker: SequenceTracker):
+    """Replay stored messages the subscriber has not seen yet"""
+    while True:
+        page = await repo.list_conversation_messages(
+            conversation_id, tracker.contiguous, MAX_MESSAGE_PAGE_SIZE, fields=MESSAGE_FIELDS
+        )
+        for message in page:
+            if tracker.should_send(message["sequence"]):
+                await websocket.send_text(orjson.dumps({**MESSAGE_DEFAULTS, **message}).decode())
+                tracker.mark_sent(message["sequence"])
+        if len(page) < MAX_MESSAGE_PAGE_SIZE:
+            return
+
+async def push_conversation_messages(websocket: WebSocket, conversation_id: str, subscription, tracker: SequenceTracker):
+    await send_message_backlog(websocket, conversation_id, tracker)
+    while True:
+        message = await subscription.get()
+        if subscription.overflowed:
+            subscription.overflowed = False
+            await send_message_backlog(websocket, conversation_id, tracker)
+            continue
+        if tracker.should_send(message["sequence"]):
+            await websocket.send_text(orjson.dumps(message).decode())
+            tracker.mark_sent(message["sequence"])
+
+async def wait_for_disconnect(websocket: WebSocket):
+    """Read (and ignore) client frames, so a disconnect is noticed even while nothing is being sent"""
+    while True:
+        message = await websocket.receive()
+        if message["type"] == "websocket.disconnect":
+            return
+
+@api_router.websocket("/conversation/{conversation_id}/ws")
+async def conversation_socket(websocket: WebSocket, conversation_id: str, after_sequence: int = 0):
+    """Push new conversation messages; reconnect with after_sequence to resume"""
+    await websocket.accept()
+    tracker = SequenceTracker(after_sequence)
+    try:
+        # Subscribe before replaying so nothing published during the replay is missed
+        with hub.subscribe(conversation_topic(conversation_id)) as subscription:
+            pusher = asyncio.ensure_future(push_conversation_messages(websocket, conversation_id, subscription, tracker))
+            watcher = asyncio.ensure_future(wait_for_disconnect(websocket))
+            try:
+                done, _ = await asyncio.wait({pusher, watcher}, return_when=asyncio.FIRST_COMPLETED)
+            finally:
+                pusher.cancel()
+                watcher.cancel()
+            if pusher in done:
+                pusher.result()
+    except WebSocketDisconnect:
+        pass
+    except Exception as e:
+        logger.error(f"Conversation socket error: {e}")
+        await websocket.close(code=1011)
+
 # OCR and Image Translation Endpoints
 class OCRResult(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
@@ -379,34 +937,101 @@ class OCRResult(BaseModel):
     confidence_score: float
     processing_time: Optional[float] = None
     timestamp: datetime = Field(default_factory=datetime.utcnow)
+    ocr_tier: Optional[str] = None
 
 class ImageOCRRequest(BaseModel):
     image_base64: str
+    ocr_tier: Optional[OCRTierName] = None  # default: chosen per image from its quality
+
+OCR_FIELDS, OCR_DEFAULTS = model_fields_and_defaults(OCRResult)
+    
+async def run_ocr_extraction(image_base64: str, ocr_tier: Optional[str] = None) -> OCRResult:
+    """OCR an image and record it in the OCR history"""
+    start_time = time.time()
+    
+    # Extract text using OCR
+    extracted_text, confidence, tier_name = await extract_text_from_image(image_base64, ocr_tier=ocr_tier)
+    
+    processing_time = time.time() - start_time
+    
+    # Create OCR result
+    result = OCRResult(
+        extracted_text=extracted_text,
+        confidence_score=confidence,
+        processing_time=processing_time,
+        ocr_tier=tier_name
+    )
     
+    # Save OCR result to database for history
+    with stage("db_write"):
+        await repo.insert_ocr_result(result.dict())
+    
+    return result
+
+async def run_image_translation(request: ImageTranslationRequest) -> TranslationResponse:
+    """OCR, language detection and translation of an image, shared by the sync and job APIs"""
+    start_time = time.time()
+    
+    # First extract text from image
+    extracted_text, ocr_confidence, tier_name = await extract_text_from_image(request.image_base64, ocr_tier=request.ocr_tier)
+    
+    if not extracted_text.strip():
+        raise HTTPException(status_code=400, detail="No text found in image")
+    
+    # Auto-detect source language if needed
+    if request.source_language == "auto":
+        with stage("language_detection"):
+            detected_lang = await detect_language(extracted_text)
+        source_lang = detected_lang
+    else:
+        source_lang = request.source_language
+    set_language_pair(source_lang, request.target_language)
+        
+    # Skip translation if source and target are the same
+    if source_lang == request.target_language:
+        translated_text = extracted_text
+        confidence = ocr_confidence
+    else:
+        # Translate the extracted text
+        translated_text, translation_confidence = await translate_text_with_llm(
+            extracted_text, 
+            source_lang, 
+            request.target_language
+        )
+        # Combined confidence is the product of OCR and translation confidence
+        confidence = ocr_confidence * translation_confidence
+    
+    processing_time = time.time() - start_time
+    
+    # Create translation response
+    translation = TranslationResponse(
+        original_text=extracted_text,
+        translated_text=translated_text,
+        source_language=source_lang,
+        target_language=request.target_language,
+        confidence_score=confidence
+    )
+    
+    # Save to database with image translation metadata
+    translation_dict = translation.dict()
+    translation_dict['is_image_translation'] = True
+    translation_dict['ocr_confidence'] = ocr_confidence
+    translation_dict['ocr_tier'] = tier_name
+    translation_dict['processing_time'] = processing_time
+    
+    with stage("db_write"):
+        await repo.insert_translation(translation_dict)
+    
+    return translation
+
 @api_router.post("/ocr/extract", response_model=OCRResult)
 async def extract_text_from_image_endpoint(request: ImageOCRRequest):
     """Extract text from image using OCR"""
     try:
-        import time
-        start_time = time.time()
-        
-        # Extract text using OCR
-        extracted_text, confidence = await extract_text_from_image(request.image_base64)
-        
-        processing_time = time.time() - start_time
-        
-        # Create OCR result
-        result = OCRResult(
-            extracted_text=extracted_text,
-            confidence_score=confidence,
-            processing_time=processing_time
-        )
-        
-        # Save OCR result to database for history
-        await db.ocr_results.insert_one(result.dict())
-        
-        return result
+        return await run_ocr_extraction(request.image_base64, request.ocr_tier)
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"OCR extraction error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -415,69 +1040,301 @@ async def extract_text_from_image_endpoint(request: ImageOCRRequest):
 async def translate_image_text(request: ImageTranslationRequest):
     """Extract text from image and translate it"""
     try:
-        import time
-        start_time = time.time()
+        return await run_image_translation(request)
         
-        # First extract text from image
-        extracted_text, ocr_confidence = await extract_text_from_image(request.image_base64)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Image translation error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+def open_document_translator(request: DocumentTranslationRequest) -> DocumentTranslator:
+    try:
+        source = open_document(request.document_base64, request.pages_base64)
+    except DocumentError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+    return DocumentTranslator(
+        source, functools.partial(recognize_text, ocr_tier=request.ocr_tier), detect_language, translate_segment,
+        request.target_language, request.source_language or "auto"
+    )
+
+async def save_document_page(document_id: str, page: dict, target_language: str):
+    translation = TranslationResponse(
+        original_text=page["original_text"],
+        translated_text=page["translated_text"],
+        source_language=page["source_language"],
+        target_language=target_language,
+        confidence_score=page["ocr_confidence"] * 0.95
+    )
+    translation_dict = translation.dict()
+    translation_dict['is_image_translation'] = True
+    translation_dict['document_id'] = document_id
+    translation_dict['page'] = page["page"]
+    translation_dict['processing_time'] = page["processing_time"]
+    with stage("db_write"):
+        await repo.insert_translation(translation_dict)
+
+async def document_pages(request: DocumentTranslationRequest, translator: DocumentTranslator, document_id: str):
+    """Translated pages in order, each saved to history once it is done"""
+    async for page in translator.pages():
+        if page.get("translated_text"):
+            await save_document_page(document_id, page, request.target_language)
+        yield page
+
+@api_router.post("/translate/document")
+async def translate_document(request: DocumentTranslationRequest):
+    """Translate a multi-page document, streaming one NDJSON line per page in page order, then a summary"""
+    translator = open_document_translator(request)
+    document_id = str(uuid.uuid4())
+
+    async def stream():
+        async for page in document_pages(request, translator, document_id):
+            yield orjson.dumps(page) + b"\n"
+        yield orjson.dumps({"type": "done", "document_id": document_id, **translator.summary()}) + b"\n"
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+@api_router.get("/ocr/history")
+async def get_ocr_history(limit: int = 50, if_none_match: Optional[str] = Header(None)):
+    """Get recent OCR extraction history"""
+    try:
+        ocr_results = await repo.recent_ocr_results(limit, fields=OCR_FIELDS)
+        return conditional_list_response(ocr_results, OCR_DEFAULTS, if_none_match)
+    except Exception as e:
+        logger.error(f"OCR history retrieval error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+# Asynchronous jobs: submit returns at once, clients poll or long-poll for the result
+class JobStatus(BaseModel):
+    id: str
+    kind: str
+    status: str
+    priority: int
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    result: Optional[dict] = None
+    error: Optional[str] = None
+    cached: bool = False
+
+class ImageTranslationJobRequest(ImageTranslationRequest):
+    priority: int = Field(5, ge=0, le=9)
+
+class ImageOCRJobRequest(ImageOCRRequest):
+    priority: int = Field(5, ge=0, le=9)
+
+def tenant_job(handler):
+    """Run a job handler with the glossary of the tenant that submitted it"""
+    async def run(payload: dict) -> dict:
+        current_tenant.set(payload.get("tenant_id", DEFAULT_TENANT))
+        return await handler(payload)
+    return run
+
+async def translate_image_job(payload: dict) -> dict:
+    return (await run_image_translation(ImageTranslationRequest(**payload))).dict()
+
+async def ocr_job(payload: dict) -> dict:
+    return (await run_ocr_extraction(payload["image_base64"], payload.get("ocr_tier"))).dict()
+
+async def translate_document_job(payload: dict) -> dict:
+    request = DocumentTranslationRequest(**payload)
+    translator = open_document_translator(request)
+    document_id = str(uuid.uuid4())
+    pages = [page async for page in document_pages(request, translator, document_id)]
+    return {"document_id": document_id, **translator.summary(), "page_count": len(pages), "pages": pages}
+
+job_manager.register("translate_image", tenant_job(translate_image_job))
+job_manager.register("translate_document", tenant_job(translate_document_job))
+job_manager.register("ocr", ocr_job)
+
+MAX_JOB_WAIT_SECONDS = 30
+
+async def submit_job(kind: str, request: BaseModel, response: Response, idempotency_key: Optional[str]) -> dict:
+    payload = {**request.dict(exclude={"priority"}), "tenant_id": current_tenant.get()}
+    try:
+        job, _ = await job_manager.submit(kind, payload, request.priority, idempotency_key, get_priority())
+    except JobQueueFull:
+        raise HTTPException(status_code=503, detail="Job queue is full", headers={"Retry-After": "5"})
+    except JobConflict:
+        raise HTTPException(status_code=422, detail="Idempotency-Key was already used for a different request")
+    response.headers["Location"] = f"/api/jobs/{job['id']}"
+    return job
+
+@api_router.post("/jobs/translate-image", response_model=JobStatus, status_code=202)
+async def submit_image_translation_job(request: ImageTranslationJobRequest, response: Response,
+                                       idempotency_key: Optional[str] = Header(None)):
+    """Queue an image translation; poll /api/jobs/{id} for the TranslationResponse"""
+    return await submit_job("translate_image", request, response, idempotency_key)
+
+class DocumentTranslationJobRequest(DocumentTranslationRequest):
+    priority: int = Field(5, ge=0, le=9)
+
+@api_router.post("/jobs/translate-document", response_model=JobStatus, status_code=202)
+async def submit_document_translation_job(request: DocumentTranslationJobRequest, response: Response,
+                                          idempotency_key: Optional[str] = Header(None)):
+    """Queue a document translation; the job result holds every page"""
+    return await submit_job("translate_document", request, response, idempotency_key)
+
+@api_router.post("/jobs/ocr", response_model=JobStatus, status_code=202)
+async def submit_ocr_job(request: ImageOCRJobRequest, response: Response,
+                         idempotency_key: Optional[str] = Header(None)):
+    """Queue an OCR extraction; poll /api/jobs/{id} for the OCRResult"""
+    return await submit_job("ocr", request, response, idempotency_key)
+
+@api_router.get("/jobs/{job_id}", response_model=JobStatus)
+async def get_job(job_id: str, wait: float = 0):
+    """Job state; with wait=N, hold the request up to N seconds until the job finishes"""
+    job = await job_manager.get(job_id, min(max(wait, 0), MAX_JOB_WAIT_SECONDS))
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@api_router.delete("/jobs/{job_id}", response_model=JobStatus)
+async def cancel_job(job_id: str):
+    """Cancel a job that has not started yet"""
+    if not await job_manager.cancel(job_id):
+        job = await job_manager.get(job_id)
+        if job is None:
+            raise HTTPException(status_code=404, detail="Job not found")
+        raise HTTPException(status_code=409, detail=f"Job is already {job['status']}")
+    return await job_manager.get(job_id)
+
+# Voice Translation Endpoints
+def voice_translator(source_language: str, target_language: str):
+    """Per-segment translate callback for VoiceStreamSession"""
+    async def translate(text: str, detected_language: Optional[str]) -> tuple:
+        if source_language != "auto":
+            source_lang = source_language
+        else:
+            source_lang = detected_language or await detect_language(text)
+        if source_lang == target_language:
+            return text, source_lang
+        translated_text, _ = await translate_cached(text, source_lang, target_language)
+        return translated_text, source_lang
+    return translate
+
+@api_router.websocket("/voice/stream")
+async def voice_stream(websocket: WebSocket, target_language: str, source_language: str = "auto",
+                       sample_rate: int = 16000):
+    """Stream 16-bit mono PCM (or WAV) frames; partial and translated segments are pushed back.
+
+    Send binary audio frames (or JSON {"audio_base64": ...}) and {"type": "end"} when done.
+    """
+    await websocket.accept()
+    if not asr_backend:
+        await websocket.send_json({"type": "error", "detail": "Speech recognition service not available"})
+        await websocket.close(code=1011)
+        return
+    try:
+        check_sample_rate(sample_rate)
+    except ValueError as e:
+        await websocket.send_json({"type": "error", "detail": str(e)})
+        await websocket.close(code=1008)
+        return
+    # Streams are long-lived, so they are admitted here for their whole duration
+    admission = admission_controller.classes["voice"]
+    priority = get_priority()
+    try:
+        await admission.acquire(priority.client_id, admission.queue_timeout)
+    except Rejected as rejected:
+        await websocket.send_json({"type": "error", "detail": rejected.detail, "retry_after": rejected.retry_after})
+        await websocket.close(code=1013)
+        return
+    start = time.monotonic()
+    session = VoiceStreamSession(
+        asr_backend, voice_translator(source_language, target_language), websocket.send_json,
+        sample_rate=sample_rate, language=None if source_language == "auto" else source_language
+    )
+    try:
+        while True:
+            frame = await websocket.receive()
+            if frame["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(frame.get("code", 1000))
+            if len(frame.get("bytes") or frame.get("text") or "") > admission.max_body_bytes:
+                admission.count_rejection("body_too_large")
+                await session.close()
+                await websocket.send_json({
+                    "type": "error", "detail": f"Frames are limited to {admission.max_body_bytes} bytes"
+                })
+                await websocket.close(code=1009)
+                return
+            if frame.get("bytes"):
+                await session.feed(frame["bytes"])
+            elif frame.get("text"):
+                data = json.loads(frame["text"])
+                if data.get("type") == "end":
+                    break
+                if data.get("audio_base64"):
+                    await session.feed(base64.b64decode(data["audio_base64"]))
+        await websocket.send_json(await session.finish())
+        await websocket.close()
+    except WebSocketDisconnect:
+        await session.close()
+    except ValueError as e:
+        # Undecodable audio: bad base64 or JSON, or an unsupported WAV format
+        await session.close()
+        await websocket.send_json({"type": "error", "detail": f"Invalid audio data: {e}"})
+        await websocket.close(code=1007)
+    except Exception as e:
+        logger.error(f"Voice stream error: {e}")
+        await session.close()
+        await websocket.close(code=1011)
+    finally:
+        admission.release(priority.client_id, time.monotonic() - start)
+
+@api_router.post("/translate/voice", response_model=TranslationResponse)
+async def translate_voice(request: VoiceTranslationRequest):
+    """Transcribe and translate an uploaded recording through the streaming pipeline"""
+    if not asr_backend:
+        raise HTTPException(status_code=500, detail="Speech recognition service not available")
+    try:
+        start_time = time.time()
+        segments = []
         
-        if not extracted_text.strip():
-            raise HTTPException(status_code=400, detail="No text found in image")
+        async def collect(result: dict):
+            if result["type"] == "final":
+                segments.append(result)
         
-        # Auto-detect source language if needed
-        if request.source_language == "auto":
-            detected_lang = await detect_language(extracted_text)
-            source_lang = detected_lang
-        else:
-            source_lang = request.source_language
-            
-        # Skip translation if source and target are the same
-        if source_lang == request.target_language:
-            translated_text = extracted_text
-            confidence = ocr_confidence
-        else:
-            # Translate the extracted text
-            translated_text, translation_confidence = await translate_text_with_llm(
-                extracted_text, 
-                source_lang, 
-                request.target_language
-            )
-            # Combined confidence is the product of OCR and translation confidence
-            confidence = ocr_confidence * translation_confidence
+        session = VoiceStreamSession(
+            asr_backend, voice_translator(request.source_language, request.target_language), collect,
+            language=None if request.source_language == "auto" else request.source_language
+        )
+        # Decode the upload in slices so segments start translating before the whole clip is decoded
+        try:
+            for offset in range(0, len(request.audio_base64), VOICE_BASE64_CHUNK):
+                await session.feed(base64.b64decode(request.audio_base64[offset:offset + VOICE_BASE64_CHUNK]))
+                await asyncio.sleep(0)
+        except (ValueError, TypeError) as e:
+            await session.close()
+            raise HTTPException(status_code=400, detail=f"Invalid audio data: {e}")
+        await session.finish()
         
-        processing_time = time.time() - start_time
+        if not any(segment["text"].strip() for segment in segments):
+            raise HTTPException(status_code=400, detail="No speech found in audio")
         
-        # Create translation response
+        source_lang = next((s["source_language"] for s in segments if s.get("source_language")), request.source_language)
+        set_language_pair(source_lang, request.target_language)
         translation = TranslationResponse(
-            original_text=extracted_text,
-            translated_text=translated_text,
+            original_text=" ".join(s["text"] for s in segments if s["text"].strip()),
+            translated_text=" ".join(s.get("translated_text") or "" for s in segments if s["text"].strip()),
             source_language=source_lang,
             target_language=request.target_language,
-            confidence_score=confidence
+            confidence_score=0.9
         )
         
-        # Save to database with image translation metadata
         translation_dict = translation.dict()
-        translation_dict['is_image_translation'] = True
-        translation_dict['ocr_confidence'] = ocr_confidence
-        translation_dict['processing_time'] = processing_time
-        
-        await db.translations.insert_one(translation_dict)
+        translation_dict['is_voice_translation'] = True
+        translation_dict['segment_count'] = len(segments)
+        translation_dict['processing_time'] = time.time() - start_time
+        with stage("db_write"):
+            await repo.insert_translation(translation_dict)
         
         return translation
         
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"Image translation error: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
-
-@api_router.get("/ocr/history")
-async def get_ocr_history(limit: int = 50):
-    """Get recent OCR extraction history"""
-    try:
-        ocr_results = await db.ocr_results.find().sort("timestamp", -1).limit(limit).to_list(limit)
-        return [OCRResult(**result) for result in ocr_results]
-    except Exception as e:
-        logger.error(f"OCR history retrieval error: {e}")
+        logger.error(f"Voice translation error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 # Basic health check endpoints from original
@@ -489,21 +1346,84 @@ class StatusCheck(BaseModel):
 class StatusCheckCreate(BaseModel):
     client_name: str
 
+STATUS_FIELDS, _ = model_fields_and_defaults(StatusCheck)
+
 @api_router.post("/status", response_model=StatusCheck)
 async def create_status_check(input: StatusCheckCreate):
     status_dict = input.dict()
     status_obj = StatusCheck(**status_dict)
-    _ = await db.status_checks.insert_one(status_obj.dict())
+    with stage("db_write"):
+        await repo.insert_status_check(status_obj.dict())
     return status_obj
 
 @api_router.get("/status", response_model=List[StatusCheck])
 async def get_status_checks():
-    status_checks = await db.status_checks.find().to_list(1000)
-    return [StatusCheck(**status_check) for status_check in status_checks]
+    status_checks = await repo.list_status_checks(1000, fields=STATUS_FIELDS)
+    return list_response(status_checks, {})
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus metrics"""
+    body, content_type = render_metrics()
+    return Response(content=body, media_type=content_type)
+
+# Admin diagnostics (require ADMIN_TOKEN)
+
+@api_router.get("/admin/profile", dependencies=[Depends(require_admin)])
+async def profile_server(seconds: float = 10.0, interval_ms: float = 5.0):
+    """Sample all threads for a window and return collapsed stacks (flamegraph.pl / speedscope input)"""
+    if not 0 < seconds <= 60 or not 1 <= interval_ms <= 1000:
+        raise HTTPException(status_code=400, detail="seconds must be in (0, 60] and interval_ms in [1, 1000]")
+    folded = await profile_for(seconds, interval_ms / 1000)
+    if folded is None:
+        raise HTTPException(status_code=409, detail="A profile is already running")
+    return PlainTextResponse(folded)
+
+@api_router.get("/admin/profiles/{profile_id}", dependencies=[Depends(require_admin)])
+async def get_request_profile(profile_id: str, format: str = "folded"):
+    """Profile captured for a request sent with X-Profile: 1"""
+    profile = profile_store.get(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    if format == "json":
+        return profile
+    return PlainTextResponse(profile["folded"])
+
+@api_router.get("/admin/loop-lag", dependencies=[Depends(require_admin)])
+async def get_loop_lag():
+    """Event-loop lag statistics and stacks captured while the loop was blocked"""
+    return loop_lag_monitor.summary()
+
+@api_router.get("/cache/warmup", dependencies=[Depends(require_admin)])
+async def get_cache_warmup():
+    """Progress and coverage of the last translation cache warm-up"""
+    return cache_warmer.summary()
+
+@api_router.post("/cache/warmup", status_code=202, dependencies=[Depends(require_admin)])
+async def start_cache_warmup():
+    """Pre-translate the most frequent texts into the busiest target languages"""
+    try:
+        cache_warmer.trigger()
+    except WarmupRunning:
+        raise HTTPException(status_code=409, detail="A cache warm-up is already running")
+    return {"message": "Cache warm-up started", "status_url": "/api/cache/warmup"}
 
 # Include the router in the main app
 app.include_router(api_router)
 
+app.add_middleware(MetricsMiddleware)
+
+# Inside PriorityMiddleware, which identifies the client and the deadline
+app.add_middleware(AdmissionMiddleware)
+
+app.add_middleware(PriorityMiddleware)
+
+app.add_middleware(TenantMiddleware)
+
+app.add_middleware(CompressionMiddleware)
+
+app.add_middleware(RequestProfilerMiddleware)
+
 app.add_middleware(
     CORSMiddleware,
     allow_credentials=True,
@@ -522,8 +1442,27 @@ logger = logging.getLogger(__name__)
 @app.on_event("startup")
 async def startup_event():
     """Initialize services on startup"""
+    loop_lag_monitor.start()
+    await repo.ensure_indexes()
+    await hub.start()
+    await repo.apply_ttl(retention_settings.ttl_seconds)
+    task = start_retention(repo, retention_settings)
+    if task:
+        background_tasks.append(task)
+    llm_usage.start()
+    background_tasks.extend(job_manager.start())
+    task = cache_warmer.start()
+    if task:
+        background_tasks.append(task)
     initialize_ocr()
+    initialize_asr()
 
 @app.on_event("shutdown")
 async def shutdown_db_client():
-    client.close()
\ No newline at end of file
+    for task in background_tasks:
+        task.cancel()
+    loop_lag_monitor.stop()
+    await llm_usage.close()
+    await hub.close()
+    await close_http_client()
+    await repo.close()
\ No newline at end of file
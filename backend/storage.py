@@ -0,0 +1,749 @@
+"""
+Storage layer for the translation API.
+
+Handlers talk to a ``Repository`` instead of a Motor database directly, so the API
+can run against MongoDB in production or against an in-memory backend for tests,
+benchmarks and offline load testing. Both backends answer the same queries and
+return plain dicts shaped like the stored documents (without Mongo's ``_id``).
+Read methods take an optional ``fields`` projection so list endpoints only pull
+the fields they serialize.
+"""
+
+import bisect
+import copy
+import heapq
+import os
+import uuid
+from abc import ABC, abstractmethod
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Sequence
+
+from pymongo import ASCENDING, DESCENDING, ReturnDocument, UpdateOne
+from pymongo.errors import DuplicateKeyError, OperationFailure
+
+# Collections whose documents can expire through a TTL index, and the date field it is on.
+# Jobs get finished_at only when they reach a terminal status, so queued and running
+# jobs never expire however long they wait.
+TTL_FIELDS = {"ocr_results": "timestamp", "status_checks": "timestamp", "jobs": "finished_at"}
+
+# Counters of a daily translation rollup row
+ROLLUP_COUNTERS = ("count", "image_count", "latency_sum", "latency_count")
+
+# A rollup claim older than this belongs to a worker that died mid-compaction
+ROLLUP_CLAIM_TIMEOUT = timedelta(hours=1)
+
+# Fields identifying one per-day LLM usage row
+LLM_USAGE_KEY = ("day", "endpoint", "model", "template", "language_pair")
+
+
+def _projection(fields: Optional[Sequence[str]]) -> dict:
+    """Mongo projection for the requested fields, always excluding _id"""
+    projection = {field: 1 for field in fields} if fields else {}
+    projection["_id"] = 0
+    return projection
+
+
+def _project(docs: List[dict], fields: Optional[Sequence[str]]) -> List[dict]:
+    """Copy documents out of the in-memory store, keeping only the requested fields"""
+    if not fields:
+        return copy.deepcopy(docs)
+    return [{field: doc[field] for field in fields if field in doc} for doc in docs]
+
+
+class Repository(ABC):
+    """Persistence operations used by the API handlers"""
+
+    async def ensure_indexes(self):
+        """Create whatever indexes the backend needs (no-op by default)"""
+
+    async def close(self):
+        """Release backend resources (no-op by default)"""
+
+    # Translations
+    @abstractmethod
+    async def insert_translation(self, doc: dict):
+        ...
+
+    @abstractmethod
+    async def recent_translations(self, limit: int, fields: Optional[Sequence[str]] = None) -> List[dict]:
+        ...
+
+    # OCR results
+    @abstractmethod
+    async def insert_ocr_result(self, doc: dict):
+        ...
+
+    @abstractmethod
+    async def recent_ocr_results(self, limit: int, fields: Optional[Sequence[str]] = None) -> List[dict]:
+        ...
+
+    # Conversations
+    @abstractmethod
+    async def create_conversation(self, doc: dict):
+        ...
+
+    @abstractmethod
+    async def allocate_message_sequence(self, conversation_id: str) -> Optional[int]:
+        """Atomically bump the conversation counters; None if it does not exist"""
+
+    @abstractmethod
+    async def insert_conversation_message(self, doc: dict):
+        ...
+
+    @abstractmethod
+    async def set_last_message(self, conversation_id: str, summary: dict):
+        """Store the last-message summary unless a newer message already did"""
+
+    @abstractmethod
+    async def list_conversation_messages(self, conversation_id: str, after_sequence: int, limit: int,
+                                         fields: Optional[Sequence[str]] = None) -> List[dict]:
+        ...
+
+    @abstractmethod
+    async def add_participant(self, doc: dict) -> bool:
+        """Add or update a participant; False if the conversation does not exist"""
+
+    @abstractmethod
+    async def list_participants(self, conversation_id: str) -> List[dict]:
+        ...
+
+    @abstractmethod
+    async def conversation_languages(self, conversation_id: str) -> Optional[List[str]]:
+        """Distinct preferred languages of the participants; None if the conversation does not exist"""
+
+    @abstractmethod
+    async def get_conversation_context(self, conversation_id: str,
+                                       fields: Optional[Sequence[str]] = None) -> Optional[dict]:
+        ...
+
+    @abstractmethod
+    async def save_conversation_context(self, state: dict, expected_version: int) -> bool:
+        """Persist the rolling summary and recent-message window of a conversation, only if the
+        stored state is still at expected_version (0: none stored yet); False otherwise"""
+
+    # Jobs
+    @abstractmethod
+    async def insert_job(self, doc: dict) -> bool:
+        """Insert a job; False if its idempotency key is already taken"""
+
+    @abstractmethod
+    async def get_job(self, job_id: str) -> Optional[dict]:
+        ...
+
+    @abstractmethod
+    async def find_job_by_idempotency_key(self, key: str) -> Optional[dict]:
+        ...
+
+    @abstractmethod
+    async def update_job(self, job_id: str, fields: dict, expected_status: Optional[str] = None) -> bool:
+        """Set fields on a job, only if it is still in ``expected_status`` when given"""
+
+    @abstractmethod
+    async def renew_job_leases(self, owner: str, now: datetime):
+        """Mark the owner's queued and running jobs as alive"""
+
+    @abstractmethod
+    async def fail_expired_jobs(self, cutoff: datetime, error: str) -> List[str]:
+        """Fail queued/running jobs whose owner stopped renewing before cutoff; their IDs"""
+
+    # Glossaries
+    @abstractmethod
+    async def get_glossary(self, tenant_id: str, include_entries: bool = True) -> Optional[dict]:
+        """A tenant's glossary; without ``include_entries`` only its version and metadata"""
+
+    @abstractmethod
+    async def save_glossary(self, doc: dict):
+        """Replace a tenant's glossary"""
+
+    # Status checks
+    @abstractmethod
+    async def insert_status_check(self, doc: dict):
+        ...
+
+    @abstractmethod
+    async def list_status_checks(self, limit: int, fields: Optional[Sequence[str]] = None) -> List[dict]:
+        ...
+
+    # Retention
+    @abstractmethod
+    async def apply_ttl(self, ttl_seconds: Dict[str, int]):
+        """Expire documents of TTL_FIELDS collections N seconds after their TTL field (0 keeps them forever)"""
+
+    async def purge_expired(self):
+        """Delete expired documents when the backend has no TTL monitor (no-op by default)"""
+
+    @abstractmethod
+    async def rollup_translations(self, cutoff: datetime) -> int:
+        """Fold translations older than cutoff into daily rollups, delete them and return the count.
+
+        Adds to existing rollup rows, and concurrent runs (one per worker) never fold a
+        translation twice.
+        """
+
+    @abstractmethod
+    async def translation_stats(self) -> List[dict]:
+        """Counts and average latency per language pair over rollups and live translations"""
+
+    @abstractmethod
+    async def top_source_texts(self, since: datetime, limit: int, max_length: int) -> List[dict]:
+        """Most frequently translated texts since a time: text, source_language and count, most frequent first"""
+
+    @abstractmethod
+    async def increment_llm_usage(self, rows: List[dict]):
+        """Add per-day LLM usage counters (day, endpoint, model, template, language_pair + counts)"""
+
+    @abstractmethod
+    async def llm_usage(self, since: datetime) -> List[dict]:
+        """Per-day LLM usage rows from ``since`` on"""
+
+
+def _pair_stats(rows: List[dict]) -> List[dict]:
+    """Merge per-day rows into per-language-pair totals"""
+    pairs: Dict[tuple, dict] = {}
+    for row in rows:
+        key = (row["source_language"], row["target_language"])
+        pair = pairs.setdefault(key, {
+            "source_language": key[0], "target_language": key[1],
+            "count": 0, "image_count": 0, "latency_sum": 0.0, "latency_count": 0
+        })
+        for field in ("count", "image_count", "latency_sum", "latency_count"):
+            pair[field] += row.get(field) or 0
+    stats = []
+    for pair in pairs.values():
+        latency_sum = pair.pop("latency_sum")
+        latency_count = pair.pop("latency_count")
+        pair["avg_latency"] = latency_sum / latency_count if latency_count else None
+        stats.append(pair)
+    return sorted(stats, key=lambda pair: pair["count"], reverse=True)
+
+
+class MongoRepository(Repository):
+    """Repository backed by MongoDB through Motor"""
+
+    def __init__(self, mongo_url: str, db_name: str):
+        from motor.motor_asyncio import AsyncIOMotorClient
+
+        self.client = AsyncIOMotorClient(mongo_url)
+        self.db = self.client[db_name]
+
+    async def ensure_indexes(self):
+        await self.db.conversations.create_index("id", unique=True)
+        await self.db.conversation_messages.create_index(
+            [("conversation_id", ASCENDING), ("sequence", ASCENDING)], unique=True,
+            partialFilterExpression={"sequence": {"$exists": True}}
+        )
+        await self.db.conversation_participants.create_index(
+            [("conversation_id", ASCENDING), ("participant_id", ASCENDING)], unique=True
+        )
+        await self.db.conversation_contexts.create_index("conversation_id", unique=True)
+        await self.db.translations.create_index([("timestamp", DESCENDING)])
+        await self.db.glossaries.create_index("tenant_id", unique=True)
+        await self.db.jobs.create_index("id", unique=True)
+        await self.db.jobs.create_index([("status", ASCENDING), ("heartbeat_at", ASCENDING)])
+        await self.db.jobs.create_index(
+            "idempotency_key", unique=True, partialFilterExpression={"idempotency_key": {"$exists": True}}
+        )
+
+    async def close(self):
+        self.client.close()
+
+    async def insert_translation(self, doc: dict):
+        await self.db.translations.insert_one(dict(doc))
+
+    async def recent_translations(self, limit: int, fields: Optional[Sequence[str]] = None) -> List[dict]:
+        cursor = self.db.translations.find({}, _projection(fields)).sort("timestamp", DESCENDING).limit(limit)
+        return await cursor.to_list(limit)
+
+    async def insert_ocr_result(self, doc: dict):
+        await self.db.ocr_results.insert_one(dict(doc))
+
+    async def recent_ocr_results(self, limit: int, fields: Optional[Sequence[str]] = None) -> List[dict]:
+        cursor = self.db.ocr_results.find({}, _projection(fields)).sort("timestamp", DESCENDING).limit(limit)
+        return await cursor.to_list(limit)
+
+    async def create_conversation(self, doc: dict):
+        await self.db.conversations.insert_one(dict(doc))
+
+    async def allocate_message_sequence(self, conversation_id: str) -> Optional[int]:
+        conversation = await self.db.conversations.find_one_and_update(
+            {"id": conversation_id},
+            {"$inc": {"message_count": 1, "last_sequence": 1}},
+            projection={"_id": 0, "last_sequence": 1},
+            return_document=ReturnDocument.AFTER
+        )
+        return conversation["last_sequence"] if conversation else None
+
+    async def insert_conversation_message(self, doc: dict):
+        await self.db.conversation_messages.insert_one(dict(doc))
+
+    async def set_last_message(self, conversation_id: str, summary: dict):
+        await self.db.conversations.update_one(
+            {"id": conversation_id, "last_message.sequence": {"$not": {"$gte": summary["sequence"]}}},
+            {"$set": {"last_message": summary, "updated_at": datetime.utcnow()}}
+        )
+
+    async def list_conversation_messages(self, conversation_id: str, after_sequence: int, limit: int,
+                                         fields: Optional[Sequence[str]] = None) -> List[dict]:
+        cursor = self.db.conversation_messages.find(
+            {"conversation_id": conversation_id, "sequence": {"$gt": after_sequence}}, _projection(fields)
+        ).sort("sequence", ASCENDING).limit(limit)
+        return await cursor.to_list(limit)
+
+    async def add_participant(self, doc: dict) -> bool:
+        conversation_id = doc["conversation_id"]
+        if not await self.db.conversations.find_one({"id": conversation_id}, {"_id": 1}):
+            return False
+        previous = await self.db.conversation_participants.find_one_and_update(
+            {"conversation_id": conversation_id, "participant_id": doc["participant_id"]},
+            {"$set": {"preferred_language": doc["preferred_language"]}, "$setOnInsert": {"joined_at": doc["joined_at"]}},
+            projection={"_id": 0, "preferred_language": 1},
+            upsert=True,
+            return_document=ReturnDocument.BEFORE
+        )
+        # The conversation keeps a per-language participant count, so message fan-out
+        # reads one small document instead of the participant list.
+        old_language = previous["preferred_language"] if previous else None
+        if old_language != doc["preferred_language"]:
+            inc = {f"languages.{doc['preferred_language']}": 1}
+            if old_language:
+                inc[f"languages.{old_language}"] = -1
+            await self.db.conversations.update_one({"id": conversation_id}, {"$inc": inc})
+        return True
+
+    async def list_participants(self, conversation_id: str) -> List[dict]:
+        cursor = self.db.conversation_participants.find({"conversation_id": conversation_id}, {"_id": 0})
+        return await cursor.to_list(None)
+
+    async def conversation_languages(self, conversation_id: str) -> Optional[List[str]]:
+        conversation = await self.db.conversations.find_one({"id": conversation_id}, {"_id": 0, "languages": 1})
+        if conversation is None:
+            return None
+        return [language for language, count in (conversation.get("languages") or {}).items() if count > 0]
+
+    async def get_conversation_context(self, conversation_id: str,
+                                       fields: Optional[Sequence[str]] = None) -> Optional[dict]:
+        return await self.db.conversation_contexts.find_one({"conversation_id": conversation_id}, _projection(fields))
+
+    async def save_conversation_context(self, state: dict, expected_version: int) -> bool:
+        query = {"conversation_id": state["conversation_id"]}
+        # States saved before versioning have no version field and count as version 0
+        query["version"] = expected_version if expected_version else {"$exists": False}
+        try:
+            await self.db.conversation_contexts.replace_one(query, dict(state), upsert=True)
+        except DuplicateKeyError:
+            return False  # another worker saved a newer state; the upsert hit the unique index
+        return True
+
+    async def insert_job(self, doc: dict) -> bool:
+        try:
+            await self.db.jobs.insert_one(dict(doc))
+        except DuplicateKeyError:
+            return False
+        return True
+
+    async def get_job(self, job_id: str) -> Optional[dict]:
+        return await self.db.jobs.find_one({"id": job_id}, {"_id": 0})
+
+    async def find_job_by_idempotency_key(self, key: str) -> Optional[dict]:
+        return await self.db.jobs.find_one({"idempotency_key": key}, {"_id": 0})
+
+    async def update_job(self, job_id: str, fields: dict, expected_status: Optional[str] = None) -> bool:
+        query = {"id": job_id}
+        if expected_status:
+            query["status"] = expected_status
+        result = await self.db.jobs.update_one(query, {"$set": fields})
+        return result.matched_count > 0
+
+    async def renew_job_leases(self, owner: str, now: datetime):
+        await self.db.jobs.update_many(
+            {"owner": owner, "status": {"$in": ["queued", "running"]}}, {"$set": {"heartbeat_at": now}}
+        )
+
+    async def fail_expired_jobs(self, cutoff: datetime, error: str) -> List[str]:
+        # Jobs from before leases have no heartbeat and are expired too
+        query = {
+            "status": {"$in": ["queued", "running"]},
+            "$or": [{"heartbeat_at": {"$lt": cutoff}}, {"heartbeat_at": {"$exists": False}}]
+        }
+        expired = [job["id"] async for job in self.db.jobs.find(query, {"_id": 0, "id": 1})]
+        if expired:
+            await self.db.jobs.update_many(
+                {**query, "id": {"$in": expired}},
+                {"$set": {"status": "failed", "error": error, "finished_at": datetime.utcnow()}}
+            )
+        return expired
+
+    async def get_glossary(self, tenant_id: str, include_entries: bool = True) -> Optional[dict]:
+        projection = {"_id": 0} if include_entries else {"_id": 0, "entries": 0}
+        return await self.db.glossaries.find_one({"tenant_id": tenant_id}, projection)
+
+    async def save_glossary(self, doc: dict):
+        await self.db.glossaries.replace_one({"tenant_id": doc["tenant_id"]}, dict(doc), upsert=True)
+
+    async def insert_status_check(self, doc: dict):
+        await self.db.status_checks.insert_one(dict(doc))
+
+    async def list_status_checks(self, limit: int, fields: Optional[Sequence[str]] = None) -> List[dict]:
+        return await self.db.status_checks.find({}, _projection(fields)).to_list(limit)
+
+    async def apply_ttl(self, ttl_seconds: Dict[str, int]):
+        # The timestamp index doubles as the history sort index, so it always exists;
+        # with a TTL it also lets the server-side TTL monitor trim the collection.
+        # Jobs expire on finished_at instead, through a partial index over finished jobs.
+        await self._drop_job_timestamp_ttl()
+        for collection, field in TTL_FIELDS.items():
+            seconds = ttl_seconds.get(collection, 0)
+            direction = DESCENDING if field == "timestamp" else ASCENDING
+            keys = [(field, direction)]
+            options = {}
+            if field != "timestamp":
+                options["partialFilterExpression"] = {field: {"$type": "date"}}
+            if seconds <= 0:
+                try:
+                    await self.db[collection].create_index(keys, **options)
+                except OperationFailure:
+                    pass  # an existing TTL index keeps serving the sort
+                continue
+            try:
+                await self.db[collection].create_index(keys, expireAfterSeconds=seconds, **options)
+            except OperationFailure:
+                # Index exists with other options: adjust the expiry in place
+                await self.db.command(
+                    "collMod", collection,
+                    index={"keyPattern": {field: direction}, "expireAfterSeconds": seconds}
+                )
+
+    async def _drop_job_timestamp_ttl(self):
+        """Drop the TTL on job creation time left by earlier versions; it deleted unfinished jobs"""
+        for name, index in (await self.db.jobs.index_information()).items():
+            if index["key"] == [("timestamp", DESCENDING)] and "expireAfterSeconds" in index:
+                await self.db.jobs.drop_index(name)
+
+    async def rollup_translations(self, cutoff: datetime) -> int:
+        # Every worker runs compaction. Each one first claims the old translations with
+        # its own token, so a document is folded by exactly one worker; the fold adds to
+        # the daily rows instead of replacing them, and only the claimed documents are
+        # deleted afterwards.
+        now = datetime.utcnow()
+        claim = {"token": uuid.uuid4().hex, "at": now}
+        old = {"timestamp": {"$lt": cutoff}}
+        await self.db.translations.update_many(
+            {**old, "$or": [{"rollup_claim": {"$exists": False}},
+                            {"rollup_claim.at": {"$lt": now - ROLLUP_CLAIM_TIMEOUT}}]},
+            {"$set": {"rollup_claim": claim}}
+        )
+        claimed = {**old, "rollup_claim.token": claim["token"]}
+        add_counters = {field: {"$add": [f"${field}", f"$$new.{field}"]} for field in ROLLUP_COUNTERS}
+        pipeline = [
+            {"$match": claimed},
+            {"$group": {
+                "_id": {
+                    "day": {"$dateTrunc": {"date": "$timestamp", "unit": "day"}},
+                    "source_language": "$source_language",
+                    "target_language": "$target_language"
+                },
+                "count": {"$sum": 1},
+                "image_count": {"$sum": {"$cond": [{"$eq": ["$is_image_translation", True]}, 1, 0]}},
+                "latency_sum": {"$sum": {"$cond": [{"$isNumber": "$processing_time"}, "$processing_time", 0]}},
+                "latency_count": {"$sum": {"$cond": [{"$isNumber": "$processing_time"}, 1, 0]}}
+            }},
+            {"$merge": {"into": "translation_rollups", "on": "_id", "whenMatched": [{"$set": add_counters}],
+                        "whenNotMatched": "insert"}}
+        ]
+        await self.db.translations.aggregate(pipeline).to_list(None)
+        result = await self.db.translations.delete_many(claimed)
+        return result.deleted_count
+
+    async def translation_stats(self) -> List[dict]:
+        group = {
+            "_id": {"source_language": "$source_language", "target_language": "$target_language"},
+            "count": {"$sum": 1},
+            "image_count": {"$sum": {"$cond": [{"$eq": ["$is_image_translation", True]}, 1, 0]}},
+            "latency_sum": {"$sum": {"$cond": [{"$isNumber": "$processing_time"}, "$processing_time", 0]}},
+            "latency_count": {"$sum": {"$cond": [{"$isNumber": "$processing_time"}, 1, 0]}}
+        }
+        rollup_group = {
+            "_id": {"source_language": "$_id.source_language", "target_language": "$_id.target_language"},
+            "count": {"$sum": "$count"},
+            "image_count": {"$sum": "$image_count"},
+            "latency_sum": {"$sum": "$latency_sum"},
+            "latency_count": {"$sum": "$latency_count"}
+        }
+        flatten = {"$replaceWith": {"$mergeObjects": ["$_id", {
+            "count": "$count", "image_count": "$image_count",
+            "latency_sum": "$latency_sum", "latency_count": "$latency_count"
+        }]}}
+        live = await self.db.translations.aggregate([{"$group": group}, flatten]).to_list(None)
+        archived = await self.db.translation_rollups.aggregate([{"$group": rollup_group}, flatten]).to_list(None)
+        return _pair_stats(live + archived)
+
+    async def top_source_texts(self, since: datetime, limit: int, max_length: int) -> List[dict]:
+        pipeline = [
+            {"$match": {"timestamp": {"$gte": since}, "is_image_translation": {"$ne": True}}},
+            {"$match": {"$expr": {"$lte": [{"$strLenCP": "$original_text"}, max_length]}}},
+            {"$group": {
+                "_id": {"text": "$original_text", "source_language": "$source_language"},
+                "count": {"$sum": 1}
+            }},
+            {"$sort": {"count": -1}},
+            {"$limit": limit},
+            {"$replaceWith": {"$mergeObjects": ["$_id", {"count": "$count"}]}}
+        ]
+        return await self.db.translations.aggregate(pipeline, allowDiskUse=True).to_list(None)
+
+    async def increment_llm_usage(self, rows: List[dict]):
+        operations = []
+        for row in rows:
+            key = {field: row[field] for field in LLM_USAGE_KEY}
+            counters = {field: value for field, value in row.items() if field not in LLM_USAGE_KEY}
+            operations.append(UpdateOne({"_id": key}, {"$inc": counters}, upsert=True))
+        await self.db.llm_usage.bulk_write(operations, ordered=False)
+
+    async def llm_usage(self, since: datetime) -> List[dict]:
+        pipeline = [
+            {"$match": {"_id.day": {"$gte": since}}},
+            {"$replaceWith": {"$mergeObjects": ["$_id", "$$ROOT"]}},
+            {"$project": {"_id": 0}}
+        ]
+        return await self.db.llm_usage.aggregate(pipeline).to_list(None)
+
+
+class MemoryRepository(Repository):
+    """In-process repository with the same query semantics, for tests and benchmarks"""
+
+    def __init__(self):
+        self.translations: List[dict] = []
+        self.ocr_results: List[dict] = []
+        self.status_checks: List[dict] = []
+        self.conversations: Dict[str, dict] = {}
+        # Per conversation: parallel lists of sequence numbers and messages, kept sorted
+        self.message_sequences: Dict[str, List[int]] = {}
+        self.messages: Dict[str, List[dict]] = {}
+        self.participants: Dict[str, Dict[str, dict]] = {}
+        self.conversation_contexts: Dict[str, dict] = {}
+        self.translation_rollups: Dict[tuple, dict] = {}
+        self.llm_usage_rows: Dict[tuple, dict] = {}
+        self.jobs: Dict[str, dict] = {}
+        self.job_idempotency_keys: Dict[str, str] = {}
+        self.glossaries: Dict[str, dict] = {}
+        self.ttl_seconds: Dict[str, int] = {}
+
+    @staticmethod
+    def _newest(docs: List[dict], limit: int, fields: Optional[Sequence[str]]) -> List[dict]:
+        newest = heapq.nlargest(limit, docs, key=lambda doc: doc["timestamp"])
+        return _project(newest, fields)
+
+    async def insert_translation(self, doc: dict):
+        self.translations.append(copy.deepcopy(doc))
+
+    async def recent_translations(self, limit: int, fields: Optional[Sequence[str]] = None) -> List[dict]:
+        return self._newest(self.translations, limit, fields)
+
+    async def insert_ocr_result(self, doc: dict):
+        self.ocr_results.append(copy.deepcopy(doc))
+
+    async def recent_ocr_results(self, limit: int, fields: Optional[Sequence[str]] = None) -> List[dict]:
+        return self._newest(self.ocr_results, limit, fields)
+
+    async def create_conversation(self, doc: dict):
+        self.conversations[doc["id"]] = copy.deepcopy(doc)
+
+    async def allocate_message_sequence(self, conversation_id: str) -> Optional[int]:
+        conversation = self.conversations.get(conversation_id)
+        if conversation is None:
+            return None
+        conversation["message_count"] = conversation.get("message_count", 0) + 1
+        conversation["last_sequence"] = conversation.get("last_sequence", 0) + 1
+        return conversation["last_sequence"]
+
+    async def insert_conversation_message(self, doc: dict):
+        conversation_id = doc["conversation_id"]
+        sequences = self.message_sequences.setdefault(conversation_id, [])
+        messages = self.messages.setdefault(conversation_id, [])
+        index = bisect.bisect_right(sequences, doc["sequence"])
+        sequences.insert(index, doc["sequence"])
+        messages.insert(index, copy.deepcopy(doc))
+
+    async def set_last_message(self, conversation_id: str, summary: dict):
+        conversation = self.conversations.get(conversation_id)
+        if conversation is None:
+            return
+        current = conversation.get("last_message")
+        if current is None or current["sequence"] < summary["sequence"]:
+            conversation["last_message"] = copy.deepcopy(summary)
+            conversation["updated_at"] = datetime.utcnow()
+
+    async def list_conversation_messages(self, conversation_id: str, after_sequence: int, limit: int,
+                                         fields: Optional[Sequence[str]] = None) -> List[dict]:
+        sequences = self.message_sequences.get(conversation_id, [])
+        start = bisect.bisect_right(sequences, after_sequence)
+        return _project(self.messages.get(conversation_id, [])[start:start + limit], fields)
+
+    async def add_participant(self, doc: dict) -> bool:
+        if doc["conversation_id"] not in self.conversations:
+            return False
+        participants = self.participants.setdefault(doc["conversation_id"], {})
+        existing = participants.get(doc["participant_id"])
+        if existing:
+            existing["preferred_language"] = doc["preferred_language"]
+        else:
+            participants[doc["participant_id"]] = copy.deepcopy(doc)
+        return True
+
+    async def list_participants(self, conversation_id: str) -> List[dict]:
+        return copy.deepcopy(list(self.participants.get(conversation_id, {}).values()))
+
+    async def conversation_languages(self, conversation_id: str) -> Optional[List[str]]:
+        if conversation_id not in self.conversations:
+            return None
+        participants = self.participants.get(conversation_id, {}).values()
+        return sorted({participant["preferred_language"] for participant in participants})
+
+    async def get_conversation_context(self, conversation_id: str,
+                                       fields: Optional[Sequence[str]] = None) -> Optional[dict]:
+        state = self.conversation_contexts.get(conversation_id)
+        return _project([state], fields)[0] if state is not None else None
+
+    async def save_conversation_context(self, state: dict, expected_version: int) -> bool:
+        stored = self.conversation_contexts.get(state["conversation_id"])
+        if (stored or {}).get("version", 0) != expected_version:
+            return False
+        self.conversation_contexts[state["conversation_id"]] = copy.deepcopy(state)
+        return True
+
+    async def insert_job(self, doc: dict) -> bool:
+        key = doc.get("idempotency_key")
+        if key:
+            if key in self.job_idempotency_keys:
+                return False
+            self.job_idempotency_keys[key] = doc["id"]
+        self.jobs[doc["id"]] = copy.deepcopy(doc)
+        return True
+
+    async def get_job(self, job_id: str) -> Optional[dict]:
+        return copy.deepcopy(self.jobs.get(job_id))
+
+    async def find_job_by_idempotency_key(self, key: str) -> Optional[dict]:
+        return await self.get_job(self.job_idempotency_keys.get(key))
+
+    async def update_job(self, job_id: str, fields: dict, expected_status: Optional[str] = None) -> bool:
+        job = self.jobs.get(job_id)
+        if job is None or (expected_status and job["status"] != expected_status):
+            return False
+        job.update(copy.deepcopy(fields))
+        return True
+
+    async def renew_job_leases(self, owner: str, now: datetime):
+        for job in self.jobs.values():
+            if job.get("owner") == owner and job["status"] in ("queued", "running"):
+                job["heartbeat_at"] = now
+
+    async def fail_expired_jobs(self, cutoff: datetime, error: str) -> List[str]:
+        expired = []
+        for job in self.jobs.values():
+            heartbeat = job.get("heartbeat_at")
+            if job["status"] in ("queued", "running") and (heartbeat is None or heartbeat < cutoff):
+                job.update(status="failed", error=error, finished_at=datetime.utcnow())
+                expired.append(job["id"])
+        return expired
+
+    async def get_glossary(self, tenant_id: str, include_entries: bool = True) -> Optional[dict]:
+        glossary = self.glossaries.get(tenant_id)
+        if glossary is None:
+            return None
+        if not include_entries:
+            return {key: value for key, value in glossary.items() if key != "entries"}
+        return copy.deepcopy(glossary)
+
+    async def save_glossary(self, doc: dict):
+        self.glossaries[doc["tenant_id"]] = copy.deepcopy(doc)
+
+    async def insert_status_check(self, doc: dict):
+        self.status_checks.append(copy.deepcopy(doc))
+
+    async def list_status_checks(self, limit: int, fields: Optional[Sequence[str]] = None) -> List[dict]:
+        return _project(self.status_checks[:limit], fields)
+
+    async def apply_ttl(self, ttl_seconds: Dict[str, int]):
+        self.ttl_seconds = {name: ttl_seconds.get(name, 0) for name in TTL_FIELDS}
+
+    async def purge_expired(self):
+        now = datetime.utcnow()
+        for name, seconds in self.ttl_seconds.items():
+            if seconds > 0:
+                expires_before = now - timedelta(seconds=seconds)
+                field = TTL_FIELDS[name]
+                docs = getattr(self, name)
+                if isinstance(docs, dict):
+                    expired_keys = [key for key, doc in docs.items()
+                                    if doc.get(field) is not None and doc[field] < expires_before]
+                    for key in expired_keys:
+                        expired = docs.pop(key)
+                        self.job_idempotency_keys.pop(expired.get("idempotency_key"), None)
+                else:
+                    docs[:] = [doc for doc in docs if doc[field] >= expires_before]
+
+    @staticmethod
+    def _stats_row(doc: dict) -> dict:
+        latency = doc.get("processing_time")
+        has_latency = isinstance(latency, (int, float))
+        return {
+            "source_language": doc["source_language"],
+            "target_language": doc["target_language"],
+            "count": 1,
+            "image_count": 1 if doc.get("is_image_translation") is True else 0,
+            "latency_sum": latency if has_latency else 0.0,
+            "latency_count": 1 if has_latency else 0
+        }
+
+    async def rollup_translations(self, cutoff: datetime) -> int:
+        old = [doc for doc in self.translations if doc["timestamp"] < cutoff]
+        days: Dict[tuple, List[dict]] = {}
+        for doc in old:
+            day = doc["timestamp"].replace(hour=0, minute=0, second=0, microsecond=0)
+            days.setdefault((day, doc["source_language"], doc["target_language"]), []).append(self._stats_row(doc))
+        for key, rows in days.items():
+            stored = self.translation_rollups.setdefault(
+                key, {"source_language": key[1], "target_language": key[2], **dict.fromkeys(ROLLUP_COUNTERS, 0)}
+            )
+            for field in ROLLUP_COUNTERS:
+                stored[field] += sum(row[field] for row in rows)
+        self.translations = [doc for doc in self.translations if doc["timestamp"] >= cutoff]
+        return len(old)
+
+    async def translation_stats(self) -> List[dict]:
+        live = [self._stats_row(doc) for doc in self.translations]
+        return _pair_stats(live + list(self.translation_rollups.values()))
+
+    async def top_source_texts(self, since: datetime, limit: int, max_length: int) -> List[dict]:
+        counts = Counter(
+            (doc["original_text"], doc["source_language"]) for doc in self.translations
+            if doc["timestamp"] >= since and doc.get("is_image_translation") is not True
+            and len(doc["original_text"]) <= max_length
+        )
+        return [
+            {"text": text, "source_language": source_language, "count": count}
+            for (text, source_language), count in counts.most_common(limit)
+        ]
+
+    async def increment_llm_usage(self, rows: List[dict]):
+        for row in rows:
+            key = tuple(row[field] for field in LLM_USAGE_KEY)
+            stored = self.llm_usage_rows.setdefault(key, dict(zip(LLM_USAGE_KEY, key)))
+            for field, value in row.items():
+                if field not in LLM_USAGE_KEY:
+                    stored[field] = stored.get(field, 0) + value
+
+    async def llm_usage(self, since: datetime) -> List[dict]:
+        return [dict(row) for row in self.llm_usage_rows.values() if row["day"] >= since]
+
+
+def create_repository() -> Repository:
+    """Build the repository selected by STORAGE_BACKEND ("mongo" or "memory")"""
+    backend = os.environ.get('STORAGE_BACKEND', 'mongo').lower()
+    if backend == 'memory':
+        return MemoryRepository()
+    if backend == 'mongo':
+        return MongoRepository(os.environ['MONGO_URL'], os.environ['DB_NAME'])
+    raise ValueError(f"Unknown STORAGE_BACKEND: {backend}")
@@ -0,0 +1,87 @@
+"""
+In-process translation cache with request coalescing.
+
+Completed translations are kept in a TTL-bounded LRU keyed by text, language pair,
+context and the glossary terms that applied. Concurrent requests for the same key
+share one in-flight LLM call instead of each starting their own.
+
+Configuration:
+    TRANSLATION_CACHE_SIZE           max cached entries (default 10000)
+    TRANSLATION_CACHE_TTL_SECONDS    entry lifetime (default 86400)
+"""
+
+import asyncio
+import os
+from typing import Awaitable, Callable, Dict, Optional
+
+from cachetools import TTLCache
+
+
+class TranslationCache:
+    """TTL/LRU cache of translations that coalesces concurrent misses"""
+
+    def __init__(self, maxsize: int = None, ttl: int = None):
+        maxsize = maxsize or int(os.environ.get('TRANSLATION_CACHE_SIZE', 10000))
+        ttl = ttl or int(os.environ.get('TRANSLATION_CACHE_TTL_SECONDS', 86400))
+        self.entries = TTLCache(maxsize=maxsize, ttl=ttl)
+        self.inflight: Dict[tuple, asyncio.Task] = {}
+        self.waiters: Dict[tuple, int] = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    @staticmethod
+    def key(text: str, source_lang: str, target_lang: str, context: Optional[str] = None,
+            terminology: tuple = ()) -> tuple:
+        return (text, source_lang, target_lang, context, terminology)
+
+    def get(self, key: tuple):
+        return self.entries.get(key)
+
+    def set(self, key: tuple, value):
+        self.entries[key] = value
+
+    async def get_or_compute(self, key: tuple, compute: Callable[[], Awaitable]):
+        """Return the cached value, joining an in-flight computation if there is one"""
+        value = self.entries.get(key)
+        if value is not None:
+            self.hits += 1
+            return value
+        task = self.inflight.get(key)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            self.misses += 1
+            # Its own task, so a caller that goes away does not take the other waiters with it
+            task = self.inflight[key] = asyncio.ensure_future(self._compute(key, compute))
+            self.waiters[key] = 0
+        self.waiters[key] += 1
+        try:
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            if self.waiters.get(key) == 1 and not task.done():
+                task.cancel()  # nobody is waiting for the result any more
+            raise
+        finally:
+            if self.inflight.get(key) is task:
+                self.waiters[key] -= 1
+
+    async def _compute(self, key: tuple, compute: Callable[[], Awaitable]):
+        try:
+            value = await compute()
+            self.entries[key] = value
+            return value
+        finally:
+            self.inflight.pop(key, None)
+            self.waiters.pop(key, None)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses + self.coalesced
+        return {
+            "size": len(self.entries),
+            "maxsize": self.entries.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "hit_rate": (self.hits + self.coalesced) / lookups if lookups else 0.0
+        }
@@ -0,0 +1,183 @@
+"""
+Incremental translation sessions for live-typing input.
+
+A session keeps the source text of the text screen split into sentence segments,
+together with the translation of each segment. Each new revision of the text is
+diffed against the previous one at segment level. Only inserted or changed
+segments are translated, through the shared translation cache, and the client gets
+a patch against its copy of the translated segments. Latency and tokens follow the
+size of the edit rather than the length of the text.
+
+Segments are translated without their neighbours as context, so that an edit in
+one sentence never invalidates another one. Leading and trailing whitespace of a
+segment is kept verbatim and not sent to the LLM, so the joined translation has
+the same paragraph layout as the source.
+
+Sessions live in the worker's memory; a revision sent to a worker that does not
+know the session gets 404, and the client starts a new session.
+
+Configuration:
+    TRANSLATION_SESSION_TTL_SECONDS   idle lifetime of a session (default 1800)
+    TRANSLATION_SESSION_MAX           sessions kept per worker (default 10000)
+    TRANSLATION_SESSION_MAX_CHARS     longest text accepted (default 20000)
+"""
+
+import asyncio
+import difflib
+import os
+import re
+import uuid
+from typing import Awaitable, Callable, List, Optional, Tuple
+
+from cachetools import TTLCache
+
+# A sentence ends at terminal punctuation (plus closing quotes/brackets) followed by
+# whitespace, at CJK full stops, or at a line break
+SEGMENT_BOUNDARY = re.compile(r"[.!?؟।]+[\"'”’)\]]*\s+|[。！？]+\s*|\n+")
+
+# translate(text, source_language, target_language) -> translated text
+Translator = Callable[[str, str, str], Awaitable[str]]
+Detector = Callable[[str], Awaitable[str]]
+
+DETECTION_SAMPLE_CHARS = 500
+
+
+class SessionNotFound(LookupError):
+    pass
+
+
+class TextTooLong(ValueError):
+    pass
+
+
+class RevisionConflict(Exception):
+    """The client's base revision is not the session's current revision"""
+
+    def __init__(self, revision: int):
+        super().__init__(f"Session is at revision {revision}")
+        self.revision = revision
+
+
+def split_segments(text: str) -> List[str]:
+    """Sentence segments whose concatenation is exactly the text"""
+    segments, start = [], 0
+    for boundary in SEGMENT_BOUNDARY.finditer(text):
+        segments.append(text[start:boundary.end()])
+        start = boundary.end()
+    if start < len(text):
+        segments.append(text[start:])
+    return segments
+
+
+def split_whitespace(segment: str) -> Tuple[str, str, str]:
+    core = segment.strip()
+    if not core:
+        return segment, "", ""
+    lead = segment[:len(segment) - len(segment.lstrip())]
+    trail = segment[len(segment.rstrip()):]
+    return lead, core, trail
+
+
+class TranslationSession:
+    def __init__(self, source_language: str, target_language: str):
+        self.id = str(uuid.uuid4())
+        self.source_language = source_language  # "auto" until the first text is detected
+        self.target_language = target_language
+        self.revision = 0
+        self.segments: List[str] = []
+        self.translations: List[str] = []
+        self.lock = asyncio.Lock()
+
+    def state(self) -> dict:
+        return {
+            "session_id": self.id,
+            "revision": self.revision,
+            "source_language": self.source_language,
+            "target_language": self.target_language,
+            "segments": self.translations,
+            "translated_text": "".join(self.translations)
+        }
+
+
+class TranslationSessionManager:
+    """Creates sessions and applies revisions, translating only what changed"""
+
+    def __init__(self, translate: Translator, detect: Detector, ttl: int = None, max_sessions: int = None):
+        self.translate = translate
+        self.detect = detect
+        self.sessions = TTLCache(
+            maxsize=max_sessions or int(os.environ.get('TRANSLATION_SESSION_MAX', 10000)),
+            ttl=ttl or int(os.environ.get('TRANSLATION_SESSION_TTL_SECONDS', 1800))
+        )
+        self.max_chars = int(os.environ.get('TRANSLATION_SESSION_MAX_CHARS', 20000))
+        self.segments_translated = 0
+        self.segments_reused = 0
+
+    def get(self, session_id: str) -> TranslationSession:
+        session = self.sessions.get(session_id)
+        if session is None:
+            raise SessionNotFound(session_id)
+        self.sessions[session_id] = session  # reading counts as activity
+        return session
+
+    async def create(self, text: str, source_language: str, target_language: str) -> dict:
+        session = TranslationSession(source_language, target_language)
+        result = await self._apply(session, text)
+        self.sessions[session.id] = session
+        return {**session.state(), "stats": result["stats"]}
+
+    async def revise(self, session_id: str, text: str, base_revision: Optional[int] = None) -> dict:
+        session = self.get(session_id)
+        async with session.lock:
+            if base_revision is not None and base_revision != session.revision:
+                raise RevisionConflict(session.revision)
+            return await self._apply(session, text)
+
+    async def _apply(self, session: TranslationSession, text: str) -> dict:
+        if len(text) > self.max_chars:
+            raise TextTooLong(f"Text is {len(text)} characters; the limit is {self.max_chars}")
+        if session.source_language == "auto" and text.strip():
+            session.source_language = await self.detect(text[:DETECTION_SAMPLE_CHARS])
+
+        segments = split_segments(text)
+        matcher = difflib.SequenceMatcher(None, session.segments, segments, autojunk=False)
+        opcodes = [opcode for opcode in matcher.get_opcodes() if opcode[0] != "equal"]
+        changed = [segment for tag, _, _, j1, j2 in opcodes for segment in segments[j1:j2]]
+        translated = iter(await asyncio.gather(*(self._segment(session, segment) for segment in changed)))
+
+        # Ops refer to indices in the previous revision and are listed from the end,
+        # so a client can splice them into its segment list one after another
+        patch = []
+        for tag, i1, i2, j1, j2 in opcodes:
+            patch.append({"op": tag, "start": i1, "end": i2, "segments": [next(translated) for _ in range(j2 - j1)]})
+        patch.reverse()
+        translations = list(session.translations)
+        for op in patch:
+            translations[op["start"]:op["end"]] = op["segments"]
+
+        reused = len(segments) - len(changed)
+        self.segments_translated += len(changed)
+        self.segments_reused += reused
+        session.segments = segments
+        session.translations = translations
+        session.revision += 1
+        return {
+            "session_id": session.id,
+            "revision": session.revision,
+            "source_language": session.source_language,
+            "patch": patch,
+            "stats": {"segments": len(segments), "translated_segments": len(changed), "reused_segments": reused}
+        }
+
+    async def _segment(self, session: TranslationSession, segment: str) -> str:
+        lead, core, trail = split_whitespace(segment)
+        if not core or session.source_language in ("auto", session.target_language):
+            return segment
+        return lead + await self.translate(core, session.source_language, session.target_language) + trail
+
+    def stats(self) -> dict:
+        return {
+            "sessions": len(self.sessions),
+            "segments_translated": self.segments_translated,
+            "segments_reused": self.segments_reused
+        }
@@ -0,0 +1,348 @@
+"""
+Streaming voice translation pipeline.
+
+Audio arrives in chunks (16-bit mono PCM, optionally with a WAV header) and is
+decoded incrementally. An energy-based segmenter splits it into utterances;
+each completed utterance is transcribed by a pluggable ASR backend and handed to
+translation straight away, so translating one segment overlaps with recognising
+the next. Partial transcripts of the utterance in progress are pushed as they
+become available.
+
+Sample rates outside 8-48 kHz are refused. Completed utterances waiting for ASR
+are capped: once they add up to VOICE_MAX_BUFFERED_SECONDS of audio, ``feed``
+waits for recognition to catch up, so a client sending faster than real time is
+slowed down instead of growing the buffer.
+
+Configuration:
+    ASR_BACKEND                   "whisper" (faster-whisper, CPU) or "stub" (deterministic, for tests)
+    ASR_WHISPER_MODEL             faster-whisper model size (default "base")
+    VOICE_MAX_BUFFERED_SECONDS    audio waiting for ASR per stream (default 30)
+"""
+
+import asyncio
+import logging
+import os
+import struct
+import time
+from abc import ABC, abstractmethod
+from typing import Awaitable, Callable, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SAMPLE_RATE = 16000
+MIN_SAMPLE_RATE = 8000
+MAX_SAMPLE_RATE = 48000
+MAX_WAV_HEADER_BYTES = 64 * 1024
+
+
+def check_sample_rate(sample_rate: int) -> int:
+    if not MIN_SAMPLE_RATE <= sample_rate <= MAX_SAMPLE_RATE:
+        raise ValueError(f"Sample rate must be between {MIN_SAMPLE_RATE} and {MAX_SAMPLE_RATE} Hz")
+    return sample_rate
+
+
+class PcmStreamDecoder:
+    """Incrementally decodes 16-bit little-endian mono PCM, skipping a leading WAV header"""
+
+    def __init__(self, sample_rate: int = DEFAULT_SAMPLE_RATE):
+        self.sample_rate = check_sample_rate(sample_rate)
+        self.header_checked = False
+        self.pending = b""
+
+    def feed(self, data: bytes) -> np.ndarray:
+        self.pending += data
+        if not self.header_checked:
+            if len(self.pending) < 12:
+                return np.empty(0, dtype=np.int16)
+            if self.pending[:4] == b"RIFF" and self.pending[8:12] == b"WAVE":
+                if not self._consume_wav_header():
+                    if len(self.pending) > MAX_WAV_HEADER_BYTES:
+                        raise ValueError("WAV header has no data chunk")
+                    return np.empty(0, dtype=np.int16)
+            self.header_checked = True
+        usable = len(self.pending) - len(self.pending) % 2
+        samples = np.frombuffer(self.pending[:usable], dtype="<i2").astype(np.int16)
+        self.pending = self.pending[usable:]
+        return samples
+
+    def _consume_wav_header(self) -> bool:
+        """Walk RIFF chunks up to "data"; False until enough bytes have arrived"""
+        offset = 12
+        while offset + 8 <= len(self.pending):
+            chunk_id = self.pending[offset:offset + 4]
+            chunk_size = struct.unpack("<I", self.pending[offset + 4:offset + 8])[0]
+            if chunk_id == b"data":
+                self.pending = self.pending[offset + 8:]
+                return True
+            if chunk_id == b"fmt ":
+                if offset + 8 + 16 > len(self.pending):
+                    return False
+                channels, sample_rate = struct.unpack("<HI", self.pending[offset + 10:offset + 16])
+                bits = struct.unpack("<H", self.pending[offset + 22:offset + 24])[0]
+                if channels != 1 or bits != 16:
+                    raise ValueError("Only 16-bit mono audio is supported")
+                self.sample_rate = check_sample_rate(sample_rate)
+            offset += 8 + chunk_size + (chunk_size % 2)
+        return False
+
+
+class SegmentEvent:
+    """An utterance in progress ("partial") or a completed one ("final")"""
+
+    def __init__(self, kind: str, audio: np.ndarray, speech_end_at: float):
+        self.kind = kind
+        self.audio = audio
+        self.speech_end_at = speech_end_at  # time the last voiced audio was received
+
+
+class EnergySegmenter:
+    """Splits a sample stream into utterances using frame RMS and a silence timeout"""
+
+    def __init__(self, sample_rate: int, threshold: float = 500.0, frame_ms: int = 30, silence_ms: int = 600,
+                 min_speech_ms: int = 200, max_segment_ms: int = 15000, partial_every_ms: int = 1000):
+        self.frame_size = sample_rate * frame_ms // 1000
+        self.threshold = threshold
+        self.silence_frames = silence_ms // frame_ms
+        self.min_speech_frames = min_speech_ms // frame_ms
+        self.max_segment_frames = max_segment_ms // frame_ms
+        self.partial_every_frames = partial_every_ms // frame_ms
+        self.leftover = np.empty(0, dtype=np.int16)
+        self._reset()
+
+    def _reset(self):
+        self.frames: List[np.ndarray] = []
+        self.voiced = 0
+        self.trailing_silence = 0
+        self.since_partial = 0
+        self.speech_end_at = 0.0
+
+    def push(self, samples: np.ndarray, received_at: float) -> List[SegmentEvent]:
+        samples = np.concatenate([self.leftover, samples]) if len(self.leftover) else samples
+        usable = len(samples) - len(samples) % self.frame_size
+        self.leftover = samples[usable:]
+        events = []
+        for frame in samples[:usable].reshape(-1, self.frame_size):
+            rms = float(np.sqrt(np.mean(frame.astype(np.float32) ** 2)))
+            if rms >= self.threshold:
+                self.frames.append(frame)
+                self.voiced += 1
+                self.trailing_silence = 0
+                self.speech_end_at = received_at
+            elif self.frames:
+                self.frames.append(frame)
+                self.trailing_silence += 1
+            else:
+                continue
+            self.since_partial += 1
+
+            if self.trailing_silence >= self.silence_frames or len(self.frames) >= self.max_segment_frames:
+                event = self._finish()
+                if event:
+                    events.append(event)
+            elif self.since_partial >= self.partial_every_frames and self.trailing_silence == 0:
+                self.since_partial = 0
+                events.append(SegmentEvent("partial", np.concatenate(self.frames), self.speech_end_at))
+        return events
+
+    def flush(self) -> List[SegmentEvent]:
+        """End of stream: emit whatever utterance is still open"""
+        event = self._finish()
+        return [event] if event else []
+
+    def _finish(self) -> Optional[SegmentEvent]:
+        event = None
+        if self.voiced >= self.min_speech_frames:
+            speech = self.frames[:len(self.frames) - self.trailing_silence]
+            event = SegmentEvent("final", np.concatenate(speech), self.speech_end_at)
+        self._reset()
+        return event
+
+
+class ASRBackend(ABC):
+    """Speech recogniser; transcribe() is CPU-bound and runs in a worker thread"""
+
+    supports_partials = True
+
+    @abstractmethod
+    def transcribe(self, audio: np.ndarray, sample_rate: int, language: Optional[str]) -> Tuple[str, Optional[str]]:
+        """Return the transcript and the detected language code (None if unknown)"""
+
+
+class StubASRBackend(ASRBackend):
+    """Deterministic recogniser for tests: describes the audio instead of decoding speech"""
+
+    def transcribe(self, audio: np.ndarray, sample_rate: int, language: Optional[str]) -> Tuple[str, Optional[str]]:
+        seconds = len(audio) / sample_rate
+        return f"utterance of {seconds:.1f} seconds", language
+
+
+class WhisperASRBackend(ASRBackend):
+    """Local CPU recogniser using faster-whisper"""
+
+    supports_partials = False  # re-decoding the growing utterance is too costly on CPU
+
+    def __init__(self, model_size: str = None):
+        from faster_whisper import WhisperModel
+
+        model_size = model_size or os.environ.get('ASR_WHISPER_MODEL', 'base')
+        self.model = WhisperModel(model_size, device="cpu", compute_type="int8")
+
+    def transcribe(self, audio: np.ndarray, sample_rate: int, language: Optional[str]) -> Tuple[str, Optional[str]]:
+        if sample_rate != DEFAULT_SAMPLE_RATE:
+            # faster-whisper expects 16 kHz float audio
+            positions = np.linspace(0, len(audio) - 1, int(len(audio) * DEFAULT_SAMPLE_RATE / sample_rate))
+            audio = np.interp(positions, np.arange(len(audio)), audio)
+        segments, info = self.model.transcribe(
+            (audio / 32768.0).astype(np.float32), language=language, beam_size=1, vad_filter=False
+        )
+        return " ".join(segment.text.strip() for segment in segments), info.language
+
+
+def create_asr_backend() -> ASRBackend:
+    """Build the recogniser selected by ASR_BACKEND"""
+    backend = os.environ.get('ASR_BACKEND', 'whisper').lower()
+    if backend == 'stub':
+        return StubASRBackend()
+    if backend == 'whisper':
+        return WhisperASRBackend()
+    raise ValueError(f"Unknown ASR_BACKEND: {backend}")
+
+
+# translate(text, detected_language) -> (translated_text, source_language)
+Translate = Callable[[str, Optional[str]], Awaitable[Tuple[str, str]]]
+Send = Callable[[dict], Awaitable[None]]
+
+
+class VoiceStreamSession:
+    """Runs decode -> segment -> ASR -> translate for one audio stream, pushing results via send"""
+
+    def __init__(self, asr: ASRBackend, translate: Translate, send: Send,
+                 sample_rate: int = DEFAULT_SAMPLE_RATE, language: Optional[str] = None,
+                 max_buffered_seconds: float = None):
+        self.asr = asr
+        self.translate = translate
+        self.send = send
+        self.language = language
+        self.decoder = PcmStreamDecoder(sample_rate)
+        self.segmenter = None
+        self.segments: asyncio.Queue = asyncio.Queue()
+        self.max_buffered_seconds = max_buffered_seconds or float(os.environ.get('VOICE_MAX_BUFFERED_SECONDS', 30))
+        self.buffered_bytes = 0  # audio of utterances waiting for ASR
+        self.drained = asyncio.Event()
+        self.partial_task: Optional[asyncio.Task] = None
+        self.translations: List[asyncio.Task] = []
+        self.latencies_ms: List[float] = []
+        self.results: List[dict] = []
+        self.finalized = 0
+        self.worker = asyncio.create_task(self._recognise())
+        self.worker.add_done_callback(lambda _: self.drained.set())  # never leave feed() waiting
+
+    async def feed(self, data: bytes):
+        samples = self.decoder.feed(data)
+        if self.segmenter is None:
+            if not self.decoder.header_checked:
+                return
+            self.segmenter = EnergySegmenter(self.decoder.sample_rate)
+        for event in self.segmenter.push(samples, time.perf_counter()):
+            self._dispatch(event)
+        limit = self.max_buffered_seconds * self.decoder.sample_rate * 2
+        while self.buffered_bytes > limit and not self.worker.done():
+            # Backpressure: take no more audio until recognition catches up
+            self.drained.clear()
+            await self.drained.wait()
+
+    async def finish(self) -> dict:
+        """Flush the open utterance, wait for every translation and return a summary"""
+        if self.segmenter:
+            for event in self.segmenter.flush():
+                self._dispatch(event)
+        await self.segments.put(None)
+        await self.worker
+        if self.translations:
+            await asyncio.gather(*self.translations)
+        latencies = sorted(self.latencies_ms)
+        return {
+            "type": "done",
+            "segments": len(self.results),
+            "latency_ms_avg": sum(latencies) / len(latencies) if latencies else None,
+            "latency_ms_max": latencies[-1] if latencies else None
+        }
+
+    async def close(self):
+        self.worker.cancel()
+        for task in self.translations:
+            task.cancel()
+
+    def _dispatch(self, event: SegmentEvent):
+        if event.kind == "final":
+            self.buffered_bytes += event.audio.nbytes
+            self.segments.put_nowait(event)
+            self.finalized += 1
+        elif self.asr.supports_partials and (self.partial_task is None or self.partial_task.done()):
+            # Skip partials while one is still being decoded; the next one supersedes it
+            self.partial_task = asyncio.create_task(self._partial(event, self.finalized))
+
+    async def _run_asr(self, audio: np.ndarray) -> Tuple[str, Optional[str]]:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            None, self.asr.transcribe, audio, self.decoder.sample_rate, self.language
+        )
+
+    async def _partial(self, event: SegmentEvent, index: int):
+        try:
+            text, _ = await self._run_asr(event.audio)
+            await self.send({"type": "partial", "segment": index, "text": text})
+        except Exception as e:
+            logger.error(f"Partial transcription failed: {e}")
+
+    async def _recognise(self):
+        """Transcribe completed utterances in order; translation runs concurrently"""
+        index = 0
+        previous = None
+        while True:
+            event = await self.segments.get()
+            if event is None:
+                return
+            asr_started = time.perf_counter()
+            try:
+                text, detected = await self._run_asr(event.audio)
+            except Exception as e:
+                logger.error(f"Transcription failed: {e}")
+                await self.send({"type": "error", "segment": index, "detail": f"Transcription failed: {e}"})
+                index += 1
+                continue
+            finally:
+                self.buffered_bytes -= event.audio.nbytes
+                self.drained.set()
+            asr_ms = (time.perf_counter() - asr_started) * 1000
+            previous = asyncio.create_task(self._translate(index, text, detected, event, asr_ms, previous))
+            self.translations.append(previous)
+            index += 1
+
+    async def _translate(self, index: int, text: str, detected: Optional[str], event: SegmentEvent,
+                         asr_ms: float, previous: Optional[asyncio.Task]):
+        translation_started = time.perf_counter()
+        result = {"type": "final", "segment": index, "text": text}
+        try:
+            if text.strip():
+                result["translated_text"], result["source_language"] = await self.translate(text, detected)
+            else:
+                result["translated_text"], result["source_language"] = "", detected
+        except Exception as e:
+            logger.error(f"Segment translation failed: {e}")
+            result["error"] = f"Translation failed: {e}"
+        translation_ms = (time.perf_counter() - translation_started) * 1000
+        if previous:
+            # Keep results in segment order even when a later translation finishes first
+            await asyncio.gather(previous, return_exceptions=True)
+        latency_ms = (time.perf_counter() - event.speech_end_at) * 1000
+        result["timing_ms"] = {
+            "asr": round(asr_ms, 1),
+            "translation": round(translation_ms, 1),
+            "end_of_speech_to_translation": round(latency_ms, 1)
+        }
+        self.latencies_ms.append(latency_ms)
+        self.results.append(result)
+        await self.send(result)
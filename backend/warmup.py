@@ -0,0 +1,203 @@
+"""
+Translation cache warm-up from history.
+
+After a deploy or a cache flush, the first users of the day pay for cold LLM calls
+on the most common phrases. The warm-up job mines recent translations for the
+most frequent short source texts, and the pair statistics for the busiest target
+languages among the supported ones. It pre-translates every (text, target) pair
+that is not cached yet, most frequent texts first.
+
+Texts are sent in batches, several per LLM call (one JSON array per prompt), at
+a bounded call rate and with bulk priority, so warming never competes with live
+traffic. Results go straight into the translation cache under the same keys that
+live requests use. The cache is per worker, so under serve.py each worker warms
+its own. Starting a run and reading its progress (POST/GET /api/cache/warmup)
+require the admin token.
+
+Configuration:
+    WARMUP_ON_STARTUP           run once when the server starts (default false)
+    WARMUP_INTERVAL_SECONDS     run periodically, 0 disables (default 0)
+    WARMUP_TOP_TEXTS            most frequent source texts to warm (default 500)
+    WARMUP_TOP_LANGUAGES        busiest target languages to warm (default 5)
+    WARMUP_LOOKBACK_DAYS        history window mined for texts (default 7)
+    WARMUP_MAX_TEXT_CHARS       longer texts are left out (default 200)
+    WARMUP_BATCH_SIZE           texts per LLM call (default 20)
+    WARMUP_CALLS_PER_MINUTE     LLM call rate limit (default 30)
+"""
+
+import asyncio
+import logging
+import os
+import time
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+
+from metrics import CACHE_WARMUP_COVERAGE, CACHE_WARMUP_TRANSLATIONS_TOTAL
+from scheduler import RequestPriority, current_priority
+from storage import Repository
+from translation_cache import TranslationCache
+
+logger = logging.getLogger(__name__)
+
+# translate_batch(texts, source_language, target_language) -> [(translated_text, confidence)]
+BatchTranslator = Callable[[List[str], str, str], Awaitable[List[Tuple[str, float]]]]
+# cache_key(text, source_language, target_language) -> the key a live request would use
+CacheKey = Callable[[str, str, str], Awaitable[tuple]]
+
+
+class WarmupRunning(Exception):
+    pass
+
+
+class CacheWarmer:
+    """Pre-translates popular (text, target language) pairs into the translation cache"""
+
+    def __init__(self, repo: Repository, cache: TranslationCache, translate_batch: BatchTranslator,
+                 cache_key: CacheKey, languages: Sequence[str]):
+        self.repo = repo
+        self.cache = cache
+        self.translate_batch = translate_batch
+        self.cache_key = cache_key
+        self.languages = set(languages)
+        self.on_startup = os.environ.get('WARMUP_ON_STARTUP', 'false').lower() in ('1', 'true', 'yes')
+        self.interval_seconds = int(os.environ.get('WARMUP_INTERVAL_SECONDS', 0))
+        self.top_texts = int(os.environ.get('WARMUP_TOP_TEXTS', 500))
+        self.top_languages = int(os.environ.get('WARMUP_TOP_LANGUAGES', 5))
+        self.lookback_days = int(os.environ.get('WARMUP_LOOKBACK_DAYS', 7))
+        self.max_text_chars = int(os.environ.get('WARMUP_MAX_TEXT_CHARS', 200))
+        self.batch_size = int(os.environ.get('WARMUP_BATCH_SIZE', 20))
+        self.call_interval = 60 / max(1, int(os.environ.get('WARMUP_CALLS_PER_MINUTE', 30)))
+        self.task: Optional[asyncio.Task] = None
+        self.status = {"state": "idle", "runs": 0}
+        self.traffic = {"total": 0, "warm": 0}  # request counts behind the planned and the warm pairs
+
+    def start(self) -> Optional[asyncio.Task]:
+        """Schedule the startup run and/or the periodic runs; None when neither is enabled"""
+        if not self.on_startup and self.interval_seconds <= 0:
+            return None
+        return asyncio.create_task(self._loop())
+
+    async def _loop(self):
+        if not self.on_startup:
+            await asyncio.sleep(self.interval_seconds)
+        while True:
+            try:
+                await self.run()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Cache warm-up failed: {e}")
+            if self.interval_seconds <= 0:
+                return
+            await asyncio.sleep(self.interval_seconds)
+
+    def trigger(self) -> asyncio.Task:
+        """Start a run in the background; raises WarmupRunning if one is in progress"""
+        if self.running or (self.task is not None and not self.task.done()):
+            raise WarmupRunning()
+        self.task = asyncio.create_task(self._logged_run())
+        return self.task
+
+    async def _logged_run(self):
+        try:
+            await self.run()
+        except Exception as e:
+            logger.error(f"Cache warm-up failed: {e}")
+
+    @property
+    def running(self) -> bool:
+        return self.status["state"] == "running"
+
+    async def plan(self) -> Tuple[List[str], List[dict]]:
+        """Target languages and source texts to warm, busiest first"""
+        per_language: Dict[str, int] = {}
+        for pair in await self.repo.translation_stats():
+            if pair["target_language"] in self.languages:
+                per_language[pair["target_language"]] = per_language.get(pair["target_language"], 0) + pair["count"]
+        targets = sorted(per_language, key=per_language.get, reverse=True)[:self.top_languages]
+        since = datetime.utcnow() - timedelta(days=self.lookback_days)
+        texts = await self.repo.top_source_texts(since, self.top_texts, self.max_text_chars)
+        return targets, [text for text in texts if text["text"].strip()]
+
+    async def run(self) -> dict:
+        if self.running:
+            raise WarmupRunning()
+        # Warm-up calls queue behind every interactive and camera request
+        current_priority.set(RequestPriority("bulk", "cache-warmup"))
+        status = self.status = {
+            "state": "running", "runs": self.status["runs"] + 1, "started_at": datetime.utcnow(),
+            "finished_at": None, "target_languages": [], "texts": 0, "pairs": 0, "already_cached": 0,
+            "warmed": 0, "failed": 0, "llm_calls": 0, "coverage": 0.0, "traffic_coverage": 0.0
+        }
+        try:
+            targets, texts = await self.plan()
+            status.update(target_languages=targets, texts=len(texts))
+
+            # Pairs not cached yet, grouped per language pair to be batched
+            groups: Dict[Tuple[str, str], List[dict]] = {}
+            keys = {}
+            self.traffic = {"total": 0, "warm": 0}
+            for text in texts:
+                for target in targets:
+                    if target == text["source_language"]:
+                        continue
+                    status["pairs"] += 1
+                    self.traffic["total"] += text["count"]
+                    key = await self.cache_key(text["text"], text["source_language"], target)
+                    if self.cache.get(key) is not None:
+                        status["already_cached"] += 1
+                        self.traffic["warm"] += text["count"]
+                        continue
+                    keys[(text["text"], text["source_language"], target)] = key
+                    groups.setdefault((text["source_language"], target), []).append(text)
+            batches = [
+                (source, target, items[start:start + self.batch_size])
+                for (source, target), items in groups.items()
+                for start in range(0, len(items), self.batch_size)
+            ]
+            # Most requested texts first, so a rate-limited run covers the most traffic early
+            batches.sort(key=lambda batch: -sum(item["count"] for item in batch[2]))
+
+            next_call = 0.0
+            for source, target, items in batches:
+                delay = next_call - time.monotonic()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                next_call = time.monotonic() + self.call_interval
+                status["llm_calls"] += 1
+                try:
+                    results = await self.translate_batch([item["text"] for item in items], source, target)
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    logger.warning(f"Warm-up batch {source}-{target} of {len(items)} texts failed: {e}")
+                    status["failed"] += len(items)
+                    CACHE_WARMUP_TRANSLATIONS_TOTAL.labels("failed").inc(len(items))
+                    continue
+                for item, result in zip(items, results):
+                    self.cache.set(keys[(item["text"], source, target)], result)
+                status["warmed"] += len(items)
+                self.traffic["warm"] += sum(item["count"] for item in items)
+                CACHE_WARMUP_TRANSLATIONS_TOTAL.labels("warmed").inc(len(items))
+                self._update_coverage()
+            self._update_coverage()
+            status["state"] = "completed"
+            logger.info(f"Cache warm-up: {status['warmed']} translations warmed, "
+                        f"{status['already_cached']} already cached, {status['failed']} failed "
+                        f"in {status['llm_calls']} LLM calls")
+        except BaseException:
+            status["state"] = "failed"
+            raise
+        finally:
+            status["finished_at"] = datetime.utcnow()
+        return status
+
+    def _update_coverage(self):
+        """Share of warm pairs, plain and weighted by how often each text was requested"""
+        status = self.status
+        status["coverage"] = (status["already_cached"] + status["warmed"]) / status["pairs"] if status["pairs"] else 1.0
+        status["traffic_coverage"] = self.traffic["warm"] / self.traffic["total"] if self.traffic["total"] else 1.0
+        CACHE_WARMUP_COVERAGE.set(status["coverage"])
+
+    def summary(self) -> dict:
+        return {**self.status, "cache": self.cache.stats()}
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark: glossary compile time, memory and per-text match latency.
+
+Builds a synthetic glossary (multi-word brand and domain terms mixed with single
+words), compiles it into the Aho-Corasick matcher and times ``Glossary.terminology``
+on texts of typical request sizes. For comparison it also times the naive approach:
+one case-insensitive substring test per glossary term.
+
+Usage:
+    python benchmarks/bench_glossary.py [--entries 100000] [--repeat 200] [--memory]
+"""
+
+import argparse
+import random
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+from glossary import Glossary  # noqa: E402
+
+SYLLABLES = ["ka", "ro", "mi", "zen", "tu", "lex", "va", "dor", "qui", "sen", "pho", "tri", "nax", "bel"]
+WORDS = ("the quick report shows that our team shipped the new release to every customer "
+         "before the end of the quarter and the feedback on the dashboard was positive").split()
+
+
+def make_entries(count: int, rng: random.Random) -> list:
+    entries = []
+    for i in range(count):
+        words = ["".join(rng.choices(SYLLABLES, k=rng.randint(2, 4))) for _ in range(rng.randint(1, 3))]
+        term = " ".join(words).title() + (f" {i}" if i % 7 == 0 else "")
+        entries.append({"term": term, "translations": {"es": term.upper(), "fr": term.lower()}})
+    return entries
+
+
+def make_text(length: int, terms: list, rng: random.Random) -> str:
+    words = []
+    while sum(len(word) + 1 for word in words) < length:
+        words.append(rng.choice(terms) if rng.random() < 0.05 else rng.choice(WORDS))
+    return " ".join(words)
+
+
+def time_per_call(fn, repeat: int) -> float:
+    """Median wall time in milliseconds"""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return sorted(samples)[len(samples) // 2] * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--entries", type=int, default=100000)
+    parser.add_argument("--lengths", default="100,500,2000", type=lambda value: [int(v) for v in value.split(",")])
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--memory", action="store_true", help="also measure the compiled size (slow)")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    entries = make_entries(args.entries, rng)
+
+    start = time.perf_counter()
+    glossary = Glossary(entries)
+    compile_seconds = time.perf_counter() - start
+    print(f"{len(glossary.entries)} terms, {len(glossary.matcher)} states: compiled in {compile_seconds:.2f}s")
+    if args.memory:
+        # Tracing slows the build down several times, so measure a second build
+        tracemalloc.start()
+        traced = Glossary(entries)
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f"memory: {current / 2**20:.0f} MB retained by {len(traced.matcher)} states, "
+              f"{peak / 2**20:.0f} MB peak while compiling")
+
+    terms = [entry["term"] for entry in entries]
+    folded_terms = [term.lower() for term in terms]
+    print(f"{'chars':>6}{'terms found':>13}{'automaton ms':>14}{'naive ms':>10}")
+    for length in args.lengths:
+        text = make_text(length, terms, rng)
+        found = len(glossary.terminology(text, "es"))
+        automaton = time_per_call(lambda: glossary.terminology(text, "es"), args.repeat)
+        folded = text.lower()
+        naive = time_per_call(lambda: [term for term in folded_terms if term in folded], max(3, args.repeat // 50))
+        print(f"{len(text):>6}{found:>13}{automaton:>14.3f}{naive:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Benchmark: OCR latency and accuracy per tier on a labelled synthetic image set.
+
+Renders known phrases as clean screenshots, single-line crops, blurred photos,
+low-contrast and noisy scans. Each image is OCR'd with every fixed tier and with
+``auto`` (the quality estimator's choice). The output lists median latency, mean
+character accuracy (difflib ratio against the rendered text) and, for ``auto``,
+how often each tier was chosen. Needs the EasyOCR models (downloaded on first use).
+
+Usage:
+    python benchmarks/bench_ocr_tiers.py [--images 10] [--repeat 3] [--gpu]
+"""
+
+import argparse
+import difflib
+import random
+import sys
+import time
+from collections import Counter
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+from ocr_tiers import TIERS, estimate_quality, choose_tier, preprocess, run_ocr, to_gray  # noqa: E402
+
+PHRASES = [
+    "Welcome to the city museum", "Exit only", "Platform 4 departures", "Open daily from 9 to 5",
+    "Please keep the door closed", "Fresh coffee and pastries", "No parking on weekdays",
+    "Emergency assembly point", "Tickets and information", "Mind the gap between the train and the platform",
+]
+
+
+def render(text: str, width: int, height: int, scale: float) -> np.ndarray:
+    image = np.full((height, width, 3), 255, np.uint8)
+    (text_width, text_height), _ = cv2.getTextSize(text, cv2.FONT_HERSHEY_SIMPLEX, scale, 2)
+    origin = ((width - text_width) // 2, (height + text_height) // 2)
+    cv2.putText(image, text, origin, cv2.FONT_HERSHEY_SIMPLEX, scale, (0, 0, 0), 2, cv2.LINE_AA)
+    return image
+
+
+def make_images(count: int, rng: random.Random) -> list:
+    """(kind, ground truth, BGR image)"""
+    images = []
+    for i in range(count):
+        text = PHRASES[i % len(PHRASES)]
+        screenshot = render(text, 1200, 500, 1.4)
+        noise = np.random.default_rng(rng.randrange(2**32)).normal(0, 35, screenshot.shape)
+        images += [
+            ("screenshot", text, screenshot),
+            ("single_line", text, render(text, 40 * len(text), 64, 1.2)),
+            ("blurred", text, cv2.GaussianBlur(screenshot, (0, 0), rng.uniform(2.0, 3.5))),
+            ("low_contrast", text, (screenshot * 0.2 + 100).astype(np.uint8)),
+            ("noisy", text, np.clip(screenshot + noise, 0, 255).astype(np.uint8)),
+        ]
+    return images
+
+
+def accuracy(found: str, expected: str) -> float:
+    return difflib.SequenceMatcher(None, " ".join(found.lower().split()), expected.lower()).ratio()
+
+
+def ocr(reader, image: np.ndarray, tier_name: str, repeat: int) -> tuple:
+    """(median seconds, text, tier used) through the same steps as the server"""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        gray = to_gray(image)
+        tier = TIERS[tier_name] if tier_name in TIERS else choose_tier(estimate_quality(gray))
+        text = " ".join(run_ocr(reader, preprocess(gray, tier), tier))
+        samples.append(time.perf_counter() - start)
+    return sorted(samples)[len(samples) // 2], text, tier.name
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--images", type=int, default=10, help="phrases; each is rendered in every kind")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--gpu", action="store_true")
+    args = parser.parse_args()
+
+    import easyocr
+    reader = easyocr.Reader(["en"], gpu=args.gpu)
+    images = make_images(args.images, random.Random(args.seed))
+    kinds = sorted({kind for kind, _, _ in images})
+
+    print(f"{'tier':<10}{'kind':<14}{'median ms':>10}{'accuracy':>10}  chosen")
+    for tier_name in ("auto",) + tuple(TIERS):
+        results = []  # (kind, seconds, accuracy, tier used)
+        for kind, expected, image in images:
+            seconds, text, used = ocr(reader, image, tier_name, args.repeat)
+            results.append((kind, seconds, accuracy(text, expected), used))
+        for kind in kinds + ["all"]:
+            selected = [result for result in results if kind in ("all", result[0])]
+            latencies = sorted(seconds for _, seconds, _, _ in selected)
+            scores = [score for _, _, score, _ in selected]
+            chosen = Counter(used for _, _, _, used in selected)
+            median = latencies[len(latencies) // 2] * 1000
+            mix = ", ".join(f"{name} {count}" for name, count in chosen.most_common()) if tier_name == "auto" else ""
+            print(f"{tier_name:<10}{kind:<14}{median:>10.0f}{sum(scores) / len(scores):>10.3f}  {mix}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark: response build time for history/message list endpoints.
+
+Compares the legacy path (build a Pydantic model per document, let FastAPI run
+jsonable_encoder and the stdlib JSON encoder) against the projected orjson path
+used by the list endpoints. Reports milliseconds per 1000 items.
+
+Usage:
+    python benchmarks/bench_serialization.py [--items 1000] [--repeat 20]
+"""
+
+import argparse
+import os
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+
+os.environ.setdefault("STORAGE_BACKEND", "memory")
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+from fastapi.responses import JSONResponse  # noqa: E402
+
+import server  # noqa: E402
+
+
+def make_translation_docs(count: int) -> list:
+    now = datetime.utcnow()
+    return [
+        {
+            "id": str(uuid.uuid4()),
+            "original_text": f"Hello, how are you doing today? #{i}",
+            "translated_text": f"Hola, ¿cómo estás hoy? #{i}",
+            "source_language": "en",
+            "target_language": "es",
+            "context": None,
+            "timestamp": now - timedelta(seconds=i),
+            "confidence_score": 0.95
+        }
+        for i in range(count)
+    ]
+
+
+def make_message_docs(count: int) -> list:
+    now = datetime.utcnow()
+    conversation_id = str(uuid.uuid4())
+    return [
+        {
+            "id": str(uuid.uuid4()),
+            "conversation_id": conversation_id,
+            "original_text": f"Message number {i}",
+            "translated_text": f"Mensaje número {i}",
+            "source_language": "en",
+            "target_language": "es",
+            "message_type": "text",
+            "sender_id": "user_123",
+            "timestamp": now + timedelta(seconds=i),
+            "is_translated": True,
+            "sequence": i + 1
+        }
+        for i in range(count)
+    ]
+
+
+def legacy_build(docs: list, model) -> bytes:
+    items = [model(**doc) for doc in docs]
+    return JSONResponse(jsonable_encoder(items)).body
+
+
+def fast_build(docs: list, defaults: dict) -> bytes:
+    return server.list_response(docs, defaults).body
+
+
+def time_it(fn, repeat: int) -> float:
+    """Best-of-N wall time in milliseconds"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    cases = [
+        ("translations", make_translation_docs(args.items), server.TranslationResponse, server.TRANSLATION_DEFAULTS),
+        ("messages", make_message_docs(args.items), server.ConversationMessage, server.MESSAGE_DEFAULTS),
+    ]
+    scale = 1000 / args.items
+    print(f"{'endpoint':<14}{'legacy ms/1k':>14}{'fast ms/1k':>12}{'speedup':>10}")
+    for name, docs, model, defaults in cases:
+        legacy = time_it(lambda: legacy_build(docs, model), args.repeat) * scale
+        fast = time_it(lambda: fast_build([dict(doc) for doc in docs], defaults), args.repeat) * scale
+        print(f"{name:<14}{legacy:>14.2f}{fast:>12.2f}{legacy / fast:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
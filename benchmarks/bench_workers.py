@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+Memory and throughput of multi-process serving as the worker count grows.
+
+For each worker count, starts ``backend/serve.py`` (pre-fork, models shared
+copy-on-write) or, with ``--server uvicorn``, ``uvicorn --workers N`` (every worker
+loads its own models), against the in-memory storage backend and the stub LLM.
+It then reports for the whole process tree:
+
+* RSS: resident memory per process, counting shared pages in every process;
+* PSS: proportional set size, where each shared page is split between the processes
+  mapping it. Summed PSS is the real memory cost of the deployment;
+* throughput and p95 latency per endpoint at the given concurrency.
+
+Linux only (reads /proc).
+
+Usage:
+    python benchmarks/bench_workers.py --workers 1,2,4 --endpoints ocr,text
+    python benchmarks/bench_workers.py --workers 1,2,4 --server uvicorn
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import httpx
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from run_benchmarks import BACKEND_DIR, Scenarios, free_port, git_commit, run_level, start_stub_llm, wait_for_port  # noqa: E402
+
+
+def process_tree(pid: int) -> list:
+    """pid and all its descendants"""
+    pids = [pid]
+    for current in pids:
+        try:
+            with open(f"/proc/{current}/task/{current}/children") as f:
+                pids.extend(int(child) for child in f.read().split())
+        except OSError:
+            pass
+    return pids
+
+
+def memory_kb(pid: int) -> dict:
+    """RSS and PSS of one process in kB"""
+    usage = {"rss": 0, "pss": 0}
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            for line in f:
+                field, _, value = line.partition(":")
+                if field in ("Rss", "Pss"):
+                    usage[field.lower()] = int(value.split()[0])
+    except OSError:
+        pass
+    return usage
+
+
+def tree_memory(pid: int) -> dict:
+    processes = {child: memory_kb(child) for child in process_tree(pid)}
+    processes = {child: usage for child, usage in processes.items() if usage["rss"]}
+    return {
+        "processes": len(processes),
+        "rss_mb_total": round(sum(u["rss"] for u in processes.values()) / 1024, 1),
+        "pss_mb_total": round(sum(u["pss"] for u in processes.values()) / 1024, 1),
+        "rss_mb_per_process": [round(u["rss"] / 1024, 1) for u in processes.values()]
+    }
+
+
+def start_server(args, workers: int, port: int, env: dict) -> subprocess.Popen:
+    if args.server == "prefork":
+        command = [sys.executable, "serve.py", "--workers", str(workers), "--port", str(port),
+                   "--host", "127.0.0.1", "--log-level", "warning"]
+    else:
+        command = [sys.executable, "-m", "uvicorn", "server:app", "--workers", str(workers),
+                   "--port", str(port), "--log-level", "warning"]
+    return subprocess.Popen(command, cwd=BACKEND_DIR, env={**os.environ, **env})
+
+
+async def measure(args, workers: int, llm_url: str) -> dict:
+    port = free_port()
+    env = {
+        "STORAGE_BACKEND": "memory",
+        "LLM_BASE_URL": llm_url,
+        "RETENTION_INTERVAL_SECONDS": "0",
+        "ASR_BACKEND": "stub"
+    }
+    started = time.time()
+    process = start_server(args, workers, port, env)
+    try:
+        wait_for_port(port, timeout=600)
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", timeout=120) as client:
+            # Listening is not the same as every worker being ready
+            while (await client.get("/api/")).status_code != 200:
+                await asyncio.sleep(0.5)
+            startup_seconds = time.time() - started
+            await asyncio.sleep(args.settle)
+            idle = tree_memory(process.pid)
+
+            scenarios = Scenarios()
+            await scenarios.setup(client)
+            levels = []
+            for endpoint in args.endpoints:
+                scenario = getattr(scenarios, endpoint)
+                await run_level(client, scenario, min(args.concurrency, 4), 10, process.pid)
+                level = await run_level(client, scenario, args.concurrency, args.requests, process.pid)
+                level["endpoint"] = endpoint
+                levels.append(level)
+            loaded = tree_memory(process.pid)
+    finally:
+        process.terminate()
+        process.wait()
+
+    return {"workers": workers, "startup_seconds": round(startup_seconds, 1),
+            "memory_idle": idle, "memory_after_load": loaded, "results": levels}
+
+
+async def run(args) -> dict:
+    stub, llm_url = start_stub_llm(args)
+    runs = []
+    try:
+        for workers in args.workers:
+            result = await measure(args, workers, llm_url)
+            runs.append(result)
+            idle, loaded = result["memory_idle"], result["memory_after_load"]
+            print(f"workers={workers:<3} startup {result['startup_seconds']:>5.1f}s  "
+                  f"idle RSS {idle['rss_mb_total']:>8.1f} MB  PSS {idle['pss_mb_total']:>8.1f} MB  "
+                  f"loaded PSS {loaded['pss_mb_total']:>8.1f} MB")
+            for level in result["results"]:
+                print(f"    {level['endpoint']:<13} {level['throughput_rps']:>8.1f} rps  p95 {level['p95_ms']:>8.1f} ms  "
+                      f"err {level['error_rate']:.1%}")
+    finally:
+        stub.terminate()
+        stub.wait()
+    return {
+        "meta": {"commit": git_commit(), "server": args.server, "cpu_count": os.cpu_count(),
+                 "concurrency": args.concurrency, "requests": args.requests, "llm_latency": args.llm_latency},
+        "runs": runs
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--server", choices=["prefork", "uvicorn"], default="prefork")
+    parser.add_argument("--workers", default="1,2,4", type=lambda value: [int(v) for v in value.split(",")])
+    parser.add_argument("--endpoints", default="ocr,text", type=lambda value: value.split(","))
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--settle", type=float, default=2.0, help="seconds to wait before the idle memory sample")
+    parser.add_argument("--llm-latency", default="lognormal:300,0.5")
+    parser.add_argument("--llm-failure-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--output", default="bench_workers.json")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
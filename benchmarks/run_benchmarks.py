@@ -0,0 +1,355 @@
+#!/usr/bin/env python3
+"""
+Offline load-testing and benchmark suite for the translation backend.
+
+Runs the FastAPI app in-process (ASGI transport) or as a local uvicorn process,
+with the in-memory storage backend and the stub LLM server standing in for
+MongoDB and GPT-4o. For each endpoint and concurrency level it measures
+throughput, p50/p95/p99 latency, error rate and peak RSS. Results go to a JSON
+file tagged with the git commit, so runs can be compared across commits.
+
+Each concurrent worker sends its own X-Client-Id, as separate clients would, so
+the per-client admission quota (see backend/admission.py) does not turn one
+benchmark process into a single throttled client. Requests the server sheds
+(429/503 with Retry-After) are counted as "shed", apart from real errors;
+ADMISSION_* variables set in the environment apply to the benchmarked server.
+
+Usage:
+    python benchmarks/run_benchmarks.py                       # defaults, in-process
+    python benchmarks/run_benchmarks.py --mode local --concurrency 1,8,32,128
+    python benchmarks/run_benchmarks.py --llm-latency lognormal:400,0.6 --llm-failure-rate 0.02
+    python benchmarks/run_benchmarks.py --compare bench_results_prev.json
+
+Endpoints: languages, text, text_auto, history, conversation, messages, ocr, image
+(ocr/image are skipped when EasyOCR is not available).
+"""
+
+import argparse
+import asyncio
+import difflib
+import io
+import json
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+import httpx
+
+ROOT = Path(__file__).resolve().parent.parent
+BACKEND_DIR = ROOT / "backend"
+
+PHRASES = [
+    "Hello, how are you?", "Where is the train station?", "Thank you very much",
+    "How much does this cost?", "I would like a cup of coffee", "Please call a doctor",
+    "What time does the museum open?", "Good morning", "Can you help me?", "See you tomorrow"
+]
+IMAGE_TEXTS = ["HELLO WORLD", "EXIT", "OPEN 9 TO 5", "NO PARKING", "WELCOME"]
+TARGETS = ["es", "fr", "de", "hi", "ja"]
+SHED_STATUSES = (429, 503)
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_for_port(port: int, timeout: float = 30.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.5):
+                return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f"Nothing listening on port {port} after {timeout}s")
+
+
+def rss_mb(pid: int) -> float:
+    """Resident set size of a process in MB (Linux /proc, else our own peak)"""
+    try:
+        with open(f"/proc/{pid}/status") as status:
+            for line in status:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], cwd=ROOT, text=True).strip()
+    except Exception:
+        return "unknown"
+
+
+def make_text_image(text: str) -> str:
+    """PNG with known text, base64-encoded"""
+    import base64
+    from PIL import Image, ImageDraw, ImageFont
+
+    image = Image.new("RGB", (40 + 28 * len(text), 90), "white")
+    draw = ImageDraw.Draw(image)
+    try:
+        font = ImageFont.load_default(size=40)
+    except TypeError:
+        font = ImageFont.load_default()
+    draw.text((20, 20), text, fill="black", font=font)
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG")
+    return base64.b64encode(buffer.getvalue()).decode()
+
+
+def percentile(sorted_values: list, pct: float) -> float:
+    if not sorted_values:
+        return None
+    index = max(0, min(len(sorted_values) - 1, int(round(pct / 100 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+
+class Scenarios:
+    """Request generators per endpoint; setup() prepares shared fixtures"""
+
+    def __init__(self):
+        self.conversation_id = None
+        self.images = {text: make_text_image(text) for text in IMAGE_TEXTS}
+        self.ocr_scores = []
+
+    async def setup(self, client: httpx.AsyncClient):
+        response = await client.post("/api/conversation/create")
+        self.conversation_id = response.json()["conversation_id"]
+        for language in ("es", "fr"):
+            await client.post(f"/api/conversation/{self.conversation_id}/participants",
+                              json={"participant_id": f"bench_{language}", "preferred_language": language})
+        for phrase in PHRASES:
+            await client.post("/api/translate/text", json={"text": phrase, "source_language": "en", "target_language": "es"})
+
+    async def languages(self, client, headers):
+        return await client.get("/api/languages", headers=headers)
+
+    async def text(self, client, headers):
+        return await client.post("/api/translate/text", headers=headers, json={
+            "text": random.choice(PHRASES), "source_language": "en", "target_language": random.choice(TARGETS)
+        })
+
+    async def text_auto(self, client, headers):
+        return await client.post("/api/translate/text", headers=headers, json={
+            "text": f"{random.choice(PHRASES)} #{random.randint(0, 10 ** 6)}", "source_language": "auto",
+            "target_language": random.choice(TARGETS)
+        })
+
+    async def history(self, client, headers):
+        return await client.get("/api/translate/history", headers=headers)
+
+    async def conversation(self, client, headers):
+        return await client.post(f"/api/conversation/{self.conversation_id}/message", headers=headers, json={
+            "original_text": random.choice(PHRASES), "source_language": "en", "target_language": "de",
+            "message_type": "text", "sender_id": "bench_user"
+        })
+
+    async def messages(self, client, headers):
+        return await client.get(f"/api/conversation/{self.conversation_id}/messages", headers=headers)
+
+    async def ocr(self, client, headers):
+        text = random.choice(IMAGE_TEXTS)
+        response = await client.post("/api/ocr/extract", headers=headers, json={"image_base64": self.images[text]})
+        if response.status_code == 200:
+            extracted = response.json()["extracted_text"].upper()
+            self.ocr_scores.append(difflib.SequenceMatcher(None, extracted, text).ratio())
+        return response
+
+    async def image(self, client, headers):
+        text = random.choice(IMAGE_TEXTS)
+        return await client.post("/api/translate/image", headers=headers, json={
+            "image_base64": self.images[text], "source_language": "en", "target_language": random.choice(TARGETS)
+        })
+
+
+async def run_level(client, scenario, concurrency: int, total: int, pid: int) -> dict:
+    latencies = []
+    errors = 0
+    shed = 0
+    peak_rss = rss_mb(pid)
+    remaining = iter(range(total))
+    done = asyncio.Event()
+
+    async def sample_rss():
+        nonlocal peak_rss
+        while not done.is_set():
+            peak_rss = max(peak_rss, rss_mb(pid))
+            await asyncio.sleep(0.05)
+
+    async def worker(index: int):
+        nonlocal errors, shed
+        headers = {"X-Client-Id": f"bench-{index}"}
+        for _ in remaining:
+            start = time.perf_counter()
+            try:
+                status = (await scenario(client, headers)).status_code
+            except Exception:
+                status = None
+            latencies.append((time.perf_counter() - start) * 1000)
+            if status in SHED_STATUSES:
+                shed += 1
+            elif status is None or status >= 400:
+                errors += 1
+
+    sampler = asyncio.create_task(sample_rss())
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(index) for index in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    done.set()
+    await sampler
+
+    latencies.sort()
+    return {
+        "concurrency": concurrency,
+        "requests": total,
+        "errors": errors,
+        "error_rate": errors / total if total else 0.0,
+        "shed": shed,
+        "shed_rate": shed / total if total else 0.0,
+        "throughput_rps": total / elapsed if elapsed else None,
+        "p50_ms": percentile(latencies, 50),
+        "p95_ms": percentile(latencies, 95),
+        "p99_ms": percentile(latencies, 99),
+        "rss_mb_peak": round(peak_rss, 1)
+    }
+
+
+def start_stub_llm(args) -> tuple:
+    port = free_port()
+    process = subprocess.Popen([
+        sys.executable, str(Path(__file__).resolve().parent / "stub_llm_server.py"),
+        "--port", str(port), "--latency", args.llm_latency,
+        "--failure-rate", str(args.llm_failure_rate), "--seed", str(args.seed)
+    ])
+    wait_for_port(port)
+    return process, f"http://127.0.0.1:{port}/v1"
+
+
+async def run(args) -> dict:
+    random.seed(args.seed)
+    stub, llm_url = start_stub_llm(args)
+    env = {
+        "STORAGE_BACKEND": "memory",
+        "LLM_BASE_URL": llm_url,
+        "RETENTION_INTERVAL_SECONDS": "0",
+        "ASR_BACKEND": "stub"
+    }
+    server_process = None
+    app = None
+    try:
+        if args.mode == "local":
+            port = free_port()
+            server_process = subprocess.Popen(
+                [sys.executable, "-m", "uvicorn", "server:app", "--port", str(port), "--log-level", "warning"],
+                cwd=BACKEND_DIR, env={**os.environ, **env}
+            )
+            wait_for_port(port, timeout=300)
+            client = httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", timeout=120)
+            pid = server_process.pid
+            ocr_available = True
+        else:
+            os.environ.update(env)
+            sys.path.insert(0, str(BACKEND_DIR))
+            import server
+
+            app = server.app
+            await app.router.startup()
+            client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=120)
+            pid = os.getpid()
+            ocr_available = server.ocr_reader is not None
+
+        scenarios = Scenarios()
+        async with client:
+            await scenarios.setup(client)
+            results = []
+            for endpoint in args.endpoints:
+                if endpoint in ("ocr", "image") and not ocr_available:
+                    print(f"skipping {endpoint}: OCR reader not available")
+                    continue
+                scenario = getattr(scenarios, endpoint)
+                for concurrency in args.concurrency:
+                    # Warm-up so imports, caches and connection pools are not measured
+                    await run_level(client, scenario, min(concurrency, 4), min(args.requests, 10), pid)
+                    level = await run_level(client, scenario, concurrency, args.requests, pid)
+                    level["endpoint"] = endpoint
+                    results.append(level)
+                    print(f"{endpoint:<13} c={concurrency:<4} {level['throughput_rps']:>8.1f} rps  "
+                          f"p50 {level['p50_ms']:>8.1f}  p95 {level['p95_ms']:>8.1f}  p99 {level['p99_ms']:>8.1f} ms  "
+                          f"err {level['error_rate']:.1%}  shed {level['shed_rate']:.1%}  rss {level['rss_mb_peak']} MB")
+            if scenarios.ocr_scores:
+                print(f"OCR character accuracy: {sum(scenarios.ocr_scores) / len(scenarios.ocr_scores):.3f}")
+    finally:
+        if app is not None:
+            await app.router.shutdown()
+        for process in (server_process, stub):
+            if process is not None:
+                process.terminate()
+                process.wait()
+
+    return {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": datetime.utcnow().isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "mode": args.mode,
+            "llm_latency": args.llm_latency,
+            "llm_failure_rate": args.llm_failure_rate,
+            "requests_per_level": args.requests,
+            "ocr_accuracy": sum(scenarios.ocr_scores) / len(scenarios.ocr_scores) if scenarios.ocr_scores else None
+        },
+        "results": results
+    }
+
+
+def compare(current: dict, baseline_path: str):
+    """Print throughput and p95 deltas against an earlier results file"""
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    previous = {(r["endpoint"], r["concurrency"]): r for r in baseline["results"]}
+    print(f"\nvs {baseline['meta']['commit'][:10]}:")
+    for result in current["results"]:
+        before = previous.get((result["endpoint"], result["concurrency"]))
+        if not before:
+            continue
+        rps = (result["throughput_rps"] / before["throughput_rps"] - 1) * 100
+        p95 = (result["p95_ms"] / before["p95_ms"] - 1) * 100
+        print(f"{result['endpoint']:<13} c={result['concurrency']:<4} throughput {rps:+6.1f}%  p95 {p95:+6.1f}%")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mode", choices=["inprocess", "local"], default="inprocess")
+    parser.add_argument("--endpoints", default="languages,text,text_auto,history,conversation,messages,ocr,image",
+                        type=lambda value: value.split(","))
+    parser.add_argument("--concurrency", default="1,4,16,64", type=lambda value: [int(v) for v in value.split(",")])
+    parser.add_argument("--requests", type=int, default=200, help="requests per endpoint and concurrency level")
+    parser.add_argument("--llm-latency", default="lognormal:300,0.5")
+    parser.add_argument("--llm-failure-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--output", default="bench_results.json")
+    parser.add_argument("--compare", help="earlier results file to diff against")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults written to {args.output}")
+    if args.compare:
+        compare(report, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Stub OpenAI-compatible LLM server for offline benchmarks.
+
+Answers /v1/chat/completions with deterministic output after a latency drawn
+from a configurable distribution, failing a configurable fraction of requests.
+Point the backend at it with LLM_BASE_URL=http://127.0.0.1:<port>/v1.
+
+Latency specs:
+    fixed:MS              constant latency
+    uniform:LO,HI         uniform between LO and HI ms
+    lognormal:MEDIAN,SIGMA  log-normal with the given median (ms) and sigma
+
+Usage:
+    python benchmarks/stub_llm_server.py --port 8099 --latency lognormal:400,0.5 --failure-rate 0.01
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import random
+import re
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+
+def parse_latency(spec: str):
+    """Return a zero-argument sampler (seconds) for a latency spec"""
+    kind, _, params = spec.partition(":")
+    values = [float(v) for v in params.split(",")] if params else []
+    if kind == "fixed":
+        return lambda: values[0] / 1000
+    if kind == "uniform":
+        return lambda: random.uniform(values[0], values[1]) / 1000
+    if kind == "lognormal":
+        mu = math.log(values[0])
+        return lambda: random.lognormvariate(mu, values[1]) / 1000
+    raise ValueError(f"Unknown latency spec: {spec}")
+
+
+def reply_for(prompt: str) -> str:
+    """Deterministic answers shaped like what each backend prompt expects"""
+    if "ISO 639-1" in prompt:
+        return "en"
+    if "JSON array" in prompt:
+        match = re.search(r"\[.*\]", prompt, re.S)
+        items = json.loads(match.group(0)) if match else []
+        return json.dumps([f"[stub] {item}" for item in items], ensure_ascii=False)
+    match = re.search(r'Text to translate: "(.*)"', prompt, re.S)
+    if match:
+        return f"[stub] {match.group(1)}"
+    return "[stub] summary"
+
+
+def create_app(latency: str = "fixed:200", failure_rate: float = 0.0, seed: int = None) -> FastAPI:
+    sample_latency = parse_latency(latency)
+    if seed is not None:
+        random.seed(seed)
+    app = FastAPI()
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        await asyncio.sleep(sample_latency())
+        if random.random() < failure_rate:
+            return JSONResponse({"error": {"message": "stub failure"}}, status_code=503)
+        prompt = body["messages"][-1]["content"]
+        content = reply_for(prompt)
+        prompt_chars = sum(len(m["content"]) for m in body["messages"])
+        return {
+            "id": "stub",
+            "object": "chat.completion",
+            "model": body.get("model", "stub"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+            "usage": {
+                "prompt_tokens": prompt_chars // 4,
+                "completion_tokens": len(content) // 4,
+                "total_tokens": (prompt_chars + len(content)) // 4
+            }
+        }
+
+    return app
+
+
+def main():
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--latency", default="fixed:200")
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+    uvicorn.run(create_app(args.latency, args.failure_rate, args.seed), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
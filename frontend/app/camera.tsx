@@ -141,6 +141,7 @@ export default function CameraScreen() {
         method: 'POST',
         headers: {
           'Content-Type': 'application/json',
+          'X-Priority': 'camera',
         },
         body: JSON.stringify({
           image_base64: base64Image,
@@ -160,6 +161,7 @@ export default function CameraScreen() {
           method: 'POST',
           headers: {
             'Content-Type': 'application/json',
+            'X-Priority': 'camera',
           },
           body: JSON.stringify({
             image_base64: base64Image,
@@ -1,4 +1,4 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import {
   Text,
   View,
@@ -33,6 +33,23 @@ interface Translation {
   confidence_score?: number;
 }
 
+interface TranslationSession {
+  id: string;
+  languages: string; // source->target pair the session was started for
+  revision: number;
+  segments: string[]; // translated sentences, in order
+}
+
+interface SegmentPatch {
+  op: 'replace' | 'insert' | 'delete';
+  start: number;
+  end: number;
+  segments: string[];
+}
+
+// Pause in typing before the live translation is updated
+const LIVE_TRANSLATION_DELAY_MS = 400;
+
 export default function TranslationApp() {
   const router = useRouter();
   
@@ -45,6 +62,8 @@ export default function TranslationApp() {
   const [isTranslating, setIsTranslating] = useState(false);
   const [recentTranslations, setRecentTranslations] = useState<Translation[]>([]);
   const [showLanguageSelector, setShowLanguageSelector] = useState<'source' | 'target' | null>(null);
+  const sessionRef = useRef<TranslationSession | null>(null);
+  const liveUpdateRef = useRef<Promise<void>>(Promise.resolve());
 
   // Fetch supported languages on component mount
   useEffect(() => {
@@ -52,6 +71,72 @@ export default function TranslationApp() {
     fetchRecentTranslations();
   }, []);
 
+  // Live translation while typing: the server re-translates only edited sentences
+  useEffect(() => {
+    if (!inputText.trim()) return;
+    const timer = setTimeout(() => {
+      // Chain updates so revisions reach the session in order
+      liveUpdateRef.current = liveUpdateRef.current.then(() =>
+        updateLiveTranslation(inputText, sourceLanguage, targetLanguage)
+      );
+    }, LIVE_TRANSLATION_DELAY_MS);
+    return () => clearTimeout(timer);
+  }, [inputText, sourceLanguage, targetLanguage]);
+
+  const updateLiveTranslation = async (text: string, source: string, target: string) => {
+    const languagePair = `${source}->${target}`;
+    const session = sessionRef.current;
+    try {
+      if (session && session.languages === languagePair) {
+        const response = await fetch(`${EXPO_PUBLIC_BACKEND_URL}/api/translate/session/${session.id}/revise`, {
+          method: 'POST',
+          headers: {
+            'Content-Type': 'application/json',
+            'X-Priority': 'interactive',
+          },
+          body: JSON.stringify({ text, base_revision: session.revision }),
+        });
+        if (response.ok) {
+          const result = await response.json();
+          const segments = [...session.segments];
+          result.patch.forEach((patch: SegmentPatch) => {
+            segments.splice(patch.start, patch.end - patch.start, ...patch.segments);
+          });
+          sessionRef.current = { ...session, revision: result.revision, segments };
+          setTranslatedText(segments.join(''));
+          return;
+        }
+        // Anything but an expired or out-of-sync session: keep it and retry on the next edit
+        if (response.status !== 404 && response.status !== 409) return;
+      }
+
+      const response = await fetch(`${EXPO_PUBLIC_BACKEND_URL}/api/translate/session`, {
+        method: 'POST',
+        headers: {
+          'Content-Type': 'application/json',
+          'X-Priority': 'interactive',
+        },
+        body: JSON.stringify({
+          text,
+          source_language: source,
+          target_language: target,
+        }),
+      });
+      if (response.ok) {
+        const state = await response.json();
+        sessionRef.current = {
+          id: state.session_id,
+          languages: languagePair,
+          revision: state.revision,
+          segments: state.segments,
+        };
+        setTranslatedText(state.translated_text);
+      }
+    } catch (error) {
+      console.error('Live translation error:', error);
+    }
+  };
+
   const fetchLanguages = async () => {
     try {
       const response = await fetch(`${EXPO_PUBLIC_BACKEND_URL}/api/languages`);
@@ -88,6 +173,7 @@ export default function TranslationApp() {
         method: 'POST',
         headers: {
           'Content-Type': 'application/json',
+          'X-Priority': 'interactive',
         },
         body: JSON.stringify({
           text: inputText,
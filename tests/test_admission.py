@@ -0,0 +1,127 @@
+import asyncio
+
+import pytest
+
+from admission import AdmissionClass, Rejected, endpoint_class
+
+
+def make_class(concurrency=1, queue=1, per_client=2, queue_timeout_ms=1000) -> AdmissionClass:
+    return AdmissionClass("text", concurrency=concurrency, queue=queue, queue_timeout_ms=queue_timeout_ms,
+                          per_client=per_client, max_body_bytes=1024)
+
+
+@pytest.mark.parametrize("method, path, expected", [
+    ("POST", "/api/translate/text", "text"),
+    ("POST", "/api/conversation/abc/message", "text"),
+    ("POST", "/api/glossary/match", "text"),
+    ("POST", "/api/translate/image", "ocr"),
+    ("POST", "/api/ocr/extract", "ocr"),
+    ("POST", "/api/jobs/translate", "batch"),
+    ("GET", "/api/translate/history", None),
+    ("PUT", "/api/glossary", None),
+])
+def test_endpoint_class(method, path, expected):
+    assert endpoint_class(method, path) == expected
+
+
+def test_client_over_its_share_gets_429():
+    admission = make_class(concurrency=4, per_client=2)
+
+    async def main():
+        await admission.acquire("a", 1)
+        await admission.acquire("a", 1)
+        with pytest.raises(Rejected) as rejected:
+            await admission.acquire("a", 1)
+        await admission.acquire("b", 1)
+        return rejected.value
+
+    rejected = asyncio.run(main())
+    assert rejected.status_code == 429
+    assert rejected.reason == "client_limit"
+    assert rejected.retry_after >= 1
+    assert admission.rejected == {"client_limit": 1}
+
+
+def test_full_queue_gets_503():
+    admission = make_class(concurrency=1, queue=1, per_client=4)
+
+    async def main():
+        await admission.acquire("a", 1)
+        queued = asyncio.create_task(admission.acquire("b", 1))
+        await asyncio.sleep(0)
+        with pytest.raises(Rejected) as rejected:
+            await admission.acquire("c", 1)
+        admission.release("a")
+        await queued
+        admission.release("b")
+        return rejected.value
+
+    rejected = asyncio.run(main())
+    assert (rejected.status_code, rejected.reason) == (503, "queue_full")
+    assert admission.running == 0
+    assert admission.clients == {}
+
+
+def test_queue_wait_times_out_with_503():
+    admission = make_class(concurrency=1, queue=4)
+
+    async def main():
+        await admission.acquire("a", 1)
+        with pytest.raises(Rejected) as rejected:
+            await admission.acquire("b", 0.01)
+        return rejected.value
+
+    rejected = asyncio.run(main())
+    assert (rejected.status_code, rejected.reason) == (503, "queue_timeout")
+    assert len(admission.waiters) == 0
+    assert admission.clients == {"a": 1}
+
+
+def test_release_hands_the_slot_to_the_next_waiter_in_order():
+    admission = make_class(concurrency=1, queue=4, per_client=4)
+    order = []
+
+    async def request(client_id):
+        await admission.acquire(client_id, 1)
+        order.append(client_id)
+        await asyncio.sleep(0)
+        admission.release(client_id, 0.5)
+
+    async def main():
+        await admission.acquire("first", 1)
+        tasks = [asyncio.create_task(request(client_id)) for client_id in ("b", "c", "d")]
+        await asyncio.sleep(0)
+        assert admission.stats()["queued"] == 3
+        admission.release("first")
+        await asyncio.gather(*tasks)
+
+    asyncio.run(main())
+    assert order == ["b", "c", "d"]
+    assert admission.running == 0
+    assert admission.admitted == 4
+    assert admission.clients == {}
+
+
+def test_cancelled_waiter_does_not_keep_its_place():
+    admission = make_class(concurrency=1, queue=4)
+
+    async def main():
+        await admission.acquire("a", 1)
+        queued = asyncio.create_task(admission.acquire("b", 1))
+        await asyncio.sleep(0)
+        queued.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await queued
+        admission.release("a")
+
+    asyncio.run(main())
+    assert admission.running == 0
+    assert len(admission.waiters) == 0
+    assert admission.clients == {}
+
+
+def test_limits_come_from_the_environment(monkeypatch):
+    monkeypatch.setenv("ADMISSION_OCR_PER_CLIENT", "16")
+    admission = AdmissionClass.from_env("ocr")
+    assert admission.per_client == 16
+    assert admission.concurrency == 8
@@ -0,0 +1,78 @@
+import asyncio
+
+from conversation_context import ConversationContextManager
+from storage import MemoryRepository
+
+
+def message(sequence: int, text: str = None) -> dict:
+    return {"sequence": sequence, "sender_id": f"user{sequence % 2}", "original_text": text or f"message {sequence}"}
+
+
+async def summarize(summary: str, messages: list) -> str:
+    return " ".join([summary] + [m["text"] for m in messages]).strip()
+
+
+def test_window_overflow_is_folded_into_the_summary():
+    async def main():
+        manager = ConversationContextManager(MemoryRepository(), summarize, recent_size=2)
+        for sequence in range(1, 5):
+            await manager._record("c", message(sequence))
+        return await manager.get_state("c"), await manager.build_context("c")
+
+    state, context = asyncio.run(main())
+    assert state["summary"] == "message 1 message 2"
+    assert [m["sequence"] for m in state["recent"]] == [3, 4]
+    assert context == "Conversation summary: message 1 message 2\n\nRecent messages:\nuser1: message 3\nuser0: message 4"
+
+
+def test_failed_summary_keeps_the_messages_and_retries_the_fold():
+    calls = []
+
+    async def flaky_summarize(summary, messages):
+        calls.append([m["sequence"] for m in messages])
+        if len(calls) == 1:
+            raise RuntimeError("LLM unavailable")
+        return await summarize(summary, messages)
+
+    async def main():
+        manager = ConversationContextManager(MemoryRepository(), flaky_summarize, recent_size=2)
+        for sequence in range(1, 5):
+            await manager._record("c", message(sequence))
+        after_failure = await manager.get_state("c")
+        await manager._record("c", message(5))
+        return after_failure, await manager.get_state("c")
+
+    after_failure, state = asyncio.run(main())
+    assert after_failure["summary"] == ""
+    assert [m["sequence"] for m in after_failure["recent"]] == [1, 2, 3, 4]
+    assert calls == [[1, 2], [1, 2, 3]]
+    assert state["summary"] == "message 1 message 2 message 3"
+    assert [m["sequence"] for m in state["recent"]] == [4, 5]
+
+
+def test_window_stays_bounded_while_summaries_keep_failing():
+    async def failing_summarize(summary, messages):
+        raise RuntimeError("LLM unavailable")
+
+    async def main():
+        manager = ConversationContextManager(MemoryRepository(), failing_summarize, recent_size=2)
+        for sequence in range(1, 21):
+            await manager._record("c", message(sequence))
+        return await manager.get_state("c")
+
+    state = asyncio.run(main())
+    assert [m["sequence"] for m in state["recent"]] == [13, 14, 15, 16, 17, 18, 19, 20]
+
+
+def test_workers_sharing_a_repository_keep_every_message():
+    async def main():
+        repo = MemoryRepository()
+        workers = [ConversationContextManager(repo, summarize, recent_size=50) for _ in range(2)]
+        for sequence in range(1, 11):
+            await workers[sequence % 2].get_state("c")
+        await asyncio.gather(*(workers[sequence % 2]._record("c", message(sequence)) for sequence in range(1, 11)))
+        return await workers[0].get_state("c", refresh=True)
+
+    state = asyncio.run(main())
+    assert [m["sequence"] for m in state["recent"]] == list(range(1, 11))
+    assert state["version"] == 10
@@ -0,0 +1,111 @@
+import asyncio
+
+from glossary import AhoCorasick, Glossary, GlossaryStore, enforce_terminology, fold, replace_term
+from storage import MemoryRepository
+
+
+def test_aho_corasick_finds_overlapping_patterns():
+    matcher = AhoCorasick(["he", "she", "his", "hers"])
+    matches = sorted(matcher.find_all("ushers"))
+    assert matches == [(1, 4, 1), (2, 4, 0), (2, 6, 3)]
+
+
+def test_aho_corasick_follows_failure_links_across_patterns():
+    matcher = AhoCorasick(["abcd", "bc", "c"])
+    assert sorted(matcher.find_all("abcx")) == [(1, 3, 1), (2, 3, 2)]
+
+
+def test_aho_corasick_without_patterns_matches_nothing():
+    assert AhoCorasick([]).find_all("anything") == []
+
+
+def test_fold_keeps_offsets():
+    text = "İstanbul STRASSE"
+    assert len(fold(text)) == len(text)
+
+
+def test_find_is_case_insensitive_by_default():
+    glossary = Glossary([{"term": "Acme Cloud", "translations": {"es": "Acme Cloud"}}])
+    assert [entry["term"] for entry in glossary.find("We moved to ACME cloud last year")] == ["Acme Cloud"]
+
+
+def test_find_respects_case_sensitive_entries():
+    glossary = Glossary([{"term": "Go", "case_sensitive": True}])
+    assert glossary.find("Let us go home") == []
+    assert [entry["term"] for entry in glossary.find("Written in Go.")] == ["Go"]
+
+
+def test_find_requires_word_boundaries():
+    glossary = Glossary([{"term": "cat"}])
+    assert glossary.find("concatenate the category") == []
+    assert [entry["term"] for entry in glossary.find("the cat, sat")] == ["cat"]
+
+
+def test_find_matches_cjk_terms_without_spaces():
+    glossary = Glossary([{"term": "東京"}])
+    assert [entry["term"] for entry in glossary.find("私は東京に住んでいます")] == ["東京"]
+
+
+def test_find_prefers_leftmost_longest_and_reports_each_entry_once():
+    glossary = Glossary([{"term": "New York"}, {"term": "York"}, {"term": "New York City"}])
+    found = glossary.find("New York City is not York. New York City again.")
+    assert [entry["term"] for entry in found] == ["New York City", "York"]
+
+
+def test_later_duplicate_entries_win():
+    glossary = Glossary([{"term": "widget", "translations": {"es": "artilugio"}},
+                         {"term": " Widget ", "translations": {"es": "widget"}}])
+    assert len(glossary.entries) == 1
+    assert glossary.terminology("a widget", "es") == (("Widget", "widget"),)
+
+
+def test_terminology_uses_term_itself_for_do_not_translate_entries():
+    glossary = Glossary([{"term": "Acme"}, {"term": "invoice", "translations": {"fr": "facture"}}])
+    assert glossary.terminology("Acme sent an invoice", "es") == (("Acme", "Acme"),)
+    assert glossary.terminology("Acme sent an invoice", "fr") == (("Acme", "Acme"), ("invoice", "facture"))
+
+
+def test_enforce_terminology_replaces_untranslated_terms():
+    text, missing = enforce_terminology("Envíe la invoice hoy", (("invoice", "factura"),))
+    assert text == "Envíe la factura hoy"
+    assert missing == []
+
+
+def test_enforce_terminology_reports_missing_terms():
+    text, missing = enforce_terminology("Envíe el documento", (("invoice", "factura"),))
+    assert text == "Envíe el documento"
+    assert missing == ["invoice"]
+
+
+def test_enforce_terminology_corrects_cjk_terms_found_by_the_matcher():
+    glossary = Glossary([{"term": "東京", "translations": {"en": "Tokyo"}}])
+    terminology = glossary.terminology("東京に行きます", "en")
+    text, missing = enforce_terminology("I am going to 東京駅 tomorrow", terminology)
+    assert text == "I am going to Tokyo駅 tomorrow"
+    assert missing == []
+
+
+def test_replace_term_uses_the_matcher_word_boundaries():
+    assert replace_term("The CAT catalog, cat.", "cat", "gato") == ("The gato catalog, gato.", 2)
+    assert replace_term("bobcat", "cat", "gato") == ("bobcat", 0)
+    assert replace_term("aaa", "aa", "b") == ("aaa", 0)
+
+
+def test_store_recompiles_only_when_the_version_changes():
+    async def main():
+        repo = MemoryRepository()
+        store = GlossaryStore(repo, ttl=60)
+        missing = await store.get("acme")
+        saved = await store.save("acme", [{"term": "Acme"}])
+        first = await store.get("acme")
+        store.cache.clear()
+        reloaded = await store.get("acme")
+        await store.save("acme", [{"term": "Acme"}, {"term": "Widget"}])
+        return missing, saved, first, reloaded, await store.get("acme"), await repo.get_glossary("acme", False)
+
+    missing, saved, first, reloaded, updated, metadata = asyncio.run(main())
+    assert missing is None
+    assert reloaded is first
+    assert [entry["term"] for entry in updated.entries] == ["Acme", "Widget"]
+    assert updated.version != saved["version"]
+    assert "entries" not in metadata
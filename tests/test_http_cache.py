@@ -0,0 +1,77 @@
+import gzip
+from datetime import datetime
+
+import pytest
+
+import http_cache
+from http_cache import (StaticResponse, choose_encoding, conditional_response, etag_matches, not_modified,
+                        weak_etag)
+
+ETAG = weak_etag(b'{"items": []}')
+MODIFIED = datetime(2024, 5, 1, 12, 0, 0, 500000)
+
+
+def test_weak_etag_is_stable_and_content_dependent():
+    assert weak_etag(b"a") == weak_etag(b"a")
+    assert weak_etag(b"a") != weak_etag(b"b")
+    assert weak_etag(b"a").startswith('W/"')
+
+
+@pytest.mark.parametrize("if_none_match, expected", [
+    (None, False),
+    ("", False),
+    ("*", True),
+    (ETAG, True),
+    (ETAG.removeprefix("W/"), True),
+    (f'"other", {ETAG}', True),
+    ('W/"other"', False),
+])
+def test_etag_matches(if_none_match, expected):
+    assert etag_matches(if_none_match, ETAG) is expected
+
+
+def test_if_none_match_takes_precedence_over_if_modified_since():
+    assert not not_modified(ETAG, MODIFIED, 'W/"other"', "Wed, 01 May 2024 13:00:00 GMT")
+
+
+@pytest.mark.parametrize("if_modified_since, expected", [
+    ("Wed, 01 May 2024 12:00:00 GMT", True),
+    ("Wed, 01 May 2024 11:59:59 GMT", False),
+    ("not a date", False),
+])
+def test_if_modified_since(if_modified_since, expected):
+    assert not_modified(ETAG, MODIFIED, None, if_modified_since) is expected
+
+
+def test_conditional_response_returns_304_for_a_current_copy():
+    body = b'{"items": [1, 2]}'
+    first = conditional_response(body)
+    assert first.status_code == 200
+    assert first.body == body
+    assert "last-modified" not in first.headers
+
+    second = conditional_response(body, if_none_match=first.headers["etag"])
+    assert second.status_code == 304
+    assert second.body == b""
+    assert second.headers["etag"] == first.headers["etag"]
+
+
+@pytest.mark.parametrize("accept_encoding, expected", [
+    ("gzip, deflate", "gzip"),
+    ("gzip;q=0", None),
+    ("identity", None),
+    ("*", "br" if http_cache.brotli else "gzip"),
+    ("br;q=1.0, gzip;q=0.5", "br" if http_cache.brotli else "gzip"),
+    ("br, gzip;q=0", "br" if http_cache.brotli else None),
+])
+def test_choose_encoding(accept_encoding, expected):
+    assert choose_encoding(accept_encoding) == expected
+
+
+def test_static_response_is_compressed_once_and_validated():
+    static = StaticResponse({"languages": ["en"] * 1000})
+    compressed = static.response(accept_encoding="gzip")
+    assert compressed.headers["content-encoding"] == "gzip"
+    assert gzip.decompress(compressed.body) == static.body
+    assert static.response().body == static.body
+    assert static.response(if_none_match=static.etag).status_code == 304
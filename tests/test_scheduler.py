@@ -0,0 +1,98 @@
+import asyncio
+import time
+
+import pytest
+
+from scheduler import DeadlineExceeded, FairScheduler, RequestPriority, parse_weights
+
+WEIGHTS = {"interactive": 8, "camera": 4, "bulk": 1}
+
+
+def test_parse_weights():
+    assert parse_weights("interactive=8, bulk=0.5,") == {"interactive": 8.0, "bulk": 0.5}
+
+
+async def run_in_order(scheduler: FairScheduler, priorities: list) -> list:
+    """Order in which queued work gets the slot, with the only slot busy while it queues"""
+    order = []
+
+    async def work(label, priority):
+        async with scheduler.slot(priority):
+            order.append(label)
+
+    async with scheduler.slot(RequestPriority("interactive", "holder")):
+        tasks = [asyncio.create_task(work(label, priority)) for label, priority in priorities]
+        await asyncio.sleep(0)
+    await asyncio.gather(*tasks)
+    return order
+
+
+def test_interactive_work_overtakes_queued_bulk_work():
+    scheduler = FairScheduler("test", 1, WEIGHTS)
+    order = asyncio.run(run_in_order(scheduler, [
+        ("bulk1", RequestPriority("bulk", "importer")),
+        ("bulk2", RequestPriority("bulk", "importer")),
+        ("bulk3", RequestPriority("bulk", "importer")),
+        ("typing", RequestPriority("interactive", "user")),
+    ]))
+    assert order == ["typing", "bulk1", "bulk2", "bulk3"]
+
+
+def test_clients_of_one_class_are_interleaved():
+    scheduler = FairScheduler("test", 1, WEIGHTS)
+    order = asyncio.run(run_in_order(scheduler, [
+        ("a1", RequestPriority("camera", "a")),
+        ("a2", RequestPriority("camera", "a")),
+        ("a3", RequestPriority("camera", "a")),
+        ("b1", RequestPriority("camera", "b")),
+        ("b2", RequestPriority("camera", "b")),
+    ]))
+    assert order == ["a1", "b1", "a2", "b2", "a3"]
+
+
+def test_expired_deadline_is_dropped_before_queueing():
+    scheduler = FairScheduler("test", 1, WEIGHTS)
+
+    async def main():
+        async with scheduler.slot(RequestPriority("interactive", "user", deadline=time.monotonic() - 1)):
+            pass
+
+    with pytest.raises(DeadlineExceeded):
+        asyncio.run(main())
+    assert scheduler.classes["interactive"].dropped == 1
+    assert scheduler.running == 0
+
+
+def test_queued_work_is_dropped_when_its_deadline_passes():
+    scheduler = FairScheduler("test", 1, WEIGHTS)
+
+    async def main():
+        async with scheduler.slot(RequestPriority("interactive", "holder")):
+            with pytest.raises(DeadlineExceeded):
+                async with scheduler.slot(RequestPriority("bulk", "user", deadline=time.monotonic() + 0.05)):
+                    pass
+        return scheduler.stats()
+
+    stats = asyncio.run(main())
+    assert stats["running"] == 0
+    assert stats["classes"]["bulk"]["queued"] == 0
+    assert stats["classes"]["bulk"]["dropped"] == 1
+
+
+def test_cancelled_waiter_leaves_the_queue():
+    scheduler = FairScheduler("test", 1, WEIGHTS)
+
+    async def main():
+        async with scheduler.slot(RequestPriority("interactive", "holder")):
+            waiting = asyncio.create_task(scheduler.slot(RequestPriority("bulk", "user")).__aenter__())
+            await asyncio.sleep(0)
+            assert scheduler.classes["bulk"].queued == 1
+            waiting.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await waiting
+        assert scheduler.classes["bulk"].queued == 0
+        async with scheduler.slot(RequestPriority("bulk", "user")):
+            assert scheduler.running == 1
+
+    asyncio.run(main())
+    assert scheduler.running == 0
@@ -0,0 +1,293 @@
+"""
+Repository contract tests.
+
+Every test runs against MemoryRepository, and against MongoRepository as well when
+TEST_MONGO_URL points at a MongoDB server (each run uses a throwaway database).
+"""
+
+import asyncio
+import os
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+
+from storage import MemoryRepository, MongoRepository, create_repository
+
+NOW = datetime(2024, 5, 1, 12, 0, 0)
+
+
+@pytest.fixture(params=["memory", "mongo"])
+def with_repository(request):
+    """Runs ``scenario(repo)`` in a fresh event loop against a new, empty repository"""
+    mongo_url = os.environ.get("TEST_MONGO_URL")
+    if request.param == "mongo" and not mongo_url:
+        pytest.skip("TEST_MONGO_URL is not set")
+
+    def run(scenario):
+        async def main():
+            if request.param == "mongo":
+                repo = MongoRepository(mongo_url, f"test_{uuid.uuid4().hex}")
+            else:
+                repo = MemoryRepository()
+            await repo.ensure_indexes()
+            try:
+                return await scenario(repo)
+            finally:
+                if request.param == "mongo":
+                    await repo.client.drop_database(repo.db.name)
+                await repo.close()
+
+        return asyncio.run(main())
+
+    return run
+
+
+async def stored(repo, collection: str, query: dict) -> dict:
+    """A stored document as the backend keeps it, for state the Repository API does not expose"""
+    if isinstance(repo, MongoRepository):
+        return await repo.db[collection].find_one(query, {"_id": 0})
+    value, = query.values()
+    return getattr(repo, collection)[value]
+
+
+def translation(text: str, timestamp: datetime, source: str = "en", target: str = "es", **fields) -> dict:
+    return {
+        "id": str(uuid.uuid4()), "original_text": text, "translated_text": f"<{text}>",
+        "source_language": source, "target_language": target, "timestamp": timestamp, **fields
+    }
+
+
+def conversation(conversation_id: str) -> dict:
+    return {"id": conversation_id, "created_at": NOW, "updated_at": NOW, "message_count": 0,
+            "last_sequence": 0, "last_message": None}
+
+
+def test_recent_translations_are_newest_first_and_projected(with_repository):
+    async def scenario(repo):
+        for minutes in (3, 1, 2):
+            await repo.insert_translation(translation(f"t{minutes}", NOW + timedelta(minutes=minutes)))
+        return await repo.recent_translations(2, fields=["original_text", "timestamp"])
+
+    recent = with_repository(scenario)
+    assert [doc["original_text"] for doc in recent] == ["t3", "t2"]
+    assert set(recent[0]) == {"original_text", "timestamp"}
+
+
+def test_returned_documents_are_copies(with_repository):
+    async def scenario(repo):
+        doc = translation("hello", NOW)
+        await repo.insert_translation(doc)
+        doc["original_text"] = "changed"
+        (await repo.recent_translations(1))[0]["original_text"] = "changed again"
+        return await repo.recent_translations(1)
+
+    assert with_repository(scenario)[0]["original_text"] == "hello"
+
+
+def test_recent_ocr_results(with_repository):
+    async def scenario(repo):
+        await repo.insert_ocr_result({"id": "old", "extracted_text": "A", "timestamp": NOW})
+        await repo.insert_ocr_result({"id": "new", "extracted_text": "B", "timestamp": NOW + timedelta(seconds=1)})
+        return await repo.recent_ocr_results(10)
+
+    assert [doc["id"] for doc in with_repository(scenario)] == ["new", "old"]
+
+
+def test_message_sequences_are_allocated_per_conversation(with_repository):
+    async def scenario(repo):
+        await repo.create_conversation(conversation("a"))
+        await repo.create_conversation(conversation("b"))
+        allocated = [await repo.allocate_message_sequence(name) for name in ("a", "a", "b", "a")]
+        return allocated, await repo.allocate_message_sequence("missing")
+
+    allocated, missing = with_repository(scenario)
+    assert allocated == [1, 2, 1, 3]
+    assert missing is None
+
+
+def test_messages_are_listed_in_sequence_order_after_a_cursor(with_repository):
+    async def scenario(repo):
+        await repo.create_conversation(conversation("a"))
+        for sequence in (3, 1, 4, 2):
+            await repo.insert_conversation_message({"id": f"m{sequence}", "conversation_id": "a",
+                                                    "sequence": sequence, "original_text": "hi"})
+        page = await repo.list_conversation_messages("a", after_sequence=1, limit=2, fields=["id", "sequence"])
+        return page, await repo.list_conversation_messages("other", 0, 10)
+
+    page, other = with_repository(scenario)
+    assert page == [{"id": "m2", "sequence": 2}, {"id": "m3", "sequence": 3}]
+    assert other == []
+
+
+def test_last_message_only_moves_forward(with_repository):
+    async def scenario(repo):
+        await repo.create_conversation(conversation("a"))
+        await repo.set_last_message("a", {"id": "m2", "sequence": 2})
+        await repo.set_last_message("a", {"id": "m1", "sequence": 1})
+        first = (await stored(repo, "conversations", {"id": "a"}))["last_message"]["id"]
+        await repo.set_last_message("a", {"id": "m3", "sequence": 3})
+        return first, (await stored(repo, "conversations", {"id": "a"}))["last_message"]["id"]
+
+    assert with_repository(scenario) == ("m2", "m3")
+
+
+def test_participants_and_room_languages(with_repository):
+    async def scenario(repo):
+        await repo.create_conversation(conversation("a"))
+        for participant_id, language in (("p1", "es"), ("p2", "fr"), ("p3", "es"), ("p2", "de")):
+            assert await repo.add_participant({"conversation_id": "a", "participant_id": participant_id,
+                                               "preferred_language": language, "joined_at": NOW})
+        added_to_missing = await repo.add_participant({"conversation_id": "missing", "participant_id": "p1",
+                                                       "preferred_language": "es", "joined_at": NOW})
+        participants = await repo.list_participants("a")
+        return (sorted(await repo.conversation_languages("a")), await repo.conversation_languages("missing"),
+                added_to_missing, participants)
+
+    languages, missing_languages, added_to_missing, participants = with_repository(scenario)
+    assert languages == ["de", "es"]
+    assert missing_languages is None
+    assert added_to_missing is False
+    assert sorted((p["participant_id"], p["preferred_language"]) for p in participants) == [
+        ("p1", "es"), ("p2", "de"), ("p3", "es")
+    ]
+
+
+def test_status_checks(with_repository):
+    async def scenario(repo):
+        for index in range(3):
+            await repo.insert_status_check({"id": str(index), "client_name": f"c{index}", "timestamp": NOW})
+        return await repo.list_status_checks(2, fields=["client_name"])
+
+    checks = with_repository(scenario)
+    assert len(checks) == 2
+    assert all(set(check) == {"client_name"} for check in checks)
+
+
+def test_create_repository_selects_the_backend(monkeypatch):
+    monkeypatch.setenv("STORAGE_BACKEND", "memory")
+    assert isinstance(create_repository(), MemoryRepository)
+    monkeypatch.setenv("STORAGE_BACKEND", "sqlite")
+    with pytest.raises(ValueError):
+        create_repository()
+
+
+def test_rollups_add_up_across_overlapping_runs(with_repository):
+    day = datetime(2024, 4, 1)
+    cutoff = day + timedelta(days=1)
+
+    async def scenario(repo):
+        for minute in range(6):
+            await repo.insert_translation(translation(f"t{minute}", day + timedelta(minutes=minute),
+                                                      processing_time=0.5, is_image_translation=minute < 2))
+        await repo.insert_translation(translation("hot", cutoff + timedelta(hours=1)))
+        # Two workers compacting at once, then a late insert into an already folded day
+        rolled_up = await asyncio.gather(repo.rollup_translations(cutoff), repo.rollup_translations(cutoff))
+        await repo.insert_translation(translation("late", day + timedelta(hours=23), processing_time=1.5))
+        rolled_up_later = await repo.rollup_translations(cutoff)
+        return rolled_up, rolled_up_later, await repo.translation_stats(), await repo.recent_translations(10)
+
+    rolled_up, rolled_up_later, stats, remaining = with_repository(scenario)
+    assert sum(rolled_up) == 6
+    assert rolled_up_later == 1
+    assert [doc["original_text"] for doc in remaining] == ["hot"]
+    assert stats == [{"source_language": "en", "target_language": "es", "count": 8, "image_count": 2,
+                      "avg_latency": 4.5 / 7}]
+
+
+def test_conversation_context_saves_are_versioned(with_repository):
+    async def scenario(repo):
+        state = {"conversation_id": "a", "summary": "", "recent": [], "version": 1}
+        first = await repo.save_conversation_context(state, 0)
+        stale = await repo.save_conversation_context({**state, "summary": "lost", "version": 2}, 0)
+        second = await repo.save_conversation_context({**state, "summary": "kept", "version": 2}, 1)
+        return (first, stale, second, await repo.get_conversation_context("a"),
+                await repo.get_conversation_context("a", fields=["version"]),
+                await repo.get_conversation_context("missing"))
+
+    first, stale, second, stored, version, missing = with_repository(scenario)
+    assert (first, stale, second) == (True, False, True)
+    assert stored["summary"] == "kept"
+    assert version == {"version": 2}
+    assert missing is None
+
+
+def job(job_id: str, status: str = "queued", **fields) -> dict:
+    return {"id": job_id, "kind": "ocr", "status": status, "timestamp": NOW, "finished_at": None, **fields}
+
+
+def test_jobs_are_unique_per_idempotency_key(with_repository):
+    async def scenario(repo):
+        first = await repo.insert_job(job("j1", idempotency_key="k"))
+        duplicate = await repo.insert_job(job("j2", idempotency_key="k"))
+        return first, duplicate, await repo.find_job_by_idempotency_key("k"), await repo.get_job("j2")
+
+    first, duplicate, found, missing = with_repository(scenario)
+    assert (first, duplicate) == (True, False)
+    assert found["id"] == "j1"
+    assert missing is None
+
+
+def test_job_updates_can_require_a_status(with_repository):
+    async def scenario(repo):
+        await repo.insert_job(job("j1"))
+        claimed = await repo.update_job("j1", {"status": "running"}, expected_status="queued")
+        claimed_again = await repo.update_job("j1", {"status": "running"}, expected_status="queued")
+        return claimed, claimed_again, (await repo.get_job("j1"))["status"]
+
+    assert with_repository(scenario) == (True, False, "running")
+
+
+def test_jobs_whose_lease_lapsed_are_failed(with_repository):
+    async def scenario(repo):
+        await repo.insert_job(job("alive", owner="a", heartbeat_at=NOW))
+        await repo.insert_job(job("orphan", "running", owner="b", heartbeat_at=NOW))
+        await repo.insert_job(job("legacy"))  # from before leases: no heartbeat
+        await repo.insert_job(job("done", "succeeded", owner="b", heartbeat_at=NOW, finished_at=NOW))
+        await repo.renew_job_leases("a", NOW + timedelta(minutes=5))
+        expired = await repo.fail_expired_jobs(NOW + timedelta(minutes=1), "interrupted")
+        return sorted(expired), {job_id: await repo.get_job(job_id) for job_id in ("alive", "orphan", "done")}
+
+    expired, jobs = with_repository(scenario)
+    assert expired == ["legacy", "orphan"]
+    assert jobs["alive"]["status"] == "queued"
+    assert jobs["orphan"]["status"] == "failed"
+    assert jobs["orphan"]["error"] == "interrupted"
+    assert jobs["orphan"]["finished_at"] is not None
+    assert jobs["done"]["status"] == "succeeded"
+
+
+def test_jobs_expire_after_they_finish_not_after_they_were_submitted():
+    async def scenario():
+        repo = MemoryRepository()
+        long_ago = datetime.utcnow() - timedelta(days=3)
+        await repo.insert_job(job("waiting", timestamp=long_ago))
+        await repo.insert_job(job("running", "running", timestamp=long_ago))
+        await repo.insert_job(job("old", "succeeded", timestamp=long_ago, finished_at=long_ago,
+                                  idempotency_key="k"))
+        await repo.insert_job(job("recent", "failed", timestamp=long_ago, finished_at=datetime.utcnow()))
+        await repo.insert_ocr_result({"id": "ocr", "timestamp": long_ago})
+        await repo.apply_ttl({"jobs": 24 * 3600, "ocr_results": 24 * 3600})
+        await repo.purge_expired()
+        return sorted(repo.jobs), repo.ocr_results, await repo.find_job_by_idempotency_key("k")
+
+    jobs, ocr_results, by_key = asyncio.run(scenario())
+    assert jobs == ["recent", "running", "waiting"]
+    assert ocr_results == []
+    assert by_key is None
+
+
+def test_glossaries_are_replaced_per_tenant(with_repository):
+    async def scenario(repo):
+        entries = [{"term": "Acme", "translations": {"es": "Acme"}}]
+        await repo.save_glossary({"tenant_id": "t1", "version": "1", "entries": entries})
+        await repo.save_glossary({"tenant_id": "t1", "version": "2", "entries": entries * 2})
+        await repo.save_glossary({"tenant_id": "t2", "version": "1", "entries": []})
+        return (await repo.get_glossary("t1"), await repo.get_glossary("t1", include_entries=False),
+                await repo.get_glossary("missing"))
+
+    full, metadata, missing = with_repository(scenario)
+    assert full["version"] == "2"
+    assert len(full["entries"]) == 2
+    assert metadata == {"tenant_id": "t1", "version": "2"}
+    assert missing is None
@@ -0,0 +1,68 @@
+import asyncio
+
+import pytest
+
+from translation_cache import TranslationCache
+
+
+def test_concurrent_misses_share_one_computation():
+    cache = TranslationCache(maxsize=10, ttl=60)
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return "hola"
+
+    async def main():
+        key = TranslationCache.key("hello", "en", "es")
+        results = await asyncio.gather(*(cache.get_or_compute(key, compute) for _ in range(5)))
+        return results, cache.get(key)
+
+    results, cached = asyncio.run(main())
+    assert results == ["hola"] * 5
+    assert cached == "hola"
+    assert len(calls) == 1
+    assert cache.coalesced == 4
+    assert cache.inflight == {}
+
+
+def test_cancelling_one_caller_does_not_cancel_the_others():
+    cache = TranslationCache(maxsize=10, ttl=60)
+
+    async def compute():
+        await asyncio.sleep(0.02)
+        return "bonjour"
+
+    async def main():
+        key = TranslationCache.key("hello", "en", "fr")
+        first = asyncio.create_task(cache.get_or_compute(key, compute))
+        await asyncio.sleep(0)
+        second = asyncio.create_task(cache.get_or_compute(key, compute))
+        await asyncio.sleep(0)
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await second
+
+    assert asyncio.run(main()) == "bonjour"
+
+
+def test_failures_are_not_cached():
+    cache = TranslationCache(maxsize=10, ttl=60)
+    attempts = []
+
+    async def compute():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise RuntimeError("LLM unavailable")
+        return "hallo"
+
+    async def main():
+        key = TranslationCache.key("hello", "en", "de")
+        with pytest.raises(RuntimeError):
+            await cache.get_or_compute(key, compute)
+        return await cache.get_or_compute(key, compute)
+
+    assert asyncio.run(main()) == "hallo"
+    assert len(attempts) == 2
@@ -0,0 +1,107 @@
+import asyncio
+
+import pytest
+
+from translation_sessions import (RevisionConflict, SessionNotFound, TextTooLong, TranslationSessionManager,
+                                  split_segments, split_whitespace)
+
+
+def test_split_segments_concatenates_to_the_text():
+    text = "Hello there. How are you?\n\nFine!  Thanks。次の文"
+    segments = split_segments(text)
+    assert "".join(segments) == text
+    assert segments == ["Hello there. ", "How are you?\n\n", "Fine!  ", "Thanks。", "次の文"]
+
+
+def test_split_segments_keeps_closing_quotes_with_the_sentence():
+    assert split_segments('He said "stop." Then left.') == ['He said "stop." ', "Then left."]
+
+
+def test_split_whitespace():
+    assert split_whitespace("  Hello.\n") == ("  ", "Hello.", "\n")
+    assert split_whitespace("\n\n") == ("\n\n", "", "")
+
+
+def make_manager(**kwargs):
+    calls = []
+
+    async def translate(text, source_language, target_language):
+        calls.append(text)
+        return f"<{target_language}:{text}>"
+
+    async def detect(text):
+        return "en"
+
+    return TranslationSessionManager(translate, detect, **kwargs), calls
+
+
+def test_revision_translates_only_changed_segments():
+    manager, calls = make_manager()
+
+    async def main():
+        created = await manager.create("One. Two. Three.", "en", "es")
+        calls.clear()
+        revised = await manager.revise(created["session_id"], "Zero. One. Deux. Three.", created["revision"])
+        return created, revised
+
+    created, revised = asyncio.run(main())
+    assert created["translated_text"] == "<es:One.> <es:Two.> <es:Three.>"
+    assert calls == ["Zero.", "Deux."]
+    assert revised["revision"] == 2
+    assert revised["stats"] == {"segments": 4, "translated_segments": 2, "reused_segments": 2}
+    session = manager.get(created["session_id"])
+    assert session.state()["translated_text"] == "<es:Zero.> <es:One.> <es:Deux.> <es:Three.>"
+
+
+def test_patch_applies_to_the_clients_previous_segments():
+    manager, _ = make_manager()
+
+    async def main():
+        created = await manager.create("A. B. C. D.", "en", "fr")
+        revised = await manager.revise(created["session_id"], "A. X. C. Y. Z.")
+        return created, revised
+
+    created, revised = asyncio.run(main())
+    segments = list(created["segments"])
+    for op in revised["patch"]:
+        segments[op["start"]:op["end"]] = op["segments"]
+    assert segments == manager.get(created["session_id"]).translations
+
+
+def test_auto_source_is_detected_once():
+    manager, calls = make_manager()
+
+    async def main():
+        return await manager.create("Hello. World.", "auto", "de")
+
+    created = asyncio.run(main())
+    assert created["source_language"] == "en"
+    assert calls == ["Hello.", "World."]
+
+
+def test_stale_base_revision_conflicts():
+    manager, _ = make_manager()
+
+    async def main():
+        created = await manager.create("One.", "en", "es")
+        await manager.revise(created["session_id"], "One. Two.", 1)
+        await manager.revise(created["session_id"], "One. Three.", 1)
+
+    with pytest.raises(RevisionConflict) as conflict:
+        asyncio.run(main())
+    assert conflict.value.revision == 2
+
+
+def test_text_over_the_limit_is_rejected(monkeypatch):
+    monkeypatch.setenv("TRANSLATION_SESSION_MAX_CHARS", "10")
+    manager, calls = make_manager()
+
+    with pytest.raises(TextTooLong):
+        asyncio.run(manager.create("This text is too long.", "en", "es"))
+    assert calls == []
+
+
+def test_unknown_session_is_not_found():
+    manager, _ = make_manager()
+    with pytest.raises(SessionNotFound):
+        manager.get("missing")
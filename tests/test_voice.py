@@ -0,0 +1,133 @@
+import asyncio
+import struct
+import threading
+
+import numpy as np
+import pytest
+
+from voice import ASRBackend, EnergySegmenter, PcmStreamDecoder, VoiceStreamSession, check_sample_rate
+
+
+def wav_header(sample_rate=8000, channels=1, bits=16, data_size=0, extra_chunk=b"") -> bytes:
+    fmt = struct.pack("<HHIIHH", 1, channels, sample_rate, sample_rate * channels * bits // 8,
+                      channels * bits // 8, bits)
+    chunks = b"fmt " + struct.pack("<I", len(fmt)) + fmt + extra_chunk
+    chunks += b"data" + struct.pack("<I", data_size)
+    return b"RIFF" + struct.pack("<I", 4 + len(chunks) + data_size) + b"WAVE" + chunks
+
+
+def test_raw_pcm_is_decoded_across_odd_chunk_boundaries():
+    samples = np.arange(-500, 500, 7, dtype=np.int16)
+    data = samples.astype("<i2").tobytes()
+    decoder = PcmStreamDecoder()
+    decoded = [decoder.feed(data[i:i + 5]) for i in range(0, len(data), 5)]
+    assert np.array_equal(np.concatenate(decoded), samples)
+    assert decoder.sample_rate == 16000
+
+
+def test_wav_header_is_skipped_and_sets_the_sample_rate():
+    samples = np.array([1, -2, 300, -32768, 32767], dtype=np.int16)
+    odd_chunk = b"LIST" + struct.pack("<I", 3) + b"abc\x00"
+    data = wav_header(data_size=10, extra_chunk=odd_chunk) + samples.astype("<i2").tobytes()
+    decoder = PcmStreamDecoder()
+    decoded = [decoder.feed(data[i:i + 3]) for i in range(0, len(data), 3)]
+    assert np.array_equal(np.concatenate(decoded), samples)
+    assert decoder.sample_rate == 8000
+
+
+def test_stereo_wav_is_rejected():
+    decoder = PcmStreamDecoder()
+    with pytest.raises(ValueError):
+        decoder.feed(wav_header(channels=2))
+
+
+@pytest.mark.parametrize("sample_rate", [0, -16000, 7999, 48001])
+def test_unsupported_sample_rates_are_rejected(sample_rate):
+    with pytest.raises(ValueError):
+        check_sample_rate(sample_rate)
+    with pytest.raises(ValueError):
+        PcmStreamDecoder(sample_rate)
+
+
+def test_wav_header_sample_rate_is_validated():
+    with pytest.raises(ValueError):
+        PcmStreamDecoder().feed(wav_header(sample_rate=0))
+
+
+def test_wav_header_without_a_data_chunk_is_bounded():
+    decoder = PcmStreamDecoder()
+    decoder.feed(b"RIFF" + struct.pack("<I", 2**31) + b"WAVE" + b"LIST" + struct.pack("<I", 2**30))
+    with pytest.raises(ValueError):
+        for _ in range(20):
+            decoder.feed(bytes(4096))
+
+
+def test_segmenter_emits_a_final_utterance_after_silence():
+    rate = 16000
+    segmenter = EnergySegmenter(rate, frame_ms=30, silence_ms=300, min_speech_ms=90, partial_every_ms=3000)
+    speech = (np.sin(np.arange(rate // 2) / 5) * 8000).astype(np.int16)
+    silence = np.zeros(rate // 2, dtype=np.int16)
+    events = segmenter.push(np.concatenate([silence, speech, silence]), received_at=1.0)
+    assert [event.kind for event in events] == ["final"]
+    frame = rate * 30 // 1000
+    assert abs(len(events[0].audio) - len(speech)) <= 2 * frame  # partly voiced frames at both ends
+    assert segmenter.flush() == []
+
+
+def test_segmenter_ignores_short_noise_and_flushes_open_speech():
+    rate = 16000
+    segmenter = EnergySegmenter(rate, frame_ms=30, silence_ms=300, min_speech_ms=90, partial_every_ms=3000)
+    click = np.full(rate * 30 // 1000, 9000, dtype=np.int16)
+    silence = np.zeros(rate // 2, dtype=np.int16)
+    assert segmenter.push(np.concatenate([click, silence]), received_at=1.0) == []
+
+    speech = np.full(rate // 4, 6000, dtype=np.int16)
+    assert segmenter.push(speech, received_at=2.0) == []
+    events = segmenter.flush()
+    assert [event.kind for event in events] == ["final"]
+    assert events[0].speech_end_at == 2.0
+
+
+class GatedASR(ASRBackend):
+    """Recogniser that blocks until the test lets it go"""
+
+    supports_partials = False
+
+    def __init__(self):
+        self.gate = threading.Event()
+        self.calls = 0
+
+    def transcribe(self, audio, sample_rate, language):
+        self.gate.wait(5)
+        self.calls += 1
+        return "speech", language
+
+
+def test_feed_waits_while_too_much_audio_is_waiting_for_asr():
+    rate = 8000
+    utterance = np.concatenate([np.full(rate, 6000, dtype=np.int16), np.zeros(rate, dtype=np.int16)]).tobytes()
+    asr = GatedASR()
+    results = []
+
+    async def translate(text, detected):
+        return f"<{text}>", "en"
+
+    async def send(result):
+        results.append(result)
+
+    async def main():
+        session = VoiceStreamSession(asr, translate, send, sample_rate=rate, language="en", max_buffered_seconds=1.5)
+        # One queued utterance (1 s of speech) fits; the second one goes over the cap
+        await asyncio.wait_for(session.feed(utterance), 1)
+        blocked = asyncio.create_task(session.feed(utterance))
+        await asyncio.sleep(0.1)
+        was_blocked = not blocked.done()
+        asr.gate.set()
+        await asyncio.wait_for(blocked, 5)
+        summary = await session.finish()
+        return was_blocked, summary
+
+    was_blocked, summary = asyncio.run(main())
+    assert was_blocked
+    assert summary["segments"] == 2
+    assert [result["translated_text"] for result in results] == ["<speech>", "<speech>"]